@@ -1,12 +1,16 @@
 # Import Standard Libraries
 import os
+import time
 import logging
+import threading
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, StreamingResponse
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
 # Local imports
+from scripts.config import load_config, get_azure_openai_client, get_async_azure_openai_client
+from scripts.extract_context_from_vs import extract_context_from_vector_search, open_search_indexes, page_text_cache
+from scripts.tesserac import get_ocr_pool
 from scripts.extract_available_openai_models import extract_openai_models
 from scripts.generate_responses import (
     generate_chat_response,
@@ -14,8 +18,8 @@ from scripts.generate_responses import (
     generate_chat_responses_o1_model
 )
 
-# Load environment variables from the .env file
-load_dotenv(override=True)
+# Load environment variables from the .env file (the first module that calls it reads the file)
+load_config()
 
 # Configuración del logger
 log_file = "app.log"
@@ -55,6 +59,100 @@ async def global_error_handler(request: Request, call_next):
         )
 
 
+# Estado del calentamiento (warm-up) de este worker
+warmup_state = {"ready": False, "started": None, "durations": {}, "errors": {}}
+
+# Consulta sintética usada para calentar la recuperación
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "TLS Console require maintenance?")
+
+
+def open_azure_connections():
+    """
+    Crea los clientes de Azure OpenAI y abre la conexión HTTPS del cliente síncrono
+    """
+    client = get_azure_openai_client()
+    get_async_azure_openai_client()
+    client.models.list()
+
+
+def warm_up():
+    """
+    Paga en el arranque lo que si no pagarían las primeras peticiones: conexiones de Azure, apertura de
+    Chroma (y del índice HNSW), hilos de OCR y una recuperación sintética completa.
+    Cada paso se mide por separado; un paso que falla se registra, pero no impide terminar el warm-up.
+    """
+    steps = [
+        ("azure_connections", open_azure_connections),
+        ("search_indexes", open_search_indexes),
+        ("ocr_workers", get_ocr_pool),
+        ("synthetic_retrieval", lambda: extract_context_from_vector_search(WARMUP_QUERY, 1)),
+    ]
+
+    warmup_state["started"] = time.time()
+    for name, step in steps:
+        start_time = time.perf_counter()
+        try:
+            result = step()
+            if isinstance(result, dict):
+                logger.info(f"Warm-up {name}: {result}")
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {e}")
+            warmup_state["errors"][name] = str(e)
+        warmup_state["durations"][name] = time.perf_counter() - start_time
+
+    warmup_state["durations"]["total"] = sum(warmup_state["durations"].values())
+    warmup_state["ready"] = True
+    logger.info(f"Warm-up finished in {warmup_state['durations']['total']:.1f}s")
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    # El warm-up corre en segundo plano: el servidor ya responde a /ready (503) mientras tanto
+    if os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes"):
+        threading.Thread(target=warm_up, daemon=True).start()
+    else:
+        warmup_state["ready"] = True
+
+
+# Ruta de disponibilidad para el balanceador: solo devuelve 200 cuando el warm-up ha terminado
+@app.get("/ready")
+async def get_ready():
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return JSONResponse(content={
+        "status": "ready",
+        "warmup_seconds": {name: round(duration, 3) for name, duration in warmup_state["durations"].items()},
+        "warmup_errors": warmup_state["errors"],
+    })
+
+
+# Métricas en formato de texto de Prometheus
+@app.get("/metrics")
+async def get_metrics():
+    lines = [
+        "# HELP apec_ready 1 when the warm-up of the worker has finished",
+        "# TYPE apec_ready gauge",
+        f"apec_ready {int(warmup_state['ready'])}",
+        "# HELP apec_warmup_duration_seconds Duration of every warm-up step",
+        "# TYPE apec_warmup_duration_seconds gauge",
+    ]
+    lines += [f'apec_warmup_duration_seconds{{step="{name}"}} {duration:.6f}'
+              for name, duration in warmup_state["durations"].items()]
+    lines += [
+        "# HELP apec_warmup_step_failed 1 when a warm-up step failed",
+        "# TYPE apec_warmup_step_failed gauge",
+    ]
+    lines += [f'apec_warmup_step_failed{{step="{name}"}} {int(name in warmup_state["errors"])}'
+              for name in warmup_state["durations"] if name != "total"]
+    lines += [
+        "# HELP apec_page_text_cache_lookups_total Lookups of the OCR page text cache",
+        "# TYPE apec_page_text_cache_lookups_total counter",
+    ]
+    lines += [f'apec_page_text_cache_lookups_total{{result="{name}"}} {count}'
+              for name, count in page_text_cache.stats.items()]
+    return PlainTextResponse("\n".join(lines) + "\n")
+
+
 # Ruta para obtener modelos disponibles
 @app.get("/v1/models")
 async def get_models():
@@ -0,0 +1,97 @@
+# Python Imports
+import re
+import time
+import random
+import argparse
+
+# Local imports
+from text_normalizer import normalize_texts
+
+
+def legacy_remove_repeated_phrases(text, n_words=8):
+    """
+    Copy of the original ProcessData.remove_repeated_phrases, used as the golden reference
+    """
+    words = text.split()
+    result = []
+    i = 0
+    while i < len(words):
+        block = ' '.join(words[i:i + n_words])
+        if not result or block != result[-1]:
+            result.append(block)
+        i += n_words
+    return ' '.join(result)
+
+
+def legacy_preprocess_page_content(text):
+    """
+    Copy of the original ProcessData.preprocess_page_content, used as the golden reference
+    """
+    processed_text = text.lower()
+    processed_text = re.sub(r'/\S+', ' ', processed_text)
+    processed_text = re.sub(r'\\\S+', ' ', processed_text)
+    processed_text = re.sub(r'\b\w+__&__\b', ' ', processed_text)
+    processed_text = re.sub(r'-{3,}', ' ', processed_text)
+    processed_text = re.sub(r'[^\x20-\x7E]', ' ', processed_text)
+    emoji_pattern = re.compile("["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\u2600-\u26FF"
+        u"\u2700-\u27BF"
+        "]+", flags=re.UNICODE)
+    processed_text = emoji_pattern.sub(r' ', processed_text)
+    processed_text = re.sub(r"\d{2,}\b", " ", processed_text)
+    processed_text = re.sub(r"[.,:;!]+", " ", processed_text)
+    processed_text = re.sub(r'\b\d+\b', ' ', processed_text)
+    processed_text = re.sub(r'\b[^0-9\s]\b', ' ', processed_text)
+    processed_text = re.sub(r'\b(?:xx|xxx|xxxx|mm-dd(?:-yy)?|yyyy)\b', ' ', processed_text)
+    processed_text = re.sub(r'\b(?=[\w]*\d)(?=[\w]*[a-zA-Z])\w+\b', ' ', processed_text)
+    processed_text = re.sub(r'\s+', ' ', processed_text).strip()
+    words = processed_text.split()
+    processed_text = ' '.join([words[i] for i in range(len(words)) if i == 0 or words[i] != words[i-1]])
+    processed_text = legacy_remove_repeated_phrases(processed_text)
+    return processed_text
+
+
+# Alphabet used to generate random adversarial inputs
+FUZZ_ALPHABET = (list("abcdexymABCXY0123456789") + list(" \t\n\r") +
+                 list("/\\_&-.,:;!%#()[]'\"?") +
+                 ["é", "€", "😀", "\xa0", "٣", "²", "İ", "☀", "ß", "ﬁ", "\x1c", "\u2028", "__&__", "---", "xx", "yyyy", "mm-dd"])
+
+
+def random_text(rng: random.Random, max_tokens: int = 80) -> str:
+    return ''.join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, max_tokens)))
+
+
+def benchmark(chunks: int, repeat: int, seed: int):
+    """
+    Times the legacy function against the batch normalizer on chunks similar to the splitter output
+    """
+    rng = random.Random(seed)
+    vocabulary = ["pump", "valve", "pressure", "manual", "E01", "KSB", "12-345", "rev.", "page", "/path/to",
+                  "---", "the", "of", "and", "3.5", "2024", "fp__&__", "°C", "😀", "installation", "A1B2"]
+    texts = [' '.join(rng.choice(vocabulary) for _ in range(180))[:1200] for _ in range(chunks)]
+
+    legacy_time = min(_time(lambda: [legacy_preprocess_page_content(text) for text in texts]) for _ in range(repeat))
+    new_time = min(_time(lambda: normalize_texts(texts)) for _ in range(repeat))
+
+    print(f"Legacy:     {chunks / legacy_time:,.0f} chunks/sec")
+    print(f"Normalizer: {chunks / new_time:,.0f} chunks/sec ({legacy_time / new_time:.2f}x)")
+
+
+def _time(function) -> float:
+    start_time = time.perf_counter()
+    function()
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the text normalizer (the golden check is in tests/test_text_normalizer.py)")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    benchmark(args.chunks, args.repeat, args.seed)
@@ -0,0 +1,187 @@
+# Python Imports
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ByteBudget:
+    """
+    Bounds the bytes of the downloaded files waiting to be processed.
+    A file bigger than the whole budget is admitted alone.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size: int):
+        with self.condition:
+            while self.used > 0 and self.used + size > self.max_bytes:
+                self.condition.wait()
+            self.used += size
+
+    def release(self, size: int):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+class BlobFile:
+    """
+    Blob downloaded to a temporary file, ready to be processed
+    """
+
+    def __init__(self, kind: str, blob_name: str, source_path: str, local_path: str, size: int, mtime: float):
+        self.kind = kind
+        self.blob_name = blob_name
+        self.source_path = source_path  # Identity of the file in the manifest and the metadata
+        self.local_path = local_path
+        self.size = size
+        self.mtime = mtime
+
+
+class BlobIngestionSource:
+    """
+    Ingestion source that reads the corpus directly from a Blob Storage container.
+
+    The container is listed page by page in a background thread and the blobs are downloaded
+    concurrently (in parallel ranges for large blobs) into a temporary directory whose size is
+    bounded, so the processing starts with the first downloads and the disk never holds more
+    than the budget. Every blob gets the path it would have under base_path in the local mirror,
+    so both sources share the same manifest entries.
+    """
+
+    def __init__(self,
+                 container_client,
+                 blob_prefix: str,
+                 base_path: str,
+                 kinds_by_extension: dict,
+                 skip_blob=None,
+                 temp_directory: str = None,
+                 max_buffer_mb: int = 1024,
+                 workers: int = 4,
+                 block_concurrency: int = 4,
+                 max_file_size_mb: float = 500):
+        """
+        :param container_client: azure.storage.blob ContainerClient
+        :param blob_prefix: Root folder of the corpus in the container (e.g. "johnny5_data")
+        :param base_path: Local root the blob names are mapped to
+        :param kinds_by_extension: Kind of processing of every extension, the other blobs are ignored
+        :param skip_blob: Function (source_path, size, mtime) -> True to skip a blob without downloading it
+        :param max_buffer_mb: Maximum size of the downloaded files waiting to be processed
+        :param workers: Number of blobs downloaded at the same time
+        :param block_concurrency: Parallel range requests per blob
+        :param max_file_size_mb: Blobs bigger than this are ignored
+        """
+        self.container_client = container_client
+        self.blob_prefix = blob_prefix.strip('/')
+        self.base_path = base_path
+        self.kinds_by_extension = kinds_by_extension
+        self.skip_blob = skip_blob
+        self.temp_directory = tempfile.mkdtemp(prefix="blob_ingestion_", dir=temp_directory)
+        self.budget = ByteBudget(max_buffer_mb * 1024 * 1024)
+        self.workers = workers
+        self.block_concurrency = block_concurrency
+        self.max_file_size = max_file_size_mb * 1024 * 1024
+
+        # Paths of all the listed blobs, used to detect the blobs deleted from the container
+        self.seen_paths = set()
+        self.listing_complete = False
+
+        # Updated by the listing thread and by the download callbacks (executor threads)
+        self.stats = {'listed': 0, 'ignored': 0, 'unchanged': 0, 'downloaded': 0, 'downloaded_bytes': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+
+    def source_path(self, blob_name: str) -> str:
+        """
+        Path of a blob in the local mirror layout
+        """
+        relative_name = blob_name[len(self.blob_prefix) + 1:] if self.blob_prefix else blob_name
+        return os.path.join(self.base_path, *relative_name.split('/'))
+
+    def _count(self, **increments):
+        with self.stats_lock:
+            for name, increment in increments.items():
+                self.stats[name] += increment
+
+    def _download(self, kind: str, blob_name: str, source_path: str, size: int, mtime: float) -> BlobFile:
+        local_path = os.path.join(self.temp_directory, f"{uuid4().hex}_{os.path.basename(source_path)}")
+        with open(local_path, 'wb') as file:
+            self.container_client.download_blob(blob_name, max_concurrency=self.block_concurrency).readinto(file)
+        return BlobFile(kind, blob_name, source_path, local_path, size, mtime)
+
+    def _list_and_download(self, ready: queue.Queue):
+        """
+        Producer: lists the container page by page and downloads the blobs to process
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            name_prefix = self.blob_prefix + '/' if self.blob_prefix else None
+            try:
+                for page in self.container_client.list_blobs(name_starts_with=name_prefix).by_page():
+                    for blob in page:
+                        self._count(listed=1)
+                        source_path = self.source_path(blob.name)
+                        self.seen_paths.add(source_path)
+
+                        kind = self.kinds_by_extension.get(os.path.splitext(blob.name)[1].lower())
+                        if kind is None or blob.size == 0 or blob.size > self.max_file_size \
+                                or os.path.basename(blob.name).startswith('~$'):
+                            self._count(ignored=1)
+                            continue
+
+                        mtime = blob.last_modified.timestamp()
+                        if self.skip_blob is not None and self.skip_blob(source_path, blob.size, mtime):
+                            self._count(unchanged=1)
+                            continue
+
+                        # Wait until there is room in the buffer before downloading
+                        self.budget.acquire(blob.size)
+                        future = executor.submit(self._download, kind, blob.name, source_path, blob.size, mtime)
+                        future.add_done_callback(lambda done, size=blob.size, name=blob.name: self._downloaded(done, size, name, ready))
+                self.listing_complete = True
+            except Exception as e:
+                print(f"Error listing the container: {e}")
+
+        # All the downloads are finished
+        ready.put(None)
+
+    def _downloaded(self, future, size: int, blob_name: str, ready: queue.Queue):
+        try:
+            blob_file = future.result()
+            self._count(downloaded=1, downloaded_bytes=size)
+            ready.put(blob_file)
+        except Exception as e:
+            print(f"Error downloading blob {blob_name}: {e}")
+            self._count(errors=1)
+            self.budget.release(size)
+
+    def iter_files(self):
+        """
+        Yields the blobs as soon as they are downloaded. Every BlobFile must be given back
+        with release() once processed, to delete it and free its space in the buffer
+        :return: Generator of BlobFile
+        """
+        ready = queue.Queue()
+        producer = threading.Thread(target=self._list_and_download, args=(ready,), daemon=True)
+        producer.start()
+
+        while True:
+            blob_file = ready.get()
+            if blob_file is None:
+                break
+            yield blob_file
+
+        producer.join()
+
+    def release(self, blob_file: BlobFile):
+        if os.path.exists(blob_file.local_path):
+            os.remove(blob_file.local_path)
+        self.budget.release(blob_file.size)
+
+    def close(self):
+        shutil.rmtree(self.temp_directory, ignore_errors=True)
@@ -0,0 +1,94 @@
+# Python Imports
+import os
+import sys
+import argparse
+import hashlib
+
+# Third party imports
+from langchain_chroma import Chroma
+
+# Local imports
+from ingestion_manifest import IngestionManifest
+
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')))
+from scripts.lexical_index import LexicalIndex, lexical_index_path
+
+# Number of records read from or deleted in Chroma per call
+BATCH_SIZE = 5000
+
+
+def absolute_path(relative_path):
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), relative_path))
+
+
+def duplicate_key(metadata: dict, text: str) -> tuple:
+    """
+    Two records are duplicates when they have the same source, location and text
+    """
+    metadata = metadata or {}
+    location = tuple(metadata.get(key) for key in ('page', 'sheet', 'row', 'section', 'slide'))
+    return metadata.get('source'), location, hashlib.sha256((text or '').encode('utf-8')).digest()
+
+
+def find_duplicates(collection, registered_ids: set) -> list:
+    """
+    Reads the whole collection in batches and returns the IDs of the duplicated records.
+    For every group of duplicates the ID registered in the manifest is kept (the first one otherwise).
+    """
+    kept = {}        # duplicate key -> kept ID
+    duplicates = []
+    total = collection.count()
+
+    for offset in range(0, total, BATCH_SIZE):
+        records = collection.get(include=['metadatas', 'documents'], limit=BATCH_SIZE, offset=offset)
+        for record_id, metadata, text in zip(records['ids'], records['metadatas'], records['documents']):
+            key = duplicate_key(metadata, text)
+            if key not in kept:
+                kept[key] = record_id
+            elif record_id in registered_ids and kept[key] not in registered_ids:
+                duplicates.append(kept[key])
+                kept[key] = record_id
+            else:
+                duplicates.append(record_id)
+
+        print(f"Scanned {min(offset + BATCH_SIZE, total)}/{total} records, {len(duplicates)} duplicates")
+
+    return duplicates
+
+
+def compact_vector_store(data_directory: str, manifest_file: str, collection_name: str, dry_run: bool):
+    """
+    Removes the duplicated chunks inserted by the runs that used random IDs
+    """
+    vector_store = Chroma(collection_name=collection_name, persist_directory=data_directory)
+    collection = vector_store._collection
+
+    manifest = IngestionManifest(manifest_file)
+    registered_ids = {chunk_id for (chunk_id,) in manifest.connection.execute("SELECT chunk_id FROM chunks")}
+    manifest.close()
+
+    total = collection.count()
+    duplicates = find_duplicates(collection, registered_ids)
+
+    print(f"Records: {total}, duplicates: {len(duplicates)} ({len(duplicates) / max(total, 1):.1%})")
+    if dry_run or not duplicates:
+        return
+
+    lexical_index = LexicalIndex(lexical_index_path(data_directory))
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        collection.delete(ids=duplicates[start:start + BATCH_SIZE])
+        lexical_index.remove(duplicates[start:start + BATCH_SIZE])
+    lexical_index.close()
+
+    print(f"Deleted {len(duplicates)} duplicates, {collection.count()} records left")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicated chunks from the vector store")
+    parser.add_argument("--data-directory", default=absolute_path("../data/APEC_ChromaDB_v2"))
+    parser.add_argument("--manifest-file", default=absolute_path("../data/ingestion_manifest_v2.sqlite"))
+    parser.add_argument("--collection", default="apec_vectorstores")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the duplicates")
+    args = parser.parse_args()
+
+    compact_vector_store(args.data_directory, args.manifest_file, args.collection, args.dry_run)
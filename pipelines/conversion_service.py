@@ -0,0 +1,266 @@
+# Python Imports
+import os
+import time
+import queue
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Local imports
+from ingestion_manifest import file_content_hash
+
+
+def temporary_pdf_path(pdf_path: str) -> str:
+    """
+    Unique temporary file next to a cached PDF, where a conversion is written before it is moved into place.
+    Every call gets its own file, even when several threads convert files with the same content
+    """
+    file_descriptor, temporary_path = tempfile.mkstemp(prefix=os.path.basename(pdf_path) + '.', suffix='.tmp.pdf',
+                                                       dir=os.path.dirname(pdf_path))
+    os.close(file_descriptor)
+    return temporary_path
+
+
+class OfficeInstance:
+    """
+    Warm headless LibreOffice instance served by unoserver.
+
+    Every instance has its own ports and user profile, so several of them can run in parallel.
+    The conversions are sent with unoconvert, which avoids the cold start of LibreOffice per file.
+    """
+
+    def __init__(self, port: int, uno_port: int, profile_directory: str,
+                 server_command: str = "unoserver", client_command: str = "unoconvert",
+                 startup_timeout: float = 60.0):
+        self.port = port
+        self.uno_port = uno_port
+        self.profile_directory = profile_directory
+        self.server_command = server_command
+        self.client_command = client_command
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.conversions = 0
+
+    def start(self):
+        """
+        Launches the instance and waits until it accepts connections
+        """
+        os.makedirs(self.profile_directory, exist_ok=True)
+        self.process = subprocess.Popen(
+            [self.server_command,
+             '--interface', '127.0.0.1',
+             '--port', str(self.port),
+             '--uno-port', str(self.uno_port),
+             '--user-installation', f"file://{self.profile_directory}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,  # Own process group, so the soffice children can be killed too
+        )
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Office instance on port {self.port} exited during startup")
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.5)
+
+        self.stop()
+        raise TimeoutError(f"Office instance on port {self.port} did not start in {self.startup_timeout}s")
+
+    def stop(self):
+        """
+        Kills the instance and all its children
+        """
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        self.process = None
+
+    def restart(self):
+        print(f"Restarting office instance on port {self.port}")
+        self.stop()
+        self.start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def convert(self, input_file: str, output_file: str, timeout: float):
+        """
+        Converts a file to PDF. Raises subprocess.TimeoutExpired if the instance hangs
+        """
+        if not self.is_alive():
+            self.restart()
+
+        subprocess.run(
+            [self.client_command, '--host', '127.0.0.1', '--port', str(self.port),
+             '--convert-to', 'pdf', input_file, output_file],
+            check=True, timeout=timeout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        self.conversions += 1
+
+
+class ConversionService:
+    """
+    Pool of warm office instances that converts files to PDF in parallel.
+
+    The converted PDFs are cached by content hash of the source file in a directory outside the
+    input tree, so a file is converted only once even if it is moved or copied.
+    """
+
+    def __init__(self,
+                 cache_directory: str,
+                 instances: int = 4,
+                 timeout: float = 120.0,
+                 base_port: int = 2003,
+                 server_command: str = "unoserver",
+                 client_command: str = "unoconvert"):
+        self.cache_directory = cache_directory
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+        self.number_instances = max(1, instances)
+        self.timeout = timeout
+        self.base_port = base_port
+        self.server_command = server_command
+        self.client_command = client_command
+
+        # The instances are started on the first conversion that misses the cache
+        self.instances = []
+        self.free_instances = queue.Queue()
+        self.profiles_directory = None
+        self.start_lock = threading.Lock()
+
+        self.stats = {'cached': 0, 'converted': 0, 'failed': 0, 'timeouts': 0, 'restarts': 0}
+
+    def cache_path(self, content_hash: str) -> str:
+        """
+        Path of the cached PDF of a content
+        """
+        return os.path.join(self.cache_directory, content_hash[:2], f"{content_hash}.pdf")
+
+    def start(self):
+        """
+        Launches the pool of office instances
+        """
+        if self.instances:
+            return
+
+        self.profiles_directory = tempfile.mkdtemp(prefix="office_profiles_")
+        for index in range(self.number_instances):
+            instance = OfficeInstance(
+                port=self.base_port + 2 * index,
+                uno_port=self.base_port + 2 * index + 1,
+                profile_directory=os.path.join(self.profiles_directory, f"instance_{index}"),
+                server_command=self.server_command,
+                client_command=self.client_command,
+            )
+            instance.start()
+            self.instances.append(instance)
+            self.free_instances.put(instance)
+
+        print(f"Started {self.number_instances} office instances")
+
+    def stop(self):
+        """
+        Stops all the office instances
+        """
+        for instance in self.instances:
+            instance.stop()
+        self.instances = []
+        self.free_instances = queue.Queue()
+
+        if self.profiles_directory:
+            shutil.rmtree(self.profiles_directory, ignore_errors=True)
+            self.profiles_directory = None
+
+    def convert(self, input_file: str):
+        """
+        Returns the PDF of a file, from the cache or converted by a free office instance
+        :param input_file: Path of the file to convert
+        :return: Path of the PDF, or None if the conversion failed
+        """
+        pdf_path = self.cache_path(file_content_hash(input_file))
+        if os.path.exists(pdf_path):
+            self.stats['cached'] += 1
+            return pdf_path
+
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        try:
+            with self.start_lock:
+                self.start()
+        except (OSError, RuntimeError, TimeoutError) as e:
+            print(f"Could not start the office instances: {e}")
+            self.stats['failed'] += 1
+            return None
+
+        # Convert into a temporary file so a failed conversion never leaves a broken PDF in the cache
+        temporary_path = temporary_pdf_path(pdf_path)
+        instance = self.free_instances.get()
+        try:
+            instance.convert(input_file, temporary_path, self.timeout)
+            os.replace(temporary_path, pdf_path)
+            self.stats['converted'] += 1
+            return pdf_path
+        except subprocess.TimeoutExpired:
+            print(f"Conversion of {input_file} timed out after {self.timeout}s")
+            self.stats['timeouts'] += 1
+            self._restart(instance)
+        except (subprocess.CalledProcessError, OSError, RuntimeError, TimeoutError) as e:
+            print(f"Error converting {input_file} to PDF with LibreOffice: {e}")
+            if not instance.is_alive():
+                self._restart(instance)
+        finally:
+            self.free_instances.put(instance)
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+        self.stats['failed'] += 1
+        return None
+
+    def convert_with(self, input_file: str, converter):
+        """
+        Converts a file into the cache with another converter (e.g. Pandoc, when LibreOffice fails),
+        also through a temporary file, so a partial or failed conversion is never taken as a cached PDF
+        :param input_file: Path of the file to convert
+        :param converter: Function (input_file, output_pdf_path) that returns True if the conversion succeeded
+        :return: Path of the PDF, or None if the conversion failed
+        """
+        pdf_path = self.cache_path(file_content_hash(input_file))
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+
+        temporary_path = temporary_pdf_path(pdf_path)
+        try:
+            if not converter(input_file, temporary_path) or os.path.getsize(temporary_path) == 0:
+                return None
+            os.replace(temporary_path, pdf_path)
+            return pdf_path
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _restart(self, instance: OfficeInstance):
+        try:
+            instance.restart()
+            self.stats['restarts'] += 1
+        except (RuntimeError, TimeoutError) as e:
+            # It will be restarted again before its next conversion
+            print(f"Could not restart office instance on port {instance.port}: {e}")
+
+    def convert_many(self, input_files: list) -> dict:
+        """
+        Converts several files in parallel, one per office instance
+        :param input_files: Paths of the files to convert
+        :return: Dictionary input path -> PDF path (None if the conversion failed)
+        """
+        with ThreadPoolExecutor(max_workers=self.number_instances) as executor:
+            return dict(zip(input_files, executor.map(self.convert, input_files)))
@@ -0,0 +1,254 @@
+# Python Imports
+import os
+import sys
+import json
+import time
+import argparse
+
+# Third party imports
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.ipc as ipc
+
+# Records per row group (Parquet) or record batch (Arrow IPC)
+ROW_GROUP_SIZE = 5000
+
+# Maximum number of records sent to Chroma in a single call
+CHROMA_MAX_BATCH_SIZE = 5000
+
+
+def absolute_path(relative_path):
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), relative_path))
+
+
+def lexical_export_path(corpus_file: str) -> str:
+    """
+    File written next to an exported corpus with a copy of its lexical index. The BM25 index holds the raw
+    text of the chunks (with the codes and part numbers) that the vector store does not have, so it can not
+    be rebuilt from the exported documents
+    """
+    return os.path.splitext(corpus_file)[0] + '.lexical_index.sqlite'
+
+
+def corpus_schema(dimension: int, collection_metadata: dict = None) -> pa.Schema:
+    """
+    Schema of the exported corpus: one row per chunk with its embedding as a fixed size list
+    """
+    return pa.schema([
+        ('id', pa.string()),
+        ('document', pa.string()),
+        ('metadata', pa.string()),  # JSON, the metadata keys are not the same for every chunk
+        ('embedding', pa.list_(pa.float32(), dimension)),
+    ], metadata={'dimension': str(dimension), 'collection_metadata': json.dumps(collection_metadata or {})})
+
+
+def to_record_batch(schema: pa.Schema, ids: list, documents: list, metadatas: list, embeddings) -> pa.RecordBatch:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    dimension = embeddings.shape[1]
+    return pa.record_batch([
+        pa.array(ids, pa.string()),
+        pa.array(documents, pa.string()),
+        pa.array([json.dumps(metadata or {}) for metadata in metadatas], pa.string()),
+        pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1)), dimension),
+    ], schema=schema)
+
+
+class CorpusWriter:
+    """
+    Writes record batches to a Parquet file (one row group per batch) or an Arrow IPC file,
+    depending on the extension of the output file
+    """
+
+    def __init__(self, output_file: str, schema: pa.Schema):
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        if output_file.endswith('.arrow'):
+            self.writer = ipc.new_file(output_file, schema)
+        else:
+            self.writer = pq.ParquetWriter(output_file, schema, compression='zstd')
+
+    def write(self, batch: pa.RecordBatch):
+        if isinstance(self.writer, pq.ParquetWriter):
+            self.writer.write_batch(batch, row_group_size=len(batch))
+        else:
+            self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+
+
+def iter_corpus(input_file: str):
+    """
+    Reads an exported corpus one row group (or record batch) at a time
+    :return: Generator of (ids, documents, metadatas, embeddings as a float32 matrix)
+    """
+    if input_file.endswith('.arrow'):
+        reader = ipc.open_file(pa.memory_map(input_file, 'r'))
+        batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+    else:
+        parquet_file = pq.ParquetFile(input_file)
+        batches = (parquet_file.read_row_group(index).combine_chunks().to_batches()[0]
+                   for index in range(parquet_file.num_row_groups))
+
+    for batch in batches:
+        embedding_column = batch.column('embedding')
+        dimension = embedding_column.type.list_size
+        # Zero-copy view of the embeddings as a matrix
+        embeddings = embedding_column.values.to_numpy(zero_copy_only=False).reshape(-1, dimension)
+        yield (batch.column('id').to_pylist(),
+               batch.column('document').to_pylist(),
+               [json.loads(metadata) for metadata in batch.column('metadata').to_pylist()],
+               embeddings)
+
+
+def read_collection_metadata(input_file: str) -> dict:
+    """
+    Metadata of the exported collection (distance function and HNSW parameters)
+    """
+    if input_file.endswith('.arrow'):
+        schema = ipc.open_file(pa.memory_map(input_file, 'r')).schema
+    else:
+        schema = pq.read_schema(input_file)
+    return json.loads((schema.metadata or {}).get(b'collection_metadata', b'{}'))
+
+
+def count_rows(input_file: str) -> int:
+    if input_file.endswith('.arrow'):
+        return ipc.open_file(pa.memory_map(input_file, 'r')).count_rows()
+    return pq.ParquetFile(input_file).metadata.num_rows
+
+
+def export_corpus(data_directory: str, output_file: str, collection_name: str = "apec_vectorstores"):
+    """
+    Exports all the chunks, metadata and embeddings of a Chroma collection, and a copy of its lexical index
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(collection_name=collection_name, persist_directory=data_directory)._collection
+    total = collection.count()
+    writer, exported = None, 0
+    start_time = time.perf_counter()
+
+    for offset in range(0, total, ROW_GROUP_SIZE):
+        records = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=ROW_GROUP_SIZE, offset=offset)
+        if not records['ids']:
+            break
+
+        if writer is None:
+            schema = corpus_schema(len(records['embeddings'][0]), collection.metadata)
+            writer = CorpusWriter(output_file, schema)
+
+        writer.write(to_record_batch(schema, records['ids'], records['documents'], records['metadatas'], records['embeddings']))
+        exported += len(records['ids'])
+        print(f"Exported {exported}/{total} records")
+
+    if writer is not None:
+        writer.close()
+
+    # Copy of the lexical index, it also has the chunks collapsed as near duplicates
+    sys.path.append(absolute_path('..'))
+    from scripts.lexical_index import LexicalIndex, lexical_index_path
+
+    if os.path.exists(lexical_index_path(data_directory)):
+        lexical_index = LexicalIndex(lexical_index_path(data_directory), read_only=True)
+        lexical_index.backup(lexical_export_path(output_file))
+        print(f"Exported {lexical_index.count()} lexical index chunks to {lexical_export_path(output_file)}")
+        lexical_index.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Exported {exported} records to {output_file} in {elapsed:.1f}s ({exported / max(elapsed, 1e-9):.0f} records/sec)")
+
+
+def import_corpus_to_chroma(input_file: str, data_directory: str, collection_name: str = "apec_vectorstores",
+                            hnsw_parameters: dict = None):
+    """
+    Bulk-loads an exported corpus into a Chroma store with the stored embeddings (nothing is re-embedded),
+    and its lexical index when it was exported with it
+    :param hnsw_parameters: Metadata of the new collection, e.g. {'hnsw:M': 32, 'hnsw:construction_ef': 200}
+    """
+    from langchain_chroma import Chroma
+
+    # Same distance function and HNSW parameters as the exported collection, unless they are replaced
+    collection_metadata = dict(read_collection_metadata(input_file), **(hnsw_parameters or {}))
+    vector_store = Chroma(collection_name=collection_name, persist_directory=data_directory,
+                          collection_metadata=collection_metadata or None)
+    collection = vector_store._collection
+    total, imported = count_rows(input_file), 0
+    start_time = time.perf_counter()
+
+    for ids, documents, metadatas, embeddings in iter_corpus(input_file):
+        for start in range(0, len(ids), CHROMA_MAX_BATCH_SIZE):
+            end = start + CHROMA_MAX_BATCH_SIZE
+            collection.upsert(ids=ids[start:end], embeddings=embeddings[start:end],
+                              documents=documents[start:end], metadatas=metadatas[start:end])
+        imported += len(ids)
+        print(f"Imported {imported}/{total} records")
+
+    # The lexical index is restored from its export, the documents of the corpus have no codes left
+    sys.path.append(absolute_path('..'))
+    from scripts.lexical_index import LexicalIndex, lexical_index_path
+
+    if os.path.exists(lexical_export_path(input_file)):
+        exported_index = LexicalIndex(lexical_export_path(input_file), read_only=True)
+        lexical_index = LexicalIndex(lexical_index_path(data_directory))
+        for chunk_ids, texts, chunk_metadatas in exported_index.iter_chunks():
+            lexical_index.add(chunk_ids, texts, chunk_metadatas)
+        lexical_index.optimize()
+        print(f"Imported {exported_index.count()} lexical index chunks into {lexical_index_path(data_directory)}")
+        exported_index.close()
+        lexical_index.close()
+    else:
+        print(f"{lexical_export_path(input_file)} not found, the lexical index was not imported "
+              f"(scripts/lexical_index.py can only rebuild it from the normalized documents)")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Imported {imported} records into {data_directory} in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):.0f} records/sec)")
+
+
+def import_corpus_to_compact_index(input_file: str, output_directory: str, dtype: str = 'int8'):
+    """
+    Builds the compact quantized index of the retrieval directly from an exported corpus
+    """
+    sys.path.append(absolute_path('..'))
+    from scripts.compact_index import build_compact_index
+
+    total = count_rows(input_file)
+    first_batch = next(iter_corpus(input_file), None)
+    if first_batch is None:
+        raise ValueError(f"{input_file} is empty")
+    dimension = first_batch[3].shape[1]
+
+    batches = ((ids, embeddings, documents, metadatas) for ids, documents, metadatas, embeddings in iter_corpus(input_file))
+    build_compact_index(output_directory, batches, dimension, total, dtype=dtype)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the vector store to Parquet/Arrow and re-import it without re-embedding")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Chroma -> .parquet/.arrow")
+    export_parser.add_argument("--data-directory", default=absolute_path("../data/APEC_ChromaDB_v2"))
+    export_parser.add_argument("--output-file", default=absolute_path("../data/corpus_export.parquet"))
+
+    import_parser = subparsers.add_parser("import", help=".parquet/.arrow -> Chroma or compact index")
+    import_parser.add_argument("--input-file", default=absolute_path("../data/corpus_export.parquet"))
+    import_parser.add_argument("--target", choices=["chroma", "compact"], default="chroma")
+    import_parser.add_argument("--data-directory", help="New Chroma directory, or compact index directory")
+    import_parser.add_argument("--hnsw-m", type=int, help="M of the new HNSW index")
+    import_parser.add_argument("--hnsw-construction-ef", type=int, help="construction_ef of the new HNSW index")
+    import_parser.add_argument("--hnsw-search-ef", type=int, help="search_ef of the new HNSW index")
+    import_parser.add_argument("--dtype", choices=["int8", "float16"], default="int8", help="Compact index only")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_corpus(args.data_directory, args.output_file)
+    elif args.target == "compact":
+        import_corpus_to_compact_index(args.input_file, args.data_directory or absolute_path("../data/compact_index"), args.dtype)
+    else:
+        if not args.data_directory:
+            parser.error("--data-directory is required to import into Chroma")
+        hnsw_parameters = {name: value for name, value in (('hnsw:M', args.hnsw_m),
+                                                           ('hnsw:construction_ef', args.hnsw_construction_ef),
+                                                           ('hnsw:search_ef', args.hnsw_search_ef)) if value}
+        import_corpus_to_chroma(args.input_file, args.data_directory, hnsw_parameters=hnsw_parameters)
@@ -1,46 +1,105 @@
 # Python Imports
 import os
-import re
 import gc
+import sys
+import atexit
+import resource
 
 # Third party imports
 from dotenv import load_dotenv
 import pypandoc
 from docx2pdf import convert as docx_to_pdf
-import subprocess
 import platform
 import traceback
-from uuid import uuid4
-import pandas as pd
 
 # Langchain imports
 from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain_community.document_loaders import Docx2txtLoader
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import CharacterTextSplitter
-from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
 from pymongo import MongoClient
+from openai import AzureOpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+# Local imports
+from embedding_batcher import EmbeddingBatcher
+from ingestion_manifest import IngestionManifest, chunk_id
+from embedding_cache import EmbeddingCache
+from text_normalizer import normalize_text, normalize_texts
+from tabular_builder import build_tabular_documents
+from native_loaders import load_native_documents, NATIVE_FORMATS
+from conversion_service import ConversionService
+from file_discovery import FileScanner
+from near_duplicates import NearDuplicateIndex
+from partitions import PartitionCatalog, partition_metadata, load_vendors
+from blob_source import BlobIngestionSource
+
+# The lexical index is shared with the retrieval scripts
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')))
+from scripts.lexical_index import LexicalIndex, lexical_index_path, split_raw_texts, RAW_TEXT_KEY
+from scripts.embedders import create_embedder, embedder_cache_key, AZURE_OPENAI_API_VERSION
+
 
 # Load the environment variables
 load_dotenv(override=True)
 
+# Maximum number of records sent to Chroma in a single call
+CHROMA_MAX_BATCH_SIZE = 5000
+
 def absolute_path(relative_path):
     return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), relative_path))
 
+def current_rss_bytes():
+    """
+    Returns the current resident memory of the process (peak RSS when /proc is not available)
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def chunk_location(metadata: dict):
+    """
+    Location of a chunk inside its file: page (PDF), sheet and row (tabular), section or slide
+    """
+    if 'page' in metadata:
+        return metadata['page']
+    if 'sheet' in metadata:
+        return f"{metadata['sheet']}:{metadata.get('row')}"
+    return metadata.get('section', metadata.get('slide', ''))
+
 class ProcessData:
     def __init__(self,
                  data_directory: str =  "../data/APEC_ChromaDB_v2",
                  history_file: str = "../data/processed_files_v2.txt",
+                 manifest_file: str = "../data/ingestion_manifest_v2.sqlite",
+                 embedding_cache_directory: str = "../data/embedding_cache",
                  error_file: str = "../data/error_files_v2.txt",
-                 embedding_model: str = "text-embedding-3-small"):
+                 embedding_model: str = os.getenv('EMBEDDING_MODEL', "text-embedding-3-small"),
+                 embedding_backend: str = os.getenv('EMBEDDING_BACKEND', "openai"),
+                 flush_threshold: int = 3000,
+                 buffer_memory_mb: int = 256,
+                 near_duplicate_file: str = "../data/near_duplicates_v2.sqlite",
+                 near_duplicate_threshold: float = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.9')),
+                 base_path: str = None,
+                 partition_catalog_file: str = "../data/partitions_catalog.json"):
         
-        # List to store the documents temporarily
+        # List to store the documents temporarily (and the IDs they will have in the vector store)
         self.documents = []
+        self.document_ids = []
+        self.buffer_bytes = 0
+
+        # Files fully buffered whose chunks are not committed in the vector store yet
+        self.pending_files = []
+
+        # Number of buffered chunks or memory used by their text that triggers a save into the vector store
+        self.flush_threshold = flush_threshold
+        self.buffer_memory_budget = buffer_memory_mb * 1024 * 1024
 
         # History file
         self.history_file = absolute_path(history_file)
@@ -57,6 +116,11 @@ class ProcessData:
         # Load already processed files into memory
         self.processed_files = self.load_processed_files()
 
+        # Content-hash manifest used to detect new, modified, moved and deleted files
+        self.manifest = IngestionManifest(absolute_path(manifest_file))
+        if self.manifest.count_files() == 0 and self.processed_files:
+            self.manifest.import_legacy_history(self.processed_files)
+
         # Define the initial text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
                                                             # Set a really small chunk size, just to show.
@@ -66,8 +130,39 @@ class ProcessData:
                                                             is_separator_regex=False,
                                                         )
 
-        # Embedding Model
-        self.embedding_openai = OpenAIEmbeddings(model=embedding_model)
+        # Embedding Model (OpenAI, Azure OpenAI or a local model, see scripts/embedders.py).
+        # For the local backends embedding_model is the directory of the model
+        if embedding_backend in ('sentence-transformers', 'onnx'):
+            embedding_model = os.getenv('EMBEDDING_MODEL_PATH', embedding_model)
+        self.embedder = create_embedder(embedding_backend, embedding_model)
+
+        # Token-aware embedding scheduler used when saving into the vector store (API backends only,
+        # the local models are batched by the embedder itself)
+        self.embedding_batcher = None
+        if embedding_backend == 'openai':
+            self.embedding_batcher = EmbeddingBatcher(model=embedding_model)
+        elif embedding_backend == 'azure':
+            self.embedding_batcher = EmbeddingBatcher(model=embedding_model, client=AzureOpenAI(
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=AZURE_OPENAI_API_VERSION,
+                max_retries=0,
+            ))
+        self.embed_texts = self.embedding_batcher.embed_texts if self.embedding_batcher else self.embedder.embed_documents
+
+        # Persistent cache of chunk embeddings, consulted before any embedding request
+        self.embedding_cache = EmbeddingCache(absolute_path(embedding_cache_directory),
+                                              model=embedder_cache_key(embedding_backend, embedding_model))
+
+        # Root of the source tree and known vendors, used to derive the partition keys of every chunk
+        self.base_path = base_path
+        self.vendors = load_vendors()
+        self.partition_catalog = PartitionCatalog(absolute_path(partition_catalog_file))
+
+        # MinHash/LSH index used to collapse near-identical chunks (None disables it)
+        self.near_duplicates = None
+        if near_duplicate_threshold:
+            self.near_duplicates = NearDuplicateIndex(absolute_path(near_duplicate_file), threshold=near_duplicate_threshold)
 
         # Verify the data directory
         os.makedirs(self.data_directory, exist_ok=True)  # Create the directory and any necessary parent directories
@@ -75,10 +170,16 @@ class ProcessData:
         # Define the vector store
         self.vector_store = Chroma(
                     collection_name="apec_vectorstores",
-                    embedding_function=self.embedding_openai,
+                    embedding_function=self.embedder,
                     persist_directory=self.data_directory,  
                 )
 
+        # BM25 index of the same chunks, used by the retrieval for codes and part numbers
+        self.lexical_index = LexicalIndex(lexical_index_path(self.data_directory))
+
+        # Roll back the partial writes of an interrupted run, so those files are processed again
+        self.recover_interrupted_files()
+
     def load_processed_files(self):
         """
         Loads the processed files from the history file into a list
@@ -89,96 +190,216 @@ class ProcessData:
         except FileNotFoundError:
             return set()
         
-    def remove_repeated_phrases(self, text, n_words=8):
+    def check_file(self, filepath: str, local_path: str = None, file_stat: tuple = None):
         """
-        Esta función divide el texto en bloques de n palabras y elimina 
-        aquellos bloques que se repiten consecutivamente, ya estén pegados o no.
-        
-        :param text: Texto procesado hasta este punto.
-        :param n_words: Definir el tamaño de bloques de palabras a comparar (por ejemplo, 8 palabras por bloque).
-        :return: Texto con bloques repetidos eliminados.
-        """
-        # Dividir en palabras
-        words = text.split()
-
-        # Procesar por bloques de n palabras consecutivas
-        result = []
-        i = 0
-        while i < len(words):
-            # Tomamos un bloque de n palabras
-            block = ' '.join(words[i:i + n_words])
-            
-            # Solo añadimos el bloque si no es igual al último añadido
-            if not result or block != result[-1]:
-                result.append(block)
+        Checks the file against the manifest and drops the stale vectors of modified files
+        :param filepath: The path to the file
+        :param local_path: Local copy of the file when it is not read from filepath (e.g. a downloaded blob)
+        :param file_stat: (size, mtime) of the original file when it is not on the local disk
+        :return: (True if the file must be processed, (content_hash, size, mtime))
+        """
+        status, content_hash, size, mtime = self.manifest.check_file(filepath, local_path, file_stat)
+        file_info = (content_hash, size, mtime)
 
-            i += n_words  # Movernos al siguiente bloque
-            
-        # Unir bloques de nuevo en una cadena
-        return ' '.join(result)    
+        if status == IngestionManifest.UNCHANGED:
+            print(f"{filepath} already processed. Skipping.")
+            return False, file_info
 
-    def preprocess_page_content(self, text):
+        if self.manifest.get_file(filepath) is not None:
+            # Modified file: its previous content is no longer valid
+            print(f"{filepath} was modified. Re-indexing.")
+            self.remove_file_from_vector_store(filepath)
+
+        if status == IngestionManifest.ALIAS:
+            # Same content already indexed from another path, no need to embed it again
+            print(f"{filepath} has the same content as an indexed file. Skipping.")
+            self.manifest.register_file(filepath, content_hash, size, mtime)
+            return False, file_info
+
+        return True, file_info
+
+    def buffer_documents(self, documents: list, content_hash: str) -> list:
         """
-        Performs preprocessing on the text to remove irrelevant characters/services and normalize the text.
-        It removes strange or repetitive characters and normalizes excess whitespace.
+        Puts the documents in the buffer, saving the buffer into the vector store when it is full
+        :param documents: Chunks of a file, with their location and index in the metadata
+        :param content_hash: Hash of the file content, used to derive the IDs of the chunks
+        :return: The IDs assigned to the documents
         """
-        # Convert to lowercase
-        processed_text = text.lower()
+        ids = [chunk_id(content_hash, chunk_location(doc.metadata), doc.metadata['index']) for doc in documents]
 
-        # Step 1: Remove sequences starting with "/" and with "\"
-        processed_text = re.sub(r'/\S+', ' ', processed_text)  # Remove sequences like "/..."
-        processed_text = re.sub(r'\\\S+', ' ', processed_text)  # Remove sequences like "\..."
+        self.documents.extend(documents)
+        self.document_ids.extend(ids)
+        self.buffer_bytes += sum(sys.getsizeof(doc.page_content) for doc in documents)
 
-        # Step 2: Remove placeholders with underscores like "fp__&__"
-        processed_text = re.sub(r'\b\w+__&__\b', ' ', processed_text)
+        # If there are many documents, save and free the memory
+        if len(self.documents) >= self.flush_threshold or self.buffer_bytes >= self.buffer_memory_budget:
+            self.flush_documents()
 
-        # Step 3: Remove lines with more than three consecutive hyphens (---)
-        processed_text = re.sub(r'-{3,}', ' ', processed_text)
+        return ids
 
-        # Step 4: Remove non-ASCII characters (only retain printable ASCII)
-        processed_text = re.sub(r'[^\x20-\x7E]', ' ', processed_text)
+    def flush_documents(self):
+        """
+        Saves the buffered documents into the vector store and clears the buffer
+        """
+        if not self.documents:
+            return
 
-        # Step 5: Remove emojis and other rare alphanumeric characters
-        # We use a regular expression to remove emojis (common Unicode emoji ranges) and other unusual characters.
-        emoji_pattern = re.compile("["
-            u"\U0001F600-\U0001F64F"  # Emoticons
-            u"\U0001F300-\U0001F5FF"  # Symbols & pictographs
-            u"\U0001F680-\U0001F6FF"  # Transport and map symbols
-            u"\U0001F1E0-\U0001F1FF"  # Flags (iOS)
-            u"\u2600-\u26FF"          # Miscellaneous symbols
-            u"\u2700-\u27BF"          # Dingbats
-            "]+", flags=re.UNICODE)
-        processed_text = emoji_pattern.sub(r' ', processed_text)  # Remove emojis
+        # Write-ahead: record the chunks before they reach the vector store
+        self.manifest.journal_chunks([(doc_id, doc.metadata['source'])
+                                      for doc_id, doc in zip(self.document_ids, self.documents)])
 
-        # processed_text = re.sub(r"\b(?:\d{1,3}\.){3}\d{1,3}\b", " ", processed_text)  # Optionally remove IP addresses
-        processed_text = re.sub(r"\d{2,}\b", " ", processed_text)  # Remove larger numbers likely not semantically important
+        status_save = self.save_procceced_data_into_vector_store()
+        if status_save == 'Success':
+            self.documents = []  # Clear documents to free memory
+            self.document_ids = []
+            self.buffer_bytes = 0
+            print("Data was processed and saved")
 
-        # Remove excessive punctuation (replace sequences of dots, commas, etc. with a single space)
-        processed_text = re.sub(r"[.,:;!]+", " ", processed_text)
+            # All the chunks of the pending files are committed now
+            self.commit_pending_files()
 
-        # Remove standalone numbers that add little semantic value
-        processed_text = re.sub(r'\b\d+\b', ' ', processed_text)
+    def register_processed_file(self, filepath: str, file_info: tuple, chunk_ids: list):
+        """
+        Records a processed file once its chunks are buffered. The file is only marked as done in the
+        manifest and the history when all its chunks are committed in the vector store
+        """
+        self.pending_files.append((filepath, file_info, chunk_ids))
 
-        # Step 9: Remove all single characters except numbers (remove chars like 'a', '-', '%')
-        processed_text = re.sub(r'\b[^0-9\s]\b', ' ', processed_text)
+        if not self.documents:
+            # The last flush already saved all its chunks
+            self.commit_pending_files()
 
-        # Step 6: Remove generic placeholders and example values (e.g., xx, xxx, YYYY, mm-dd, etc.)
-        processed_text = re.sub(r'\b(?:xx|xxx|xxxx|mm-dd(?:-yy)?|yyyy)\b', ' ', processed_text)
+    def commit_pending_files(self):
+        """
+        Marks as done the pending files, their chunks are already in the vector store
+        """
+        if not self.pending_files:
+            return
 
-        # \b - word boundary, (?=[\w]*\d) - ensures there's at least one digit, (?=[\w]*[a-zA-Z]) ensures there's at least one letter
-        processed_text = re.sub(r'\b(?=[\w]*\d)(?=[\w]*[a-zA-Z])\w+\b', ' ', processed_text)
+        self.manifest.commit_files(self.pending_files)
+
+        with open(self.history_file, 'a') as file:
+            for filepath, _, _ in self.pending_files:
+                self.processed_files.add(filepath)  # Add to in-memory history
+                file.write(filepath + "\n")
 
-        # Step 7: Remove excessive whitespace (reduce multiple spaces to a single space)
-        processed_text = re.sub(r'\s+', ' ', processed_text).strip()
+        self.pending_files = []
 
-        # Step 8: Remove consecutive repeated words
-        words = processed_text.split()
-        processed_text = ' '.join([words[i] for i in range(len(words)) if i == 0 or words[i] != words[i-1]])
+    def discard_file(self, filepath: str):
+        """
+        Drops the chunks of a file that failed in the middle of its processing:
+        the ones still in the buffer and the ones already written to the vector store
+        """
+        kept = [(doc_id, doc) for doc_id, doc in zip(self.document_ids, self.documents)
+                if doc.metadata.get('source') != filepath]
+        self.document_ids = [doc_id for doc_id, _ in kept]
+        self.documents = [doc for _, doc in kept]
+        self.buffer_bytes = sum(sys.getsizeof(doc.page_content) for doc in self.documents)
+
+        written_ids = self.manifest.journaled_chunks().get(filepath, [])
+        if written_ids:
+            self.vector_store._collection.delete(ids=written_ids)
+            if self.near_duplicates is not None:
+                self.near_duplicates.remove(written_ids)
+            self.lexical_index.remove(written_ids)
+            # The chunks collapsed into chunks of other files no longer exist either
+            self.update_other_sources(self.manifest.remove_references(written_ids), filepath)
+        self.manifest.clear_journal(filepath)
+
+    def recover_interrupted_files(self):
+        """
+        Deletes from the vector store the chunks of the files that were being written when the
+        previous run stopped. Those files were never registered, so they are processed again
+        """
+        interrupted_files = self.manifest.journaled_chunks()
+        if not interrupted_files:
+            return
+
+        collection = self.vector_store._collection
+        for filepath, chunk_ids in interrupted_files.items():
+            print(f"Rolling back {len(chunk_ids)} chunks of interrupted file {filepath}")
+            for start in range(0, len(chunk_ids), CHROMA_MAX_BATCH_SIZE):
+                collection.delete(ids=chunk_ids[start:start + CHROMA_MAX_BATCH_SIZE])
+            if self.near_duplicates is not None:
+                self.near_duplicates.remove(chunk_ids)
+            self.lexical_index.remove(chunk_ids)
+            self.update_other_sources(self.manifest.remove_references(chunk_ids), filepath)
+
+        self.manifest.clear_journal()
+
+    def remove_file_from_vector_store(self, filepath: str):
+        """
+        Removes a file from the manifest and deletes its stale chunks from the vector store.
+        If the same content still exists in another path, the chunks are re-pointed to it instead.
+        """
+        kept_ids = self.manifest.kept_chunks_of_file(filepath)
+        stale_ids, other_path = self.manifest.release_file(filepath)
+        collection = self.vector_store._collection
+
+        if other_path is None:
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+                if self.near_duplicates is not None:
+                    self.near_duplicates.remove(stale_ids)
+                self.lexical_index.remove(stale_ids)
+            # Chunks indexed before the manifest existed are only known by their source
+            collection.delete(where={'source': filepath})
+            self.lexical_index.remove_source(filepath)
+        else:
+            records = collection.get(where={'source': filepath}, include=['metadatas'])
+            if records['ids']:
+                collection.update(ids=records['ids'],
+                                  metadatas=[dict(metadata, source=other_path) for metadata in records['metadatas']])
+            self.lexical_index.move_source(filepath, other_path)
+
+        # The chunks of other files that this file was collapsed into no longer cite it (or cite the other path)
+        self.update_other_sources(kept_ids, filepath, other_path)
+
+        self.processed_files.discard(filepath)
+
+    def update_other_sources(self, kept_ids: list, source: str, new_source: str = None):
+        """
+        Removes a file from the 'other_sources' metadata of the chunks its near duplicates were collapsed into
+        :param kept_ids: IDs of the kept chunks
+        :param source: File that no longer has those chunks
+        :param new_source: File with the same content that replaces it, if any
+        """
+        collection = self.vector_store._collection
+        for start in range(0, len(kept_ids), CHROMA_MAX_BATCH_SIZE):
+            records = collection.get(ids=kept_ids[start:start + CHROMA_MAX_BATCH_SIZE], include=['metadatas'])
+            ids, metadatas = [], []
+            for record_id, metadata in zip(records['ids'], records['metadatas']):
+                other_sources = set(filter(None, metadata.get('other_sources', '').split('|')))
+                if source not in other_sources:
+                    continue
+                other_sources.discard(source)
+                if new_source is not None and new_source != metadata.get('source'):
+                    other_sources.add(new_source)
+                ids.append(record_id)
+                metadatas.append(dict(metadata, other_sources='|'.join(sorted(other_sources))))
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                self.lexical_index.update_metadatas(ids, metadatas)
+
+    def remove_deleted_files(self, base_path: str):
+        """
+        Removes from the vector store the files under base_path that no longer exist on disk
+        """
+        deleted_files = self.manifest.missing_files(base_path)
+        for filepath in deleted_files:
+            print(f"{filepath} was deleted. Removing its vectors.")
+            self.remove_file_from_vector_store(filepath)
 
-        # Step 9: Process repetitive phrases and remove them
-        processed_text = self.remove_repeated_phrases(processed_text)
+        return len(deleted_files)
 
-        return processed_text
+    def preprocess_page_content(self, text):
+        """
+        Performs preprocessing on the text to remove irrelevant characters/services and normalize the text.
+        It removes strange or repetitive characters and normalizes excess whitespace.
+        The precompiled normalizer gives exactly the same output as the original step-by-step passes
+        (see benchmark_text_normalizer.py).
+        """
+        return normalize_text(text)
 
 
     def filter_documents(self, documents: list):
@@ -192,10 +413,10 @@ class ProcessData:
             """Verifica si el texto contiene solo números y símbolos (sin caracteres alfabéticos)."""
             return not any(char.isalpha() for char in text)
 
-        for doc in documents:
-            # Preprocess the page content before doing any checks
-            page_content = self.preprocess_page_content(doc.page_content)
+        # Preprocess the page content of all the documents before doing any checks
+        page_contents = normalize_texts([doc.page_content for doc in documents])
 
+        for doc, page_content in zip(documents, page_contents):
             if len(page_content) < 25:
                 # Skip fragments that are too short
                 continue
@@ -203,7 +424,9 @@ class ProcessData:
                 # Skip fragments that are just symbols and numbers
                 continue
 
-            # Update the document with the newly preprocessed page content
+            # Update the document with the newly preprocessed page content, keeping the raw text
+            # for the lexical index (the normalization removes the codes and part numbers)
+            doc.metadata[RAW_TEXT_KEY] = doc.page_content
             doc.page_content = page_content
 
             # Append filtered and preprocessed document
@@ -211,161 +434,319 @@ class ProcessData:
 
         return filtered_documents
 
-    def add_metadata(self, documents: list, type: str) -> list:
+    def add_metadata(self, documents: list, type: str, start_index: int = 0) -> list:
         """
-        Adds metadata to the documents
+        Adds metadata to the documents, including the partition keys (family, vendor and data type)
         """
-        for index, doc in enumerate(documents):
+        partition = {}
+        if documents and self.base_path:
+            partition = partition_metadata(documents[0].metadata['source'], self.base_path, self.vendors)
+
+        for index, doc in enumerate(documents, start=start_index):
             doc.metadata['type_data'] = type
             doc.metadata['index'] = index
+            doc.metadata.update(partition)
+            self.partition_catalog.add(doc.metadata)
 
         return documents
-    
-    def process_pdf(self, filepath: str):
+
+    def iter_pdf_chunks(self, filepath: str):
         """
-        This Method processes a PDF file and puts the documents into the self.documents list
+        Loads a PDF one page at a time and yields the filtered chunks of every page,
+        so a book is never fully held in memory
         :param filepath: The path to the PDF file
+        :return: Generator of lists of Documents
+        """
+        loader = PyPDFLoader(filepath)
+        for page in loader.lazy_load():
+            chunks = self.filter_documents(self.text_splitter.split_documents([page]))
+            if chunks:
+                yield chunks
+
+    def process_pdf(self, filepath: str, source_path: str = None, source_local_path: str = None, file_stat: tuple = None):
+        """
+        This Method processes a PDF file page by page and puts the documents into the self.documents list
+        :param filepath: The path to the PDF file
+        :param source_path: Original file when the PDF is a conversion of it or a downloaded blob. It is
+                            the file tracked in the manifest and the source stored in the metadata
+        :param source_local_path: Local copy of source_path, when source_path is not on the local disk
+        :param file_stat: (size, mtime) of source_path, when it is not on the local disk
         :return: 'Success' if the file was processed, 'Skipped' if it was already processed
         """
+        source_path = source_path or filepath
 
         try:
-            # Verify if the file was already processed
-            if filepath in self.processed_files:
-                print(f"{filepath} already processed. Skipping.")
+            # Verify if the file was already processed (or is unchanged since then)
+            must_process, file_info = self.check_file(source_path, source_local_path, file_stat)
+            if not must_process:
                 return 'Skipped'
 
-            # Load the file
-            loader = PyPDFLoader(filepath)
-            data = loader.load()
-
-            # Split the text into chunks
-            documents_pdf = self.text_splitter.split_documents(data)
-            print("Number of documents:", len(documents_pdf))
-
-            # Filter the documents
-            documents_pdf = self.filter_documents(documents_pdf)
-
-            # Add metadata to the documents
-            documents_pdf = self.add_metadata(documents_pdf, type='text')
-            # print(documents_pdf)
-            if not documents_pdf:
+            # Stream the pages: split, filter, add metadata and buffer the chunks of every page
+            peak_rss = current_rss_bytes()
+            chunk_ids = []
+            for documents_pdf in self.iter_pdf_chunks(filepath):
+                if source_path != filepath:
+                    for doc in documents_pdf:
+                        doc.metadata['source'] = source_path
+                documents_pdf = self.add_metadata(documents_pdf, type='text', start_index=len(chunk_ids))
+                chunk_ids.extend(self.buffer_documents(documents_pdf, file_info[0]))
+                peak_rss = max(peak_rss, current_rss_bytes())
+
+            print(f"Number of documents: {len(chunk_ids)} (peak RSS {peak_rss / 1024 / 1024:.0f} MB)")
+
+            if not chunk_ids:
+                # Nothing useful in the file, record it so it is not read again
+                self.manifest.register_file(source_path, *file_info)
                 return False
-            
-            # Save the processed data
-            self.documents.extend(documents_pdf)
-
-            # If there are many documents, save and free the memory
-            if len(self.documents) > 50:
-                status_save = self.save_procceced_data_into_vector_store()
-                if status_save == 'Success':
-                    self.documents = []  # Clear documents to free memory
-                    print("Data was processed and saved")
 
             # Save the file in the history after processing
-            self.processed_files.add(filepath)  # Add to in-memory history
-            with open(self.history_file, 'a') as file:
-                file.write(filepath + "\n")
+            self.register_processed_file(source_path, file_info, chunk_ids)
 
             # Clean the memory
-            del loader, data
             gc.collect()
 
             return 'Success'
         except Exception as e:
-            print(f"Error processing file {filepath}: {e}")
+            print(f"Error processing file {source_path}: {e}")
+            self.discard_file(source_path)
             with open(self.error_file, 'a') as file:
-                file.write(filepath + str(e) + "\n")
+                file.write(source_path + str(e) + "\n")
             return 'Error'
         
 
-    def process_tabular(self, filepath: str):
+    def process_tabular(self, filepath: str, source_path: str = None, file_stat: tuple = None):
         """
         This Method processes a PDF file and puts the documents into the self.documents list
         :param filepath: The path to the PDF file
+        :param source_path: Original path of the file when filepath is a local copy of it (e.g. a downloaded blob)
+        :param file_stat: (size, mtime) of source_path, when it is not on the local disk
         :return: 'Success' if the file was processed, 'Skipped' if it was already processed
         """
+        local_path = filepath if source_path else None
+        source_path = source_path or filepath
 
         try:
-            # Verify if the file was already processed
-            if filepath in self.processed_files:
-                print(f"{filepath} already processed. Skipping.")
+            # Verify if the file was already processed (or is unchanged since then)
+            must_process, file_info = self.check_file(source_path, local_path, file_stat)
+            if not must_process:
                 return 'Skipped'
 
-            # Load the file with pandas
-            df = pd.read_excel(filepath)
-
-            # Build Documents with the information
-            documents_xls = []
-            for _, row in df.iterrows():
-                # Filtrar columnas que no estén nombradas (evitar "Unnamed")
-                valid_columns = [col for col in df.columns if not col.startswith('Unnamed')]
-                
-                # Comprobar que la fila tiene al menos un valor no nulo en las columnas válidas
-                if not row[valid_columns].isnull().all():
-                    # Crear un string para cada fila concatenando "Columna: Valor" para cada columna
-                    page_content = "\n".join([f"{col}: {row[col]}" for col in valid_columns if pd.notnull(row[col])])
-
-                    # Agregar el string de la fila a la lista resultado
-                    documents_xls.append(Document(page_content=page_content, metadata={'source': filepath}))
+            # Serialize the rows of all the sheets into documents of about the size of a chunk
+            documents_xls = list(build_tabular_documents(filepath, max_chars=self.text_splitter._chunk_size))
 
             # Filter the documents
             documents_xls = self.filter_documents(documents_xls)
 
+            if local_path:
+                for doc in documents_xls:
+                    doc.metadata['source'] = source_path
+
             # Add metadata to the documents
             documents_xls = self.add_metadata(documents_xls, type='tabular')
 
             if not documents_xls:
+                # Nothing useful in the file, record it so it is not read again
+                self.manifest.register_file(source_path, *file_info)
                 return False
             
             # Save the processed data
-            self.documents.extend(documents_xls)
-
-            # If there are many documents, save and free the memory
-            if len(self.documents) > 50:
-                status_save = self.save_procceced_data_into_vector_store()
-                if status_save == 'Success':
-                    self.documents = []  # Clear documents to free memory
-                    print("Data was processed and saved")
-
-            # Save the file in the history after processing
-            self.processed_files.add(filepath)  # Add to in-memory history
-            with open(self.history_file, 'a') as file:
-                file.write(filepath + "\n")
+            chunk_ids = self.buffer_documents(documents_xls, file_info[0])
+            self.register_processed_file(source_path, file_info, chunk_ids)
 
             # Clean the memory
-            del df
             gc.collect()
             return 'Success'
         
         except Exception as e:
-            print(f"Error processing file {filepath}: {e}")
+            print(f"Error processing file {source_path}: {e}")
+            self.discard_file(source_path)
+            with open(self.error_file, 'a') as file:
+                file.write(source_path + str(e) + "\n")
+            return 'Error'
+
+    def process_native(self, filepath: str, source_path: str = None, file_stat: tuple = None):
+        """
+        This Method processes a txt/html/docx/pptx file without converting it to PDF
+        and puts the documents into the self.documents list
+        :param filepath: The path to the file
+        :param source_path: Original path of the file when filepath is a local copy of it (e.g. a downloaded blob)
+        :param file_stat: (size, mtime) of source_path, when it is not on the local disk
+        :return: 'Success' if the file was processed, 'Skipped' if it was already processed
+        """
+        local_path = filepath if source_path else None
+        source_path = source_path or filepath
+
+        try:
+            # Verify if the file was already processed (or is unchanged since then)
+            must_process, file_info = self.check_file(source_path, local_path, file_stat)
+            if not must_process:
+                return 'Skipped'
+
+            # Load the sections of the file and split them into chunks
+            documents_native = self.text_splitter.split_documents(load_native_documents(filepath))
+            print("Number of documents:", len(documents_native))
+
+            # Filter the documents
+            documents_native = self.filter_documents(documents_native)
+
+            if local_path:
+                for doc in documents_native:
+                    doc.metadata['source'] = source_path
+
+            # Add metadata to the documents
+            documents_native = self.add_metadata(documents_native, type='text')
+
+            if not documents_native:
+                # Nothing useful in the file, record it so it is not read again
+                self.manifest.register_file(source_path, *file_info)
+                return False
+
+            # Save the processed data
+            chunk_ids = self.buffer_documents(documents_native, file_info[0])
+            self.register_processed_file(source_path, file_info, chunk_ids)
+
+            return 'Success'
+
+        except Exception as e:
+            print(f"Error processing file {source_path}: {e}")
+            self.discard_file(source_path)
             with open(self.error_file, 'a') as file:
-                file.write(filepath + str(e) + "\n")
+                file.write(source_path + str(e) + "\n")
             return 'Error'
         
     def save_procceced_data_into_vector_store(self):
         """
-        Saves the processed data into a vector store
+        Saves the processed data into a vector store. The IDs are deterministic, so the chunks
+        that are already in the collection are skipped (upsert without re-embedding)
         :param documents_to_save: List of processed documents
         :return: 'Success' if saved successfully
         """
-        # Save the data in the vector store
-        uuids = [str(uuid4()) for _ in range(len(self.documents))]
+        collection = self.vector_store._collection
+
+        # Chunks not in the vector store yet (the same ID can also appear twice in the buffer
+        # when two copies of a file are processed in the same run)
+        existing_ids = set()
+        for start in range(0, len(self.document_ids), CHROMA_MAX_BATCH_SIZE):
+            existing_ids.update(collection.get(ids=self.document_ids[start:start + CHROMA_MAX_BATCH_SIZE], include=[])['ids'])
 
-        self.vector_store.add_documents(documents=self.documents, ids=uuids)
+        new_documents = {}
+        for doc_id, doc in zip(self.document_ids, self.documents):
+            if doc_id not in existing_ids and doc_id not in new_documents:
+                new_documents[doc_id] = doc
+
+        if len(new_documents) < len(self.documents):
+            print(f"Skipping {len(self.documents) - len(new_documents)} chunks already in the vector store")
+
+        # Near-identical chunks (e.g. revisions of the same manual) are stored once in the vector store,
+        # but all of them are indexed for the lexical search (their codes can differ)
+        collapsed_documents = {}
+        if self.near_duplicates is not None:
+            new_documents, collapsed_documents = self.collapse_near_duplicates(new_documents)
+
+        if collapsed_documents:
+            collapsed_texts, collapsed_metadatas = split_raw_texts(list(collapsed_documents.values()))
+            self.lexical_index.add(list(collapsed_documents), collapsed_texts, collapsed_metadatas)
+
+        if not new_documents:
+            return 'Success'
+
+        # Save the data in the vector store
+        uuids = list(new_documents)
+        documents = list(new_documents.values())
+        raw_texts, metadatas = split_raw_texts(documents)
+
+        # Embed the new chunks that are not cached with token-packed, concurrent requests
+        embeddings = self.embedding_cache.embed_with_cache([doc.page_content for doc in documents],
+                                                           self.embed_texts)
+
+        # Write the precomputed embeddings respecting the maximum batch size of Chroma
+        for start in range(0, len(documents), CHROMA_MAX_BATCH_SIZE):
+            end = start + CHROMA_MAX_BATCH_SIZE
+            collection.upsert(
+                ids=uuids[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end],
+                documents=[doc.page_content for doc in documents[start:end]],
+            )
+
+        # Index the same chunks for the lexical search
+        self.lexical_index.add(uuids, raw_texts, metadatas)
+
+        if self.near_duplicates is not None:
+            self.near_duplicates.commit()
 
         return 'Success'
 
+    def collapse_near_duplicates(self, new_documents: dict) -> dict:
+        """
+        Keeps only the chunks that are not near duplicates of a chunk already indexed (or of a previous
+        chunk of the buffer). The source of every collapsed chunk is added to the 'other_sources'
+        metadata of the chunk that is kept. The signatures use the raw text: the normalized one has
+        no numbers or codes, so chunks differing only in part numbers or error codes would match
+        :param new_documents: Dictionary chunk ID -> Document of the chunks to write
+        :return: (chunk ID -> Document of the chunks that must really be written,
+                  chunk ID -> Document of the collapsed chunks)
+        """
+        kept_documents, collapsed_documents, references, other_sources = {}, {}, [], {}
+
+        for doc_id, doc in new_documents.items():
+            signature = self.near_duplicates.signature(doc.metadata.get(RAW_TEXT_KEY) or doc.page_content)
+            duplicate_of = self.near_duplicates.find(signature)
+            self.near_duplicates.checked += 1
+
+            # A chunk can match itself when a failed flush is retried
+            if duplicate_of is None or duplicate_of == doc_id:
+                kept_documents[doc_id] = doc
+                self.near_duplicates.add(doc_id, signature)
+            else:
+                collapsed_documents[doc_id] = doc
+                references.append((doc_id, duplicate_of))
+                other_sources.setdefault(duplicate_of, set()).add(doc.metadata['source'])
+                self.near_duplicates.collapsed += 1
+
+        if not references:
+            return kept_documents, collapsed_documents
+
+        print(f"Collapsed {len(references)} near-duplicate chunks")
+
+        def merge_sources(metadata: dict, sources: set) -> dict:
+            current = set(filter(None, metadata.get('other_sources', '').split('|')))
+            merged = (current | sources) - {metadata.get('source')}
+            return dict(metadata, other_sources='|'.join(sorted(merged)))
+
+        # Chunks kept from this buffer
+        stored_ids = []
+        for kept_id, sources in other_sources.items():
+            if kept_id in kept_documents:
+                doc = kept_documents[kept_id]
+                doc.metadata = merge_sources(doc.metadata, sources)
+            else:
+                stored_ids.append(kept_id)
+
+        # Chunks kept from previous runs
+        collection = self.vector_store._collection
+        for start in range(0, len(stored_ids), CHROMA_MAX_BATCH_SIZE):
+            records = collection.get(ids=stored_ids[start:start + CHROMA_MAX_BATCH_SIZE], include=['metadatas'])
+            metadatas = [merge_sources(metadata, other_sources[record_id])
+                         for record_id, metadata in zip(records['ids'], records['metadatas'])]
+            collection.update(ids=records['ids'], metadatas=metadatas)
+            self.lexical_index.update_metadatas(records['ids'], metadatas)
+
+        self.manifest.add_references(references)
+        return kept_documents, collapsed_documents
+
 
 # Define the base path to process the data
 base_path = os.getenv('BASE_PATH_PIPELINE')
 
-# Create an Object to process the data
-process_data = ProcessData()
 base_path = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), base_path))
 
-# List of file extensions that can be converted to PDF
-convertible_to_pdf = ['.docx', '.doc', '.txt', '.html', '.htm', '.xml', '.rtf', '.pptx', '.ppt']
+# Create an Object to process the data
+process_data = ProcessData(base_path=base_path)
+
+# List of file extensions parsed directly and the ones that still have to be converted to PDF
+native_formats = NATIVE_FORMATS
+convertible_to_pdf = ['.doc', '.xml', '.rtf', '.ppt']
 tabular_files = ['.xlsx', '.xls']
 
 # Function to convert files to PDF using Pandoc
@@ -380,86 +761,207 @@ def convert_to_pdf_pandoc(file_path, output_pdf_path):
         print(traceback.format_exc())  # Log the detailed error trace
         return False
 
-# Function to convert files to PDF using LibreOffice if Pandoc fails
-def convert_to_pdf_libreoffice(input_file, output_dir):
-    try:
-        print(f"Trying to convert with LibreOffice: {input_file}")
-        # Run LibreOffice in terminal to convert the file to PDF
-        subprocess.run(['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', output_dir, input_file], check=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error converting {input_file} to PDF with LibreOffice: {e}")
-        return False
+# Pool of warm LibreOffice instances, the converted PDFs are cached outside the source tree
+conversion_service = ConversionService(
+    cache_directory=absolute_path("../data/converted_pdfs"),
+    instances=int(os.getenv('CONVERSION_INSTANCES', '4')),
+    timeout=float(os.getenv('CONVERSION_TIMEOUT', '120')),
+)
+atexit.register(conversion_service.stop)
 
 # Function to log files that fail to convert to PDF
 def log_failed_file(file_path):
-    with open(process_data.error_files, 'a') as error_log:
+    with open(process_data.error_file, 'a') as error_log:
         error_log.write(file_path + '\n')  # Add the failed file to the error log
 
-# Iterate over all files in the directory
-for dirpath, dirnames, filenames in os.walk(base_path):
-    for filename in filenames:
-        # Extract the file extension
-        file_extension = os.path.splitext(filename)[1].lower()
+# Function to convert files to PDF in parallel (or take them from the cache) and process the PDFs
+def convert_and_process(file_paths):
+    pending_files = []
+    for original_file_path in file_paths:
+        # PDFs converted next to the source by previous versions are processed as any other PDF
+        legacy_pdf_path = os.path.splitext(original_file_path)[0] + '.pdf'
+        if os.path.exists(legacy_pdf_path):
+            print(f"{legacy_pdf_path} already exists. Skipping conversion.")
+        elif process_data.manifest.check_file(original_file_path)[0] == IngestionManifest.UNCHANGED:
+            print(f"File {original_file_path} has already been processed.")
+        else:
+            pending_files.append(original_file_path)
+
+    if not pending_files:
+        return
+
+    print(f"Converting {len(pending_files)} files to PDF with {conversion_service.number_instances} office instances")
+    converted_files = conversion_service.convert_many(pending_files)
+
+    for original_file_path, pdf_path in converted_files.items():
+        # If LibreOffice fails, try with Pandoc
+        if pdf_path is None:
+            pdf_path = conversion_service.convert_with(original_file_path, convert_to_pdf_pandoc)
+            if pdf_path is None:
+                # If all conversion attempts failed, log the file
+                print(f"All conversion methods failed for {original_file_path}. Logging error.")
+                log_failed_file(original_file_path)
+                continue
 
-        # If the file is already a PDF, process it as usual
-        if file_extension == '.pdf':
-            pdf_path = os.path.join(dirpath, filename)
-            result = process_data.process_pdf(pdf_path)
+        result = process_data.process_pdf(pdf_path, source_path=original_file_path)
+
+        if result == 'Success':
+            print("Number of files processed: ", len(process_data.processed_files))
+        else:
+            print(f"File {pdf_path} processed but not marked as successful.")
+
+    print(f"Conversion stats: {conversion_service.stats}")
+
+# Files that must be converted to PDF, they are converted together after the walk
+files_to_convert = []
+
+# Discover the files before processing them: type sniffing, skip rules and prioritized work list
+kinds_by_extension = {'.pdf': 'pdf'}
+kinds_by_extension.update({extension: 'tabular' for extension in tabular_files})
+kinds_by_extension.update({extension: 'native' for extension in native_formats})
+kinds_by_extension.update({extension: 'convertible' for extension in convertible_to_pdf})
+
+scanner = FileScanner(kinds_by_extension,
+                      max_file_size_mb=float(os.getenv('DISCOVERY_MAX_FILE_MB', '500')),
+                      workers=int(os.getenv('DISCOVERY_WORKERS', '16')))
+
+# Read the files from the local mirror of the corpus ('local') or directly from Blob Storage ('blob')
+ingestion_source = os.getenv('INGESTION_SOURCE', 'local')
+
+def blob_container_client():
+    from azure.storage.blob import BlobServiceClient, ContainerClient
+
+    # Same connection parameters as data_to_blob_storage.py
+    container_name = os.getenv("AZURE_BLOB_CONTAINER", "johnny5-container")
+    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    if connection_string:
+        return BlobServiceClient.from_connection_string(connection_string).get_container_client(container_name)
+    return ContainerClient(account_url=os.getenv("AZURE_BLOB_SERVICE_URL"),
+                           credential=f"?{os.getenv('AZURE_BLOB_SAS_TOKEN')}",
+                           container_name=container_name)
+
+def process_blob_file(blob_file):
+    """
+    Processes a downloaded blob. The manifest and the metadata use its path in the local mirror layout
+    """
+    file_stat = (blob_file.size, blob_file.mtime)
+
+    # Type sniffing on the downloaded content
+    file_kind, reason = scanner.classify(blob_file.local_path, blob_file.size)
+    if file_kind is None:
+        print(f"Skipping {blob_file.source_path}: {reason}")
+        return None
+
+    if file_kind == 'pdf':
+        return process_data.process_pdf(blob_file.local_path, source_path=blob_file.source_path,
+                                        source_local_path=blob_file.local_path, file_stat=file_stat)
+    if file_kind == 'tabular':
+        return process_data.process_tabular(blob_file.local_path, source_path=blob_file.source_path, file_stat=file_stat)
+    if file_kind == 'native':
+        result = process_data.process_native(blob_file.local_path, source_path=blob_file.source_path, file_stat=file_stat)
+        if result != 'Error':
+            return result
+        print(f"Falling back to PDF conversion for {blob_file.source_path}")
+
+    # The temporary file is deleted after processing, so the conversion is done right away
+    pdf_path = conversion_service.convert(blob_file.local_path)
+    if pdf_path is None:
+        pdf_path = conversion_service.convert_with(blob_file.local_path, convert_to_pdf_pandoc)
+        if pdf_path is None:
+            print(f"All conversion methods failed for {blob_file.source_path}. Logging error.")
+            log_failed_file(blob_file.source_path)
+            return 'Error'
+    return process_data.process_pdf(pdf_path, source_path=blob_file.source_path,
+                                     source_local_path=blob_file.local_path, file_stat=file_stat)
+
+if ingestion_source == 'blob':
+    # Stream the blobs: they are listed, downloaded and processed at the same time, and the
+    # blobs with the same size and date as in the manifest are not even downloaded.
+    # The blobs are listed in another thread, so they are compared with a snapshot of the manifest
+    registered_files = process_data.manifest.files_with_prefix(base_path)
+    blob_source = BlobIngestionSource(blob_container_client(),
+                                      blob_prefix=os.getenv('INGESTION_BLOB_PREFIX', 'johnny5_data'),
+                                      base_path=base_path,
+                                      kinds_by_extension=kinds_by_extension,
+                                      skip_blob=lambda path, size, mtime: IngestionManifest.is_unchanged(registered_files.get(path), size, mtime),
+                                      temp_directory=os.getenv('INGESTION_TEMP_DIRECTORY'),
+                                      max_buffer_mb=int(os.getenv('INGESTION_BUFFER_MB', '1024')),
+                                      workers=int(os.getenv('BLOB_DOWNLOAD_WORKERS', '4')),
+                                      block_concurrency=int(os.getenv('BLOB_BLOCK_CONCURRENCY', '4')),
+                                      max_file_size_mb=scanner.max_file_size / 1024 / 1024)
+    try:
+        for blob_file in blob_source.iter_files():
+            try:
+                result = process_blob_file(blob_file)
+            finally:
+                blob_source.release(blob_file)
 
             if result == 'Success':
-                with open(process_data.history_file, 'r') as file:
-                    number_files = len(file.read().splitlines())
-                    print("Number of files processed: ", number_files)
+                print("Number of files processed: ", len(process_data.processed_files))
+    finally:
+        blob_source.close()
+    conversion_service.stop()
+    print(f"Blob source stats: {blob_source.stats}")
 
-        # Process tabular files            
-        elif file_extension in tabular_files:
-            xls_path = os.path.join(dirpath, filename)
-            result = process_data.process_tabular(xls_path)
+else:
+    work_list = scanner.scan(base_path)
+    scanner.print_summary()
 
-            if result == 'Success':
-                with open(process_data.history_file, 'r') as file:
-                    number_files = len(file.read().splitlines())
-                    print("Number of files processed: ", number_files)
+    # Process the files in priority order
+    for file_kind, file_path, file_size in work_list:
+        if file_kind == 'pdf':
+            result = process_data.process_pdf(file_path)
+
+        # Process tabular files
+        elif file_kind == 'tabular':
+            result = process_data.process_tabular(file_path)
+
+        # Parse txt/html/docx/pptx directly, converting to PDF only if they can not be parsed
+        elif file_kind == 'native':
+            result = process_data.process_native(file_path)
+
+            if result == 'Error':
+                print(f"Falling back to PDF conversion for {file_path}")
+                files_to_convert.append(file_path)
 
         # If the file can be converted to PDF
-        elif file_extension in convertible_to_pdf:
-            original_file_path = os.path.join(dirpath, filename)
-            output_pdf_name = os.path.splitext(filename)[0] + '.pdf'
-            output_pdf_path = os.path.join(dirpath, output_pdf_name)
-
-            # Convert only if the PDF file doesn't already exist or isn't processed
-            if not os.path.exists(output_pdf_path):
-                # 1. Try with Pandoc
-                conversion_success = convert_to_pdf_pandoc(original_file_path, output_pdf_path)
-
-                # 2. If Pandoc fails, try with LibreOffice
-                if not conversion_success:
-                    print(f"Trying alternative conversion for {filename} with LibreOffice")
-                    conversion_success = convert_to_pdf_libreoffice(original_file_path, dirpath)
-
-                # If any conversion was successful, process the PDF
-                if conversion_success:
-                    result = process_data.process_pdf(output_pdf_path)
-
-                    if result == 'Success':
-                        with open(process_data.history_file, 'r') as file:
-                            number_files = len(file.read().splitlines())
-                            print("Number of files processed: ", number_files)
-                    else:
-                        print(f"File {output_pdf_path} processed but not marked as successful.")
-                else:
-                    # If all conversion attempts failed, log the file
-                    print(f"All conversion methods failed for {original_file_path}. Logging error.")
-                    log_failed_file(original_file_path)
-
-            elif output_pdf_path not in process_data.processed_files:
-                # If the PDF file exists but wasn't processed, process it
-                result = process_data.process_pdf(output_pdf_path)
-
-                if result == 'Success':
-                    with open(process_data.history_file, 'r') as file:
-                        number_files = len(file.read().splitlines())
-                        print("Number of files processed: ", number_files)
-            else:
-                print(f"{output_pdf_name} already exists. Skipping conversion.")
\ No newline at end of file
+        else:
+            files_to_convert.append(file_path)
+            continue
+
+        if result == 'Success':
+            print("Number of files processed: ", len(process_data.processed_files))
+
+    # Convert and process the files that are not PDFs yet
+    convert_and_process(files_to_convert)
+    conversion_service.stop()
+
+# Save the chunks that are still in the buffer
+process_data.flush_documents()
+
+# Save the partition values for the query router
+process_data.partition_catalog.save()
+
+# Remove the vectors of the files that were deleted from the source tree (or from the container)
+if ingestion_source == 'blob':
+    number_deleted = 0
+    # Only when the whole container was listed, an interrupted listing would look like deleted files
+    if blob_source.listing_complete:
+        for filepath in process_data.manifest.files_with_prefix(base_path):
+            if filepath not in blob_source.seen_paths:
+                print(f"{filepath} was deleted from the container. Removing its vectors.")
+                process_data.remove_file_from_vector_store(filepath)
+                number_deleted += 1
+else:
+    number_deleted = process_data.remove_deleted_files(base_path)
+print("Number of deleted files removed from the vector store: ", number_deleted)
+
+if process_data.near_duplicates is not None:
+    print(f"Near-duplicate collapse: {process_data.near_duplicates.collapsed} of {process_data.near_duplicates.checked} "
+          f"new chunks not stored ({process_data.near_duplicates.shrink_rate():.1%} smaller index)")
+print(f"Embedding cache hit rate: {process_data.embedding_cache.hit_rate():.1%} "
+      f"({process_data.embedding_cache.hits} hits, {process_data.embedding_cache.misses} misses)")
+if process_data.embedding_batcher is not None:
+    print(f"Embedding throughput: {process_data.embedding_batcher.tokens_per_second():.0f} tokens/sec "
+          f"({process_data.embedding_batcher.stats['tokens']} tokens, "
+          f"{process_data.embedding_batcher.stats['rate_limited']} rate-limited requests)")
@@ -1,19 +1,33 @@
 import os
-from azure.storage.blob import BlobServiceClient, ContainerClient
+import json
+import time
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from azure.storage.blob import BlobServiceClient, ContainerClient, ContentSettings
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde el archivo .env
 load_dotenv(override=True)
 
+# Tamaño de bloque y límite de subida en una sola petición (los archivos mayores se suben en bloques paralelos)
+BLOCK_SIZE = 8 * 1024 * 1024
+
 # Parámetros de conexión (Usa SAS Token que configuraste antes)
 blob_service_url = os.getenv("AZURE_BLOB_SERVICE_URL")
 sas_token = f"?{os.getenv('AZURE_BLOB_SAS_TOKEN')}"
 
 # Inicializa el cliente de Blob Storage usando URL + SAS Token
-blob_service_client = BlobServiceClient(account_url=blob_service_url, credential=sas_token)
+# (o una cadena de conexión, por ejemplo "UseDevelopmentStorage=true" para probar con Azurite)
+connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+if connection_string:
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string, max_single_put_size=BLOCK_SIZE, max_block_size=BLOCK_SIZE)
+else:
+    blob_service_client = BlobServiceClient(account_url=blob_service_url, credential=sas_token, max_single_put_size=BLOCK_SIZE, max_block_size=BLOCK_SIZE)
 
 # Nombre del contenedor (previamente creado)
-container_name = "johnny5-container"
+container_name = os.getenv("AZURE_BLOB_CONTAINER", "johnny5-container")
 container_client = blob_service_client.get_container_client(container_name)
 
 # Ruta de la carpeta local (usa rutas absolutas o relativas sin "normpath")
@@ -32,12 +46,111 @@ carpeta_madre_blob = "johnny5_data"  # Cambia esto por cualquier nombre que pref
 # Extensiones permitidas para subir (ajusta según las que quieras permitir)
 allowed_extensions = [".pdf", ".txt", ".png", ".xlsx", "xls", ".csv", ".jpg", ".jpeg", ".docx", ".doc"]
 
+# Número de archivos subidos a la vez y de bloques en paralelo por archivo grande
+upload_workers = int(os.getenv("BLOB_UPLOAD_WORKERS", "8"))
+block_concurrency = int(os.getenv("BLOB_BLOCK_CONCURRENCY", "4"))
+
+# Manifiesto local con el MD5 de cada archivo subido (evita recalcular el hash de los archivos sin cambios)
+upload_manifest_file = absolute_path("../data/blob_upload_manifest.json")
+
+
+def file_md5(filepath, block_size=1024 * 1024):
+    """
+    Calcula el MD5 del contenido de un archivo leyéndolo por bloques
+    """
+    digest = hashlib.md5()
+    with open(filepath, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def load_upload_manifest():
+    try:
+        with open(upload_manifest_file, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_upload_manifest(manifest):
+    os.makedirs(os.path.dirname(upload_manifest_file), exist_ok=True)
+    temporary_file = upload_manifest_file + ".tmp"
+    with open(temporary_file, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temporary_file, upload_manifest_file)
+
+
+def list_remote_blobs():
+    """
+    Lista los blobs de la carpeta madre con su tamaño y su Content-MD5
+    """
+    remote_blobs = {}
+    for blob in container_client.list_blobs(name_starts_with=carpeta_madre_blob + "/"):
+        content_md5 = blob.content_settings.content_md5 if blob.content_settings else None
+        remote_blobs[blob.name] = (blob.size, bytes(content_md5) if content_md5 else None)
+    return remote_blobs
+
+
+def local_md5(file_path_on_local, manifest, manifest_lock):
+    """
+    MD5 de un archivo local, reutilizando el del manifiesto si el tamaño y la fecha no han cambiado
+    """
+    stat = os.stat(file_path_on_local)
+    with manifest_lock:
+        entry = manifest.get(file_path_on_local)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return base64.b64decode(entry["md5"]), stat.st_size
+
+    md5 = file_md5(file_path_on_local)
+    with manifest_lock:
+        manifest[file_path_on_local] = {"size": stat.st_size, "mtime": stat.st_mtime, "md5": base64.b64encode(md5).decode()}
+    return md5, stat.st_size
+
+
+def sync_file(file_path_on_local, file_path_on_blob, remote_blobs, manifest, manifest_lock):
+    """
+    Sube un archivo solo si no existe en el contenedor o si su contenido es distinto
+    :return: ('uploaded' | 'skipped', bytes subidos)
+    """
+    md5, size = local_md5(file_path_on_local, manifest, manifest_lock)
+
+    remote = remote_blobs.get(file_path_on_blob)
+    if remote is not None and remote[0] == size and remote[1] == md5:
+        return "skipped", 0
+
+    blob_client = container_client.get_blob_client(file_path_on_blob)
+
+    # Subir el archivo al contenedor en Azure Blob Storage. Los archivos grandes se suben por bloques en paralelo
+    # y el Content-MD5 se guarda en las propiedades del blob para poder compararlo en la siguiente ejecución
+    with open(file_path_on_local, "rb") as data:
+        blob_client.upload_blob(data, overwrite=True, length=size, max_concurrency=block_concurrency,
+                                content_settings=ContentSettings(content_md5=bytearray(md5)))
+
+    return "uploaded", size
+
+
 # Función para subir archivos
 def upload_files_with_allowed_extensions():
-    for root, dirs, files in os.walk(local_folder_path):
-        for file in files:
-            # Ignorar los archivos que no tengan las extensiones permitidas
-            if any(file.lower().endswith(ext) for ext in allowed_extensions):
+    start_time = time.perf_counter()
+
+    # Estado del contenedor y del último envío
+    remote_blobs = list_remote_blobs()
+    manifest = load_upload_manifest()
+    manifest_lock = threading.Lock()
+    print(f"Blobs existentes en '{carpeta_madre_blob}': {len(remote_blobs)}")
+
+    stats = {"uploaded": 0, "skipped": 0, "errors": 0, "bytes": 0, "ignored": 0}
+
+    with ThreadPoolExecutor(max_workers=upload_workers) as executor:
+        futures = {}
+        for root, dirs, files in os.walk(local_folder_path):
+            for file in files:
+                # Ignorar los archivos que no tengan las extensiones permitidas
+                if not any(file.lower().endswith(ext) for ext in allowed_extensions):
+                    stats["ignored"] += 1
+                    continue
+
                 # Construir la ruta relativa dentro del Blob respetando la estructura de carpetas
                 relative_path = os.path.relpath(os.path.join(root, file), local_folder_path)
 
@@ -46,20 +159,38 @@ def upload_files_with_allowed_extensions():
                 file_path_on_blob = os.path.join(carpeta_madre_blob, relative_path).replace("\\", "/")
                 file_path_on_local = os.path.join(root, file)
 
-                # Crear un cliente de blob para cada archivo
-                blob_client = container_client.get_blob_client(file_path_on_blob)
-
-                print(f"Subiendo archivo: {file_path_on_local} al Blob con ruta: {file_path_on_blob}")
-                
-                # Subir el archivo al contenedor en Azure Blob Storage
-                with open(file_path_on_local, "rb") as data:
-                    blob_client.upload_blob(data, overwrite=True)
-
-                print(f"Archivo '{file}' subido exitosamente al contenedor en ruta: {file_path_on_blob}")
-            else:
-                print(f"Se omitió el archivo '{file}' ya que no tiene una extensión permitida.")
-
-# Llamada a la función para comenzar la subida
-upload_files_with_allowed_extensions()
-
-print("Proceso de subida completado.")
\ No newline at end of file
+                future = executor.submit(sync_file, file_path_on_local, file_path_on_blob, remote_blobs, manifest, manifest_lock)
+                futures[future] = file_path_on_local
+
+        for number, future in enumerate(as_completed(futures), start=1):
+            file_path_on_local = futures[future]
+            try:
+                result, uploaded_bytes = future.result()
+                stats[result] += 1
+                stats["bytes"] += uploaded_bytes
+                if result == "uploaded":
+                    print(f"Archivo '{file_path_on_local}' subido exitosamente ({uploaded_bytes / 1024 / 1024:.2f} MB)")
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"Error subiendo el archivo '{file_path_on_local}': {e}")
+
+            # Guardar el manifiesto periódicamente por si el proceso se interrumpe
+            if number % 500 == 0:
+                with manifest_lock:
+                    save_upload_manifest(dict(manifest))
+
+    save_upload_manifest(manifest)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Subidos: {stats['uploaded']} archivos, {stats['bytes'] / 1024 / 1024:.2f} MB "
+          f"({stats['bytes'] / 1024 / 1024 / max(elapsed, 1e-9):.2f} MB/s)")
+    print(f"Sin cambios (omitidos): {stats['skipped']}, errores: {stats['errors']}, "
+          f"extensiones no permitidas: {stats['ignored']}, tiempo: {elapsed:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    # Llamada a la función para comenzar la subida
+    upload_files_with_allowed_extensions()
+
+    print("Proceso de subida completado.")
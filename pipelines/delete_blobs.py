@@ -1,33 +1,143 @@
 import os
-from azure.storage.blob import ContainerClient
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage.blob import BlobServiceClient, ContainerClient
+from dotenv import load_dotenv
 
-# Parámetros de conexión (SAS Token)
+# Cargar variables de entorno desde el archivo .env
+load_dotenv(override=True)
+
+# Máximo de blobs por petición batch del servicio
+BATCH_SIZE = 256
+
+# Parámetros de conexión (SAS Token, o cadena de conexión para probar con Azurite)
 blob_service_url = os.getenv("AZURE_BLOB_SERVICE_URL")
 sas_token = f"?{os.getenv('AZURE_BLOB_SAS_TOKEN')}"
+connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 
 # Nombre del contenedor
-container_name = "johnny5-container"
+container_name = os.getenv("AZURE_BLOB_CONTAINER", "johnny5-container")
 
 # Inicializa el cliente del contenedor
-container_client = ContainerClient(account_url=blob_service_url, credential=sas_token, container_name=container_name)
+if connection_string:
+    container_client = BlobServiceClient.from_connection_string(connection_string).get_container_client(container_name)
+else:
+    container_client = ContainerClient(account_url=blob_service_url, credential=sas_token, container_name=container_name)
 
-# Función para eliminar todos los blobs del contenedor
-def delete_all_blobs():
-    blobs = container_client.list_blobs()
-    blob_count = 0
+# Carpeta madre de los blobs subidos por data_to_blob_storage.py
+carpeta_madre_blob = "johnny5_data"
+
+def absolute_path(relative_path):
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), relative_path))
+
+# Función para seleccionar los blobs a eliminar según los filtros
+def select_blobs(prefix=None, older_than_days=None, orphans=False, local_folder_path=None, manifest_file=None):
+    """
+    Lista los blobs del contenedor que cumplen todos los filtros indicados
+    :param prefix: Solo los blobs cuyo nombre empieza por este prefijo
+    :param older_than_days: Solo los blobs modificados hace más de estos días
+    :param orphans: Solo los blobs cuyo archivo local ya no existe o no está en el manifiesto de subida
+    :return: Lista de (nombre, tamaño)
+    """
+    limit_date = datetime.now(timezone.utc) - timedelta(days=older_than_days) if older_than_days is not None else None
+
+    uploaded_files = None
+    if orphans and manifest_file and os.path.exists(manifest_file):
+        with open(manifest_file, "r") as file:
+            uploaded_files = set(json.load(file))
+
+    selected = []
+    for blob in container_client.list_blobs(name_starts_with=prefix):
+        if limit_date is not None and blob.last_modified > limit_date:
+            continue
+
+        if orphans:
+            # Solo se consideran los blobs de la carpeta madre, con la misma estructura que la carpeta local
+            if not blob.name.startswith(carpeta_madre_blob + "/"):
+                continue
+            local_path = os.path.join(local_folder_path, *blob.name[len(carpeta_madre_blob) + 1:].split("/"))
+            if os.path.exists(local_path) and (uploaded_files is None or local_path in uploaded_files):
+                continue
+
+        selected.append((blob.name, blob.size))
+
+    return selected
+
+# Función para eliminar un lote de blobs en una sola petición
+def delete_batch(names):
+    deleted, failed = 0, 0
+    responses = container_client.delete_blobs(*names, raise_on_any_failure=False)
+    for name, response in zip(names, responses):
+        # 404: el blob ya no existe, el resultado es el mismo
+        if response.status_code in (202, 404):
+            deleted += 1
+        else:
+            failed += 1
+            print(f"Error eliminando blob {name}: {response.status_code}")
+    return deleted, failed
+
+# Función para eliminar los blobs seleccionados en lotes, con varias peticiones en paralelo
+def delete_blobs(blobs, workers=8, dry_run=False):
+    total_size = sum(size or 0 for _, size in blobs)
 
-    for blob in blobs:
-        print(f"Eliminando blob: {blob.name}")
-        # Elimina el blob
-        container_client.delete_blob(blob)
-        blob_count += 1
+    if dry_run:
+        for name, _ in blobs[:20]:
+            print(f"Se eliminaría: {name}")
+        print(f"[dry-run] Se eliminarían {len(blobs)} blobs ({total_size / 1024 / 1024:.2f} MB) del contenedor '{container_name}'.")
+        return 0
 
-    if blob_count == 0:
+    names = [name for name, _ in blobs]
+    batches = [names[start:start + BATCH_SIZE] for start in range(0, len(names), BATCH_SIZE)]
+
+    deleted, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_deleted, batch_failed in executor.map(delete_batch, batches):
+            deleted += batch_deleted
+            failed += batch_failed
+            print(f"Eliminados {deleted}/{len(names)} blobs")
+
+    if failed:
+        print(f"No se pudieron eliminar {failed} blobs.")
+    return deleted
+
+# Función para eliminar todos los blobs del contenedor
+def delete_all_blobs(dry_run=False):
+    blobs = select_blobs()
+
+    if not blobs:
         print(f"El contenedor '{container_name}' ya está vacío.")
-    else:
+        return
+
+    blob_count = delete_blobs(blobs, dry_run=dry_run)
+    if not dry_run:
         print(f"Se han eliminado {blob_count} blobs del contenedor '{container_name}'.")
 
-# Llamada a la función para eliminar todos los blobs
-delete_all_blobs()
 
-print("Proceso de eliminación completado.")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elimina blobs del contenedor en lotes (todos si no se indica ningún filtro)")
+    parser.add_argument("--prefix", help="Solo los blobs con este prefijo")
+    parser.add_argument("--older-than-days", type=float, help="Solo los blobs modificados hace más de N días")
+    parser.add_argument("--orphans", action="store_true", help="Solo los blobs cuyo archivo local ya no existe")
+    parser.add_argument("--local-folder", default=os.getenv("BASE_PATH_PIPELINE"), help="Carpeta local subida (para --orphans)")
+    parser.add_argument("--manifest-file", default=absolute_path("../data/blob_upload_manifest.json"), help="Manifiesto de subida (para --orphans)")
+    parser.add_argument("--workers", type=int, default=8, help="Peticiones batch en paralelo")
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra lo que se eliminaría")
+    args = parser.parse_args()
+
+    if args.prefix is None and args.older_than_days is None and not args.orphans:
+        # Llamada a la función para eliminar todos los blobs
+        delete_all_blobs(dry_run=args.dry_run)
+    else:
+        if args.orphans and not args.local_folder:
+            parser.error("--orphans necesita la carpeta local (--local-folder o BASE_PATH_PIPELINE)")
+        local_folder = absolute_path(args.local_folder) if args.local_folder else None
+
+        selected_blobs = select_blobs(args.prefix, args.older_than_days, args.orphans, local_folder, args.manifest_file)
+        print(f"Blobs seleccionados: {len(selected_blobs)}")
+        blob_count = delete_blobs(selected_blobs, workers=args.workers, dry_run=args.dry_run)
+        if not args.dry_run:
+            print(f"Se han eliminado {blob_count} blobs del contenedor '{container_name}'.")
+
+    print("Proceso de eliminación completado.")
@@ -0,0 +1,253 @@
+# Python Imports
+import re
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Third party imports
+import tiktoken
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+
+def parse_reset_duration(value) -> float:
+    """
+    Converts the reset/retry headers sent by OpenAI/Azure ("20ms", "1s", "6m0s", "2") into seconds
+    :param value: Raw header value (can be None)
+    :return: Number of seconds, 0.0 if the header is missing or can not be parsed
+    """
+    if not value:
+        return 0.0
+
+    # Plain numbers (retry-after) are already seconds
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value))
+
+
+class EmbeddingBatcher:
+    """
+    Embedding scheduler for the ingestion pipeline.
+
+    Texts are packed into requests by token count (up to the API limits), several requests are kept
+    in flight at the same time and the number of concurrent requests adapts to the rate-limit headers
+    returned by the API: it grows one step while there is headroom and it is halved on every 429,
+    which is retried with exponential backoff.
+    """
+
+    def __init__(self,
+                 model: str = "text-embedding-3-small",
+                 client=None,
+                 max_tokens_per_batch: int = 150_000,
+                 max_inputs_per_batch: int = 2048,
+                 max_tokens_per_input: int = 8191,
+                 initial_concurrency: int = 2,
+                 max_concurrency: int = 8,
+                 max_retries: int = 8,
+                 base_backoff: float = 1.0,
+                 max_backoff: float = 60.0):
+
+        self.model = model
+
+        # The retries are handled here, so the client must not retry by itself
+        self.client = client or OpenAI(max_retries=0)
+
+        # Tokenizer used to pack the batches
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+        # Batch limits
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_inputs_per_batch = max_inputs_per_batch
+        self.max_tokens_per_input = max_tokens_per_input
+
+        # Concurrency control
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = max(1, min(initial_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+
+        # Accumulated statistics for the whole run
+        self.stats = {'texts': 0, 'tokens': 0, 'requests': 0, 'rate_limited': 0, 'seconds': 0.0}
+
+    def prepare_texts(self, texts: list) -> tuple:
+        """
+        Counts the tokens of every text and truncates the ones above the per-input limit
+        :param texts: List of strings to embed
+        :return: (list of texts ready to send, list of token counts)
+        """
+        tokenized = self.encoding.encode_batch(texts, disallowed_special=())
+
+        prepared, token_counts = [], []
+        for text, tokens in zip(texts, tokenized):
+            if len(tokens) > self.max_tokens_per_input:
+                tokens = tokens[:self.max_tokens_per_input]
+                text = self.encoding.decode(tokens)
+            prepared.append(text)
+            token_counts.append(len(tokens))
+
+        return prepared, token_counts
+
+    def pack_batches(self, token_counts: list) -> list:
+        """
+        Groups consecutive texts into batches limited by tokens and number of inputs
+        :param token_counts: Token count of every text
+        :return: List of (list of indexes, tokens in the batch)
+        """
+        batches = []
+        indexes, batch_tokens = [], 0
+
+        for index, count in enumerate(token_counts):
+            if indexes and (batch_tokens + count > self.max_tokens_per_batch
+                            or len(indexes) >= self.max_inputs_per_batch):
+                batches.append((indexes, batch_tokens))
+                indexes, batch_tokens = [], 0
+
+            indexes.append(index)
+            batch_tokens += count
+
+        if indexes:
+            batches.append((indexes, batch_tokens))
+
+        return batches
+
+    def _wait_if_paused(self):
+        """
+        Sleeps while the token/request budget reported by the API is exhausted
+        """
+        with self._lock:
+            remaining = self._pause_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _on_rate_limited(self, headers) -> float:
+        """
+        Halves the concurrency after a 429 and returns the minimum wait suggested by the API
+        """
+        retry_after = max(parse_reset_duration(headers.get('retry-after-ms')) / 1000,
+                          parse_reset_duration(headers.get('retry-after')))
+
+        with self._lock:
+            self.concurrency = max(1, self.concurrency // 2)
+            self.stats['rate_limited'] += 1
+            self._pause_until = max(self._pause_until, time.monotonic() + retry_after)
+
+        return retry_after
+
+    def _on_success(self, headers, batch_tokens: int):
+        """
+        Adapts the concurrency to the remaining budget reported in the rate-limit headers
+        """
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+
+        with self._lock:
+            # Without headers (e.g. proxies) there is nothing to adapt to
+            if remaining_requests is None or remaining_tokens is None:
+                return
+
+            remaining_requests = int(remaining_requests)
+            remaining_tokens = int(remaining_tokens)
+            needed_tokens = batch_tokens * self.concurrency
+
+            requests_exhausted = remaining_requests < self.concurrency
+            tokens_exhausted = remaining_tokens < needed_tokens
+
+            if requests_exhausted or tokens_exhausted:
+                # Budget almost exhausted: slow down until the window resets
+                self.concurrency = max(1, self.concurrency - 1)
+                reset = max(parse_reset_duration(headers.get('x-ratelimit-reset-requests')) if requests_exhausted else 0.0,
+                            parse_reset_duration(headers.get('x-ratelimit-reset-tokens')) if tokens_exhausted else 0.0)
+                self._pause_until = max(self._pause_until, time.monotonic() + reset)
+            elif remaining_requests > 2 * (self.concurrency + 1) and remaining_tokens > 2 * batch_tokens * (self.concurrency + 1):
+                # Plenty of headroom: one more request in flight
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def _embed_batch(self, texts: list, batch_tokens: int) -> list:
+        """
+        Sends a single embedding request, retrying rate limits and transient errors with exponential backoff
+        :return: List of embeddings in the same order as texts
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_if_paused()
+            try:
+                raw_response = self.client.embeddings.with_raw_response.create(model=self.model, input=texts)
+                response = raw_response.parse()
+                self._on_success(raw_response.headers, batch_tokens)
+
+                with self._lock:
+                    self.stats['requests'] += 1
+
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+            except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+
+                minimum_wait = 0.0
+                if isinstance(e, RateLimitError):
+                    minimum_wait = self._on_rate_limited(e.response.headers)
+
+                # Exponential backoff with jitter
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                delay = max(minimum_wait, backoff * random.uniform(0.5, 1.0))
+                print(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_texts(self, texts: list) -> list:
+        """
+        Embeds a list of texts keeping several token-packed requests in flight
+        :param texts: List of strings to embed
+        :return: List of embeddings in the same order as texts
+        """
+        if not texts:
+            return []
+
+        start_time = time.perf_counter()
+
+        prepared, token_counts = self.prepare_texts(texts)
+        pending = deque(self.pack_batches(token_counts))
+        embeddings = [None] * len(texts)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = {}
+            while pending or in_flight:
+                # Fill the window up to the current concurrency
+                while pending and len(in_flight) < self.concurrency:
+                    indexes, batch_tokens = pending.popleft()
+                    future = executor.submit(self._embed_batch, [prepared[i] for i in indexes], batch_tokens)
+                    in_flight[future] = indexes
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    indexes = in_flight.pop(future)
+                    for index, embedding in zip(indexes, future.result()):
+                        embeddings[index] = embedding
+
+        # Update the statistics of the run
+        elapsed = time.perf_counter() - start_time
+        tokens = sum(token_counts)
+        self.stats['texts'] += len(texts)
+        self.stats['tokens'] += tokens
+        self.stats['seconds'] += elapsed
+
+        print(f"Embedded {len(texts)} chunks ({tokens} tokens) in {elapsed:.2f}s: "
+              f"{tokens / elapsed if elapsed else 0:.0f} tokens/sec, concurrency {self.concurrency}")
+
+        return embeddings
+
+    def tokens_per_second(self) -> float:
+        """
+        Average embedded tokens per second over the whole run
+        """
+        return self.stats['tokens'] / self.stats['seconds'] if self.stats['seconds'] else 0.0
@@ -0,0 +1,165 @@
+# Python Imports
+import os
+import re
+import sqlite3
+import hashlib
+
+# Third party imports
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent chunk-level embedding cache.
+
+    The key of every entry is hash(model, normalized chunk text). The embeddings are stored as float16
+    rows of a memory-mapped file and the key -> row index lives in a small SQLite table, so identical
+    chunks (repeated boilerplate, service bulletins copied across manuals...) are embedded only once.
+    """
+
+    def __init__(self, cache_directory: str, model: str, initial_capacity: int = 65536):
+        self.model = model
+        self.initial_capacity = initial_capacity
+        os.makedirs(cache_directory, exist_ok=True)
+
+        # One index and one vectors file per model: the dimension and the row count of the vectors file
+        # belong to its model, so several models (e.g. a local model and the API) can share the directory
+        safe_model = re.sub(r'[^A-Za-z0-9_.-]', '_', model)
+        index_file = os.path.join(cache_directory, f"embedding_cache_{safe_model}.sqlite")
+        self.vectors_file = os.path.join(cache_directory, f"embeddings_{safe_model}.f16")
+
+        # Index: key -> row of the vectors file
+        self.connection = sqlite3.connect(index_file)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self.connection.commit()
+
+        # Vectors: the dimension is known after the first insert
+        self.dimension = self._get_meta('dimension')
+        self.rows = self.connection.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+        self.capacity = 0
+        self.vectors = None
+        if self.dimension is not None:
+            self._open_vectors()
+
+        # Statistics of the current run
+        self.hits = 0
+        self.misses = 0
+
+    def _get_meta(self, name: str):
+        row = self.connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _open_vectors(self, capacity: int = None):
+        """
+        Opens (or grows) the memory-mapped vectors file
+        """
+        row_bytes = self.dimension * np.dtype(np.float16).itemsize
+        current_size = os.path.getsize(self.vectors_file) if os.path.exists(self.vectors_file) else 0
+        capacity = max(capacity or 0, current_size // row_bytes, self.initial_capacity)
+
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+
+        # Extend the file before mapping it
+        with open(self.vectors_file, 'ab') as file:
+            file.truncate(capacity * row_bytes)
+
+        self.vectors = np.memmap(self.vectors_file, dtype=np.float16, mode='r+', shape=(capacity, self.dimension))
+        self.capacity = capacity
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes the chunk text so trivially different copies share the same key
+        """
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def key(self, text: str) -> str:
+        """
+        Key of a chunk: hash of the model and the normalized text
+        """
+        return hashlib.sha256(f"{self.model}\0{self.normalize(text)}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: list) -> list:
+        """
+        Looks up several keys at once
+        :return: List with a float32 vector (or None) for every key
+        """
+        rows = {}
+        for start in range(0, len(keys), 900):  # SQLite limit of parameters per query
+            batch = keys[start:start + 900]
+            query = f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+            rows.update(self.connection.execute(query, batch).fetchall())
+
+        return [self.vectors[rows[key]].astype(np.float32) if key in rows else None for key in keys]
+
+    def put_many(self, keys: list, embeddings: list):
+        """
+        Stores new embeddings. The vectors are flushed before the index is committed, so an
+        interrupted run never leaves keys pointing to empty rows.
+        """
+        if not keys:
+            return
+
+        if self.dimension is None:
+            self.dimension = len(embeddings[0])
+            self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimension', ?)", (self.dimension,))
+            self._open_vectors()
+
+        if self.rows + len(keys) > self.capacity:
+            self._open_vectors(max(self.rows + len(keys), self.capacity * 2))
+
+        self.vectors[self.rows:self.rows + len(keys)] = np.asarray(embeddings, dtype=np.float16)
+        self.vectors.flush()
+
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO entries (key, row) VALUES (?, ?)",
+            [(key, self.rows + offset) for offset, key in enumerate(keys)]
+        )
+        self.connection.commit()
+        self.rows += len(keys)
+
+    def embed_with_cache(self, texts: list, embed_function) -> list:
+        """
+        Returns the embeddings of texts calling embed_function only for the chunks that are not cached.
+        Repeated chunks inside the same call are embedded once as well.
+        :param texts: List of strings
+        :param embed_function: Function that receives a list of strings and returns their embeddings
+        :return: List of embeddings (lists of floats) in the same order as texts
+        """
+        keys = [self.key(text) for text in texts]
+        cached = self.get_many(keys)
+
+        # Unique texts that must be sent to the API
+        missing = {}
+        for index, (key, vector) in enumerate(zip(keys, cached)):
+            if vector is None and key not in missing:
+                missing[key] = index
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        new_embeddings = {}
+        if missing:
+            embeddings = embed_function([texts[index] for index in missing.values()])
+            new_embeddings = dict(zip(missing.keys(), embeddings))
+            self.put_many(list(new_embeddings.keys()), list(new_embeddings.values()))
+
+        return [new_embeddings[key] if vector is None else vector.tolist() for key, vector in zip(keys, cached)]
+
+    def hit_rate(self) -> float:
+        """
+        Fraction of the chunks of this run that were served from the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.connection.close()
@@ -0,0 +1,208 @@
+# Python Imports
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of bytes read from every file to identify its content
+SNIFF_BYTES = 2048
+
+# Magic bytes of the formats the pipeline can read (and of the binaries that must never be parsed)
+MAGIC_SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'zip'),                           # docx, xlsx, pptx (and plain zip files)
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),     # doc, xls, ppt
+    (b'{\\rtf', 'rtf'),
+    (b'MZ', 'executable'),
+    (b'\x7fELF', 'executable'),
+]
+
+# Content expected for every extension the pipeline processes
+EXPECTED_CONTENT = {
+    '.pdf': ['pdf'],
+    '.docx': ['zip'],
+    '.pptx': ['zip'],
+    '.xlsx': ['zip'],
+    '.xls': ['ole', 'text'],  # Some exports are HTML tables saved with the .xls extension
+    '.doc': ['ole', 'rtf'],
+    '.ppt': ['ole'],
+    '.rtf': ['rtf', 'text'],
+    '.txt': ['text'],
+    '.xml': ['text'],
+    '.html': ['text'],
+    '.htm': ['text'],
+}
+
+# Kind of the files whose content needs a different reader than their extension
+CONTENT_KINDS = {
+    ('.xls', 'text'): 'native',  # HTML tables saved as .xls are read by the HTML loader, not by pandas
+}
+
+# Order in which the file kinds are processed: cheap files first so the index fills up quickly
+DEFAULT_PRIORITIES = {'native': 0, 'tabular': 1, 'pdf': 2, 'convertible': 3}
+
+
+def sniff_content(filepath: str) -> str:
+    """
+    Identifies the content of a file from its first bytes
+    :return: 'pdf', 'zip', 'ole', 'rtf', 'executable', 'text', 'binary' or 'empty'
+    """
+    with open(filepath, 'rb') as file:
+        header = file.read(SNIFF_BYTES)
+
+    if not header:
+        return 'empty'
+
+    # Skip the UTF-8 byte order mark and leading blank lines (common before "%PDF" and "{\rtf")
+    stripped_header = header.removeprefix(b'\xef\xbb\xbf').lstrip()
+    for signature, content in MAGIC_SIGNATURES:
+        if stripped_header.startswith(signature):
+            return content
+
+    # Text files have no NUL bytes (UTF-16 text is not expected in the corpus)
+    if b'\x00' in header:
+        return 'binary'
+    return 'text'
+
+
+class FileScanner:
+    """
+    Walks the source tree in parallel, identifies every file by its magic bytes and builds the
+    prioritized list of files to process before any heavy work starts.
+    """
+
+    def __init__(self,
+                 kinds_by_extension: dict,
+                 max_file_size_mb: float = 500,
+                 max_size_mb_by_kind: dict = None,
+                 skip_directories: list = None,
+                 priorities: dict = None,
+                 workers: int = 16):
+        """
+        :param kinds_by_extension: Kind of processing ('pdf', 'tabular', 'native', 'convertible')
+                                   of every extension, the other extensions are skipped
+        :param max_file_size_mb: Files bigger than this are skipped
+        :param max_size_mb_by_kind: Size limits of specific kinds, they replace max_file_size_mb
+        :param skip_directories: Directory names that are not walked (e.g. backups, installers)
+        :param priorities: Processing order of the kinds (lower first)
+        :param workers: Number of threads listing directories and reading file headers
+        """
+        self.kinds_by_extension = kinds_by_extension
+        self.max_file_size = max_file_size_mb * 1024 * 1024
+        self.max_size_by_kind = {kind: size * 1024 * 1024 for kind, size in (max_size_mb_by_kind or {}).items()}
+        self.skip_directories = set(skip_directories or [])
+        self.priorities = priorities or DEFAULT_PRIORITIES
+        self.workers = workers
+
+        self.totals = defaultdict(lambda: [0, 0])          # extension -> [files, bytes] to process
+        self.skipped = defaultdict(lambda: [0, 0])         # reason -> [files, bytes]
+
+    def list_files(self, base_path: str) -> list:
+        """
+        Lists all the files of the tree, every directory is listed by a different thread
+        :return: List of (path, size)
+        """
+        files = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = [executor.submit(self._list_directory, base_path)]
+            while pending:
+                directory_files, subdirectories = pending.pop().result()
+                files.extend(directory_files)
+                pending.extend(executor.submit(self._list_directory, subdirectory) for subdirectory in subdirectories)
+        return files
+
+    def _list_directory(self, directory: str) -> tuple:
+        directory_files, subdirectories = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.skip_directories:
+                                subdirectories.append(entry.path)
+                        elif entry.is_file():
+                            directory_files.append((entry.path, entry.stat().st_size))
+                    except OSError as e:
+                        print(f"Error reading {entry.path}: {e}")
+        except OSError as e:
+            print(f"Error listing {directory}: {e}")
+        return directory_files, subdirectories
+
+    def classify(self, filepath: str, size: int) -> tuple:
+        """
+        Decides how a file must be processed
+        :return: (kind, None) if it must be processed or (None, reason) if it is skipped
+        """
+        extension = os.path.splitext(filepath)[1].lower()
+        kind = self.kinds_by_extension.get(extension)
+
+        if os.path.basename(filepath).startswith('~$'):
+            return None, "office lock file"
+
+        if kind is None and extension:
+            # Cheap rejection of the noise (dll, bin, log...) without opening the file
+            return None, f"extension {extension}"
+
+        if size == 0:
+            return None, "empty file"
+
+        try:
+            content = sniff_content(filepath)
+        except OSError as e:
+            return None, f"unreadable ({e.__class__.__name__})"
+
+        if kind is None:
+            # Files without extension are only processed when they are PDFs
+            if content != 'pdf':
+                return None, "no extension"
+            kind = 'pdf'
+        elif content not in EXPECTED_CONTENT.get(extension, [content]):
+            if content != 'pdf':
+                return None, f"{content} content in {extension} file"
+            # Misnamed PDFs are processed as PDFs
+            kind = 'pdf'
+        else:
+            kind = CONTENT_KINDS.get((extension, content), kind)
+
+        if size > self.max_size_by_kind.get(kind, self.max_file_size):
+            return None, f"{kind} larger than the size limit"
+
+        return kind, None
+
+    def scan(self, base_path: str) -> list:
+        """
+        Builds the work list of a source tree
+        :param base_path: Root of the tree
+        :return: List of (kind, path, size), ordered by kind priority and size (small files first)
+        """
+        files = self.list_files(base_path)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            classifications = list(executor.map(lambda item: self.classify(*item), files))
+
+        work_list = []
+        for (filepath, size), (kind, reason) in zip(files, classifications):
+            if kind is None:
+                self.skipped[reason][0] += 1
+                self.skipped[reason][1] += size
+            else:
+                work_list.append((kind, filepath, size))
+                totals = self.totals[os.path.splitext(filepath)[1].lower() or '(none)']
+                totals[0] += 1
+                totals[1] += size
+
+        work_list.sort(key=lambda item: (self.priorities.get(item[0], len(self.priorities)), item[2], item[1]))
+        return work_list
+
+    def print_summary(self):
+        """
+        Prints the per-type totals of the work list and the skipped files by reason
+        """
+        print("Files to process:")
+        for extension, (files, size) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            print(f"{extension}: {files} files, {size / 1024 / 1024:.2f} MB")
+
+        skipped_files = sum(files for files, _ in self.skipped.values())
+        skipped_size = sum(size for _, size in self.skipped.values())
+        print(f"Skipped: {skipped_files} files, {skipped_size / 1024 / 1024:.2f} MB")
+        for reason, (files, size) in sorted(self.skipped.items(), key=lambda item: -item[1][1])[:20]:
+            print(f"  {reason}: {files} files, {size / 1024 / 1024:.2f} MB")
@@ -0,0 +1,336 @@
+# Python Imports
+import os
+import time
+import sqlite3
+import hashlib
+
+
+def file_content_hash(filepath: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Computes the SHA-256 of the content of a file reading it in blocks
+    :param filepath: Path of the file
+    :param block_size: Size of every read in bytes
+    :return: Hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(content_hash: str, location, index: int) -> str:
+    """
+    Deterministic ID of a chunk, the same content always gets the same IDs in every run
+    :param content_hash: Hash of the content of the source file
+    :param location: Page, sheet, section or slide of the chunk inside the file
+    :param index: Position of the chunk inside the file
+    :return: 32 hexadecimal characters
+    """
+    return hashlib.sha256(f"{content_hash}:{location}:{index}".encode('utf-8')).hexdigest()[:32]
+
+
+class IngestionManifest:
+    """
+    SQLite manifest of the ingested files.
+
+    Every file is stored with its content hash, size and mtime, and the chunk IDs written to the
+    vector store are stored by content hash. This allows a run to know exactly which files are
+    new, modified, moved/copied (same content in another path) or deleted, and which chunk IDs
+    become stale.
+
+    The journal table is a write-ahead log of the chunks sent to the vector store whose file is not
+    registered yet. A file is only registered once all its chunks are committed, so after a crash
+    the journaled chunks are the partial writes that must be rolled back.
+    """
+
+    # Results of check_file
+    UNCHANGED = 'unchanged'
+    NEW = 'new'
+    MODIFIED = 'modified'
+    ALIAS = 'alias'
+
+    def __init__(self, manifest_file: str):
+        self.manifest_file = manifest_file
+        os.makedirs(os.path.dirname(self.manifest_file), exist_ok=True)
+
+        self.connection = sqlite3.connect(self.manifest_file)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                content_hash TEXT,
+                size INTEGER,
+                mtime REAL,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash);
+
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                source_path TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunks_content_hash ON chunks (content_hash);
+
+            CREATE TABLE IF NOT EXISTS chunk_references (
+                chunk_id TEXT PRIMARY KEY,
+                kept_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunk_references_kept_id ON chunk_references (kept_id);
+
+            CREATE TABLE IF NOT EXISTS journal (
+                chunk_id TEXT PRIMARY KEY,
+                source_path TEXT NOT NULL
+            );
+        """)
+        self.connection.commit()
+
+    def import_legacy_history(self, paths: set):
+        """
+        Registers the paths of the old processed_files history. Their hash is filled the first time
+        they are checked, without re-indexing them.
+        """
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO files (path, content_hash, size, mtime, updated_at) VALUES (?, NULL, NULL, NULL, ?)",
+            [(path, time.time()) for path in paths]
+        )
+        self.connection.commit()
+
+    def get_file(self, path: str):
+        """
+        Returns (content_hash, size, mtime) of a registered file or None
+        """
+        return self.connection.execute(
+            "SELECT content_hash, size, mtime FROM files WHERE path = ?", (path,)
+        ).fetchone()
+
+    def has_chunks(self, content_hash: str) -> bool:
+        """
+        Checks if a content is already indexed in the vector store
+        """
+        return self.connection.execute(
+            "SELECT 1 FROM chunks WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone() is not None
+
+    def check_file(self, path: str, local_path: str = None, file_stat: tuple = None) -> tuple:
+        """
+        Classifies a file against the manifest. The size/mtime pair is used as a fast path so the
+        content is only hashed when the file looks different.
+        :param path: Path of the file (its identity in the manifest)
+        :param local_path: Local copy to hash when the file is not read from path (e.g. a downloaded blob)
+        :param file_stat: (size, mtime) of the original file when it is not on the local disk
+        :return: (status, content_hash, size, mtime) where status is UNCHANGED, NEW, MODIFIED or ALIAS
+        """
+        if file_stat is None:
+            stat = os.stat(local_path or path)
+            size, mtime = stat.st_size, stat.st_mtime
+        else:
+            size, mtime = file_stat
+        row = self.get_file(path)
+
+        # Fast path: same size and mtime as the last run
+        if self.is_unchanged(row, size, mtime):
+            return self.UNCHANGED, row[0], size, mtime
+
+        content_hash = file_content_hash(local_path or path)
+
+        if row is not None and (row[0] is None or row[0] == content_hash):
+            # Touched file or legacy entry: just refresh the stored stats
+            self.register_file(path, content_hash, size, mtime)
+            return self.UNCHANGED, content_hash, size, mtime
+
+        if self.has_chunks(content_hash):
+            # The same content is already indexed from another path (moved or copied file)
+            return self.ALIAS, content_hash, size, mtime
+
+        status = self.NEW if row is None else self.MODIFIED
+        return status, content_hash, size, mtime
+
+    @staticmethod
+    def is_unchanged(row: tuple, size: int, mtime: float) -> bool:
+        """
+        Checks if a file has the same size and mtime as when it was registered (without reading it)
+        :param row: (content_hash, size, mtime) of the file in the manifest, or None
+        """
+        return row is not None and row[0] is not None and row[1] == size and row[2] == mtime
+
+    def register_file(self, path: str, content_hash: str, size: int, mtime: float, commit: bool = True):
+        """
+        Inserts or updates a file in the manifest
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (path, content_hash, size, mtime, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (path, content_hash, size, mtime, time.time())
+        )
+        if commit:
+            self.connection.commit()
+
+    def add_chunks(self, content_hash: str, source_path: str, chunk_ids: list, commit: bool = True):
+        """
+        Registers the chunk IDs written to the vector store for a content
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO chunks (chunk_id, content_hash, source_path) VALUES (?, ?, ?)",
+            [(chunk_id, content_hash, source_path) for chunk_id in chunk_ids]
+        )
+        if commit:
+            self.connection.commit()
+
+    def add_references(self, references: list):
+        """
+        Records the near-duplicate chunks that were collapsed into a chunk already in the vector store
+        :param references: List of (collapsed chunk ID, kept chunk ID)
+        """
+        self.connection.executemany("INSERT OR REPLACE INTO chunk_references (chunk_id, kept_id) VALUES (?, ?)", references)
+        self.connection.commit()
+
+    def kept_chunks_of_file(self, path: str) -> list:
+        """
+        Chunks of other files that some chunks of a file were collapsed into (the file is in their 'other_sources')
+        :return: List of kept chunk IDs
+        """
+        return [kept_id for (kept_id,) in self.connection.execute(
+            "SELECT DISTINCT chunk_references.kept_id FROM chunk_references JOIN chunks USING (chunk_id) "
+            "JOIN files ON files.content_hash = chunks.content_hash WHERE files.path = ?", (path,))]
+
+    def remove_references(self, chunk_ids: list) -> list:
+        """
+        Removes the references of collapsed chunks that are discarded (e.g. the chunks of a failed file)
+        :return: List of the kept chunk IDs they were collapsed into
+        """
+        kept_ids = set()
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            kept_ids.update(kept_id for (kept_id,) in self.connection.execute(
+                f"SELECT kept_id FROM chunk_references WHERE chunk_id IN ({placeholders})", batch))
+            self.connection.execute(f"DELETE FROM chunk_references WHERE chunk_id IN ({placeholders})", batch)
+        self.connection.commit()
+        return sorted(kept_ids)
+
+    def _invalidate_references(self, stale_ids: list):
+        """
+        The files with chunks collapsed into a deleted chunk lose that content, so they are
+        removed from the manifest and indexed again in the next run
+        """
+        for start in range(0, len(stale_ids), 500):
+            batch = stale_ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            content_hashes = [content_hash for (content_hash,) in self.connection.execute(
+                f"SELECT DISTINCT chunks.content_hash FROM chunk_references JOIN chunks USING (chunk_id) "
+                f"WHERE chunk_references.kept_id IN ({placeholders})", batch)]
+            self.connection.execute(f"DELETE FROM chunk_references WHERE kept_id IN ({placeholders}) "
+                                    f"OR chunk_id IN ({placeholders})", batch + batch)
+
+            for content_hash in content_hashes:
+                self.connection.execute("DELETE FROM files WHERE content_hash = ?", (content_hash,))
+                self.connection.execute("DELETE FROM chunks WHERE content_hash = ?", (content_hash,))
+
+    def journal_chunks(self, chunks: list):
+        """
+        Writes ahead the chunks that are about to be sent to the vector store
+        :param chunks: List of (chunk_id, source_path)
+        """
+        self.connection.executemany("INSERT OR REPLACE INTO journal (chunk_id, source_path) VALUES (?, ?)", chunks)
+        self.connection.commit()
+
+    def journaled_chunks(self) -> dict:
+        """
+        Chunks written to the vector store by files that were never registered
+        (the IDs also owned by a registered file are excluded, they must be kept)
+        :return: Dictionary source path -> list of chunk IDs
+        """
+        chunks = {}
+        for chunk_id, source_path in self.connection.execute(
+                "SELECT chunk_id, source_path FROM journal WHERE chunk_id NOT IN (SELECT chunk_id FROM chunks)"):
+            chunks.setdefault(source_path, []).append(chunk_id)
+        return chunks
+
+    def clear_journal(self, source_path: str = None):
+        """
+        Removes the journal entries of a file (or all of them)
+        """
+        if source_path is None:
+            self.connection.execute("DELETE FROM journal")
+        else:
+            self.connection.execute("DELETE FROM journal WHERE source_path = ?", (source_path,))
+        self.connection.commit()
+
+    def commit_files(self, files: list):
+        """
+        Registers in a single transaction files whose chunks are all committed in the vector store,
+        removing their chunks from the journal
+        :param files: List of (path, (content_hash, size, mtime), chunk IDs)
+        """
+        with self.connection:
+            for path, (content_hash, size, mtime), chunk_ids in files:
+                self.add_chunks(content_hash, path, chunk_ids, commit=False)
+                self.register_file(path, content_hash, size, mtime, commit=False)
+                self.connection.executemany("DELETE FROM journal WHERE chunk_id = ?",
+                                            [(chunk_id,) for chunk_id in chunk_ids])
+
+    def release_file(self, path: str) -> tuple:
+        """
+        Removes a file (deleted or about to be re-indexed) from the manifest.
+
+        If no other file has the same content its chunks become stale. If another path still has it,
+        the chunks are kept and re-pointed to that path.
+        :param path: Path of the file
+        :return: (stale chunk IDs, path that keeps the content or None)
+        """
+        row = self.get_file(path)
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+        if row is None or row[0] is None:
+            self.connection.commit()
+            return [], None
+
+        content_hash = row[0]
+        other = self.connection.execute(
+            "SELECT path FROM files WHERE content_hash = ? LIMIT 1", (content_hash,)
+        ).fetchone()
+
+        if other is None:
+            # Nobody else has this content: the chunks are stale
+            stale_ids = [chunk_id for (chunk_id,) in self.connection.execute(
+                "SELECT chunk_id FROM chunks WHERE content_hash = ?", (content_hash,)
+            )]
+            self.connection.execute("DELETE FROM chunks WHERE content_hash = ?", (content_hash,))
+            self._invalidate_references(stale_ids)
+            self.connection.commit()
+            return stale_ids, None
+
+        # The content still exists in another path (moved file)
+        self.connection.execute(
+            "UPDATE chunks SET source_path = ? WHERE content_hash = ? AND source_path = ?", (other[0], content_hash, path)
+        )
+        self.connection.commit()
+        return [], other[0]
+
+    def missing_files(self, base_path: str) -> list:
+        """
+        Lists the registered files under base_path that no longer exist on disk
+        """
+        prefix = os.path.join(base_path, '')
+        return [path for (path,) in self.connection.execute("SELECT path FROM files")
+                if path.startswith(prefix) and not os.path.exists(path)]
+
+    def files_with_prefix(self, prefix: str) -> dict:
+        """
+        Registered files inside the directory prefix (a sibling such as "/data2" is not part of "/data")
+        :return: Dictionary path -> (content_hash, size, mtime)
+        """
+        prefix = os.path.join(prefix, '')
+        return {path: (content_hash, size, mtime) for path, content_hash, size, mtime
+                in self.connection.execute("SELECT path, content_hash, size, mtime FROM files")
+                if path.startswith(prefix)}
+
+    def count_files(self) -> int:
+        """
+        Number of files registered in the manifest
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,155 @@
+# Python Imports
+import os
+import re
+
+# Third party imports
+from bs4 import BeautifulSoup
+from docx import Document as DocxDocument
+from pptx import Presentation
+from langchain_core.documents import Document
+
+# Formats parsed directly, without converting them to PDF first.
+# The sections are stored as 'section'/'slide' metadata (not 'page') because the retrieval
+# only runs the page OCR for PDF sources.
+NATIVE_FORMATS = ['.txt', '.html', '.htm', '.docx', '.pptx']
+
+
+def read_text_file(filepath: str) -> str:
+    """
+    Reads a text file trying UTF-8 first and Latin-1 as fallback (it never fails)
+    """
+    try:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            return file.read()
+    except UnicodeDecodeError:
+        with open(filepath, 'r', encoding='latin-1') as file:
+            return file.read()
+
+
+def load_txt(filepath: str) -> list:
+    """
+    One document per form-feed separated page of a text file (the whole file if there are none)
+    """
+    pages = read_text_file(filepath).split('\f')
+    return [Document(page_content=text, metadata={'source': filepath, 'section': str(number)})
+            for number, text in enumerate(pages, start=1) if text.strip()]
+
+
+def load_html(filepath: str) -> list:
+    """
+    One document per heading section of an HTML file
+    """
+    with open(filepath, 'rb') as file:
+        soup = BeautifulSoup(file, 'html.parser')
+
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+
+    body = soup.body or soup
+    title = soup.title.get_text(strip=True) if soup.title else ''
+    sections, current_title, current_text = [], title, []
+
+    for element in body.find_all(['h1', 'h2', 'h3', 'p', 'li', 'td', 'th', 'pre', 'div']):
+        if element.name in ('h1', 'h2', 'h3'):
+            if current_text:
+                sections.append((current_title, current_text))
+            current_title, current_text = element.get_text(' ', strip=True), []
+        elif not element.find(['p', 'li', 'td', 'th', 'pre', 'div']):
+            # Only the innermost blocks, so the text is not repeated
+            text = element.get_text(' ', strip=True)
+            if text:
+                current_text.append(text)
+
+    if current_text:
+        sections.append((current_title, current_text))
+
+    # Pages without block elements: use all the visible text
+    if not sections:
+        sections = [(title, [body.get_text('\n', strip=True)])]
+
+    return [Document(page_content='\n'.join(text), metadata={'source': filepath, 'section': section_title})
+            for section_title, text in sections if any(text)]
+
+
+def load_docx(filepath: str) -> list:
+    """
+    One document per heading section of a Word document, tables included at the end
+    """
+    word_document = DocxDocument(filepath)
+    sections, current_title, current_text = [], '', []
+
+    for paragraph in word_document.paragraphs:
+        style_name = paragraph.style.name if paragraph.style is not None else ''
+        if style_name.startswith('Heading') or style_name == 'Title':
+            if current_text:
+                sections.append((current_title, current_text))
+            current_title, current_text = paragraph.text.strip(), []
+        elif paragraph.text.strip():
+            current_text.append(paragraph.text)
+
+    if current_text:
+        sections.append((current_title, current_text))
+
+    for number, table in enumerate(word_document.tables, start=1):
+        rows = [' | '.join(cell.text.strip() for cell in row.cells) for row in table.rows]
+        rows = [row for row in rows if row.replace('|', '').strip()]
+        if rows:
+            sections.append((f"Table {number}", rows))
+
+    return [Document(page_content='\n'.join(text), metadata={'source': filepath, 'section': section_title})
+            for section_title, text in sections]
+
+
+def load_pptx(filepath: str) -> list:
+    """
+    One document per slide of a PowerPoint presentation (speaker notes included)
+    """
+    presentation = Presentation(filepath)
+    documents = []
+
+    for number, slide in enumerate(presentation.slides, start=1):
+        texts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                texts.append(shape.text_frame.text)
+            elif getattr(shape, 'has_table', False) and shape.has_table:
+                for row in shape.table.rows:
+                    texts.append(' | '.join(cell.text for cell in row.cells))
+
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            texts.append(slide.notes_slide.notes_text_frame.text)
+
+        text = '\n'.join(text for text in texts if text.strip())
+        if text:
+            documents.append(Document(page_content=text, metadata={'source': filepath, 'slide': number}))
+
+    return documents
+
+
+LOADERS = {
+    '.txt': load_txt,
+    '.html': load_html,
+    '.htm': load_html,
+    '.docx': load_docx,
+    '.pptx': load_pptx,
+    '.xls': load_html,  # Only the HTML exports, the file scanner sends the real .xls files to the tabular reader
+}
+
+
+def load_native_documents(filepath: str) -> list:
+    """
+    Loads a txt/html/docx/pptx file into Documents with section (or slide) metadata
+    :param filepath: Path of the file
+    :return: List of Documents, ready for the text splitter
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in LOADERS:
+        raise ValueError(f"No native loader for '{extension}' files")
+
+    documents = LOADERS[extension](filepath)
+
+    # Normalize the whitespace left by the markup
+    for doc in documents:
+        doc.page_content = re.sub(r'[ \t]+\n', '\n', doc.page_content).strip()
+
+    return documents
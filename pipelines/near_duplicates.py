@@ -0,0 +1,137 @@
+# Python Imports
+import os
+import zlib
+import sqlite3
+
+# Third party imports
+import numpy as np
+
+# Prime of the MinHash permutations and mask of the 32-bit hash values
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def lsh_parameters(threshold: float, num_perm: int) -> tuple:
+    """
+    Number of bands and rows per band whose S-curve threshold (1/bands)^(1/rows) is the closest
+    to the requested similarity
+    """
+    candidates = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm // bands > 0]
+    return min(candidates, key=lambda params: abs((1 / params[0]) ** (1 / params[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of the chunks written to the vector store.
+
+    Every chunk is represented by the MinHash signature of its word shingles. The signatures are
+    split in bands and hashed into buckets, so the chunks sharing a bucket are the only candidates
+    compared. A candidate is a near duplicate when the estimated Jaccard similarity of their
+    shingles reaches the threshold. The signatures are persisted in SQLite and the buckets are
+    rebuilt in memory when the index is opened.
+    """
+
+    def __init__(self, index_file: str, threshold: float = 0.9, num_perm: int = 128,
+                 shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+
+        # Random permutations (a * hash + b) mod prime, fixed by the seed so signatures are stable
+        generator = np.random.RandomState(seed)
+        self.permutation_a = generator.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+        self.permutation_b = generator.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        self.connection = sqlite3.connect(index_file)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+        self.connection.commit()
+
+        # In-memory LSH structures
+        self.signatures = {}
+        self.buckets = {}
+        for chunk_id, blob in self.connection.execute("SELECT chunk_id, signature FROM signatures"):
+            self._index(chunk_id, np.frombuffer(blob, dtype=np.uint32))
+
+        # Number of chunks checked and collapsed in this run
+        self.checked = 0
+        self.collapsed = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature of the word shingles of a text
+        """
+        words = text.lower().split()
+        if len(words) <= self.shingle_size:
+            shingles = [' '.join(words)]
+        else:
+            shingles = [' '.join(words[start:start + self.shingle_size])
+                        for start in range(len(words) - self.shingle_size + 1)]
+
+        hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in set(shingles)], dtype=np.uint64)
+        permuted = (np.outer(hashes, self.permutation_a) + self.permutation_b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _index(self, chunk_id: str, signature: np.ndarray):
+        self.signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, set()).add(chunk_id)
+
+    def find(self, signature: np.ndarray):
+        """
+        Returns the ID of the most similar indexed chunk above the threshold, or None
+        """
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best_id, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return best_id
+
+    def add(self, chunk_id: str, signature: np.ndarray):
+        """
+        Indexes a chunk (persisted with the next commit)
+        """
+        self._index(chunk_id, signature)
+        self.connection.execute("INSERT OR REPLACE INTO signatures (chunk_id, signature) VALUES (?, ?)",
+                                (chunk_id, signature.tobytes()))
+
+    def remove(self, chunk_ids: list):
+        """
+        Removes chunks deleted from the vector store
+        """
+        for chunk_id in chunk_ids:
+            signature = self.signatures.pop(chunk_id, None)
+            if signature is None:
+                continue
+            for key in self._band_keys(signature):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+        self.connection.executemany("DELETE FROM signatures WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+        self.connection.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def shrink_rate(self) -> float:
+        """
+        Fraction of the checked chunks that were collapsed into an existing one
+        """
+        return self.collapsed / self.checked if self.checked else 0.0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
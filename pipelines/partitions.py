@@ -0,0 +1,143 @@
+# Python Imports
+import os
+import re
+import sys
+import json
+import argparse
+
+# Metadata keys used to partition the vector store (type_data is set by ProcessData.add_metadata)
+PARTITION_KEYS = ['family', 'vendor', 'type_data']
+
+
+def load_vendors() -> list:
+    """
+    Known equipment vendors, from the comma separated PARTITION_VENDORS environment variable
+    """
+    return [vendor.strip() for vendor in os.getenv('PARTITION_VENDORS', '').split(',') if vendor.strip()]
+
+
+def partition_metadata(filepath: str, base_path: str, vendors: list = None) -> dict:
+    """
+    Derives the partition keys of a file from its path inside the source tree:
+    the family is the first folder under base_path and the vendor is the first known vendor
+    that appears as whole words in a component of the path, e.g. "KSB" matches "KSB Pumps" and
+    "KSB_manual.pdf" but not "KSBX" (the second folder when no vendor list is configured)
+    :param filepath: Path of the source file
+    :param base_path: Root of the source tree
+    :param vendors: Known vendor names
+    :return: Dictionary with the 'family' and 'vendor' metadata ('' when unknown)
+    """
+    relative_path = os.path.relpath(filepath, base_path)
+    folders = [] if relative_path.startswith('..') else relative_path.split(os.sep)[:-1]
+
+    family = folders[0] if folders else ''
+
+    vendor = ''
+    if vendors:
+        components = relative_path.split(os.sep)
+        for name in vendors:
+            # Letters and digits around the name mean it is part of another word
+            pattern = re.compile(rf"(?<![^\W_]){re.escape(name)}(?![^\W_])", re.IGNORECASE)
+            if any(pattern.search(component) for component in components):
+                vendor = name
+                break
+    elif len(folders) > 1:
+        vendor = folders[1]
+
+    return {'family': family, 'vendor': vendor}
+
+
+class PartitionCatalog:
+    """
+    JSON catalog of the partition values present in the vector store, used by the query router
+    """
+
+    def __init__(self, catalog_file: str):
+        self.catalog_file = catalog_file
+        self.values = {key: set() for key in PARTITION_KEYS}
+
+        if os.path.exists(self.catalog_file):
+            with open(self.catalog_file) as file:
+                for key, values in json.load(file).items():
+                    self.values.setdefault(key, set()).update(values)
+
+    def add(self, metadata: dict):
+        for key in PARTITION_KEYS:
+            if metadata.get(key):
+                self.values[key].add(metadata[key])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.catalog_file), exist_ok=True)
+        with open(self.catalog_file, 'w') as file:
+            json.dump({key: sorted(values) for key, values in self.values.items()}, file, indent=2)
+
+
+def backfill_lexical_partitions(lexical_index, catalog: PartitionCatalog, base_path: str, vendors: list) -> int:
+    """
+    Adds the partition keys to the chunks of the lexical index
+    :return: Number of chunks updated
+    """
+    updated = 0
+    for ids, _, metadatas in lexical_index.iter_chunks():
+        for metadata in metadatas:
+            metadata.update(partition_metadata(metadata.get('source', ''), base_path, vendors))
+            catalog.add(metadata)
+        lexical_index.update_metadatas(ids, metadatas)
+        updated += len(ids)
+    return updated
+
+
+def backfill_partitions(data_directory: str, catalog_file: str, base_path: str, collection_name: str = "apec_vectorstores"):
+    """
+    Adds the partition keys to the chunks indexed before they existed
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(collection_name=collection_name, persist_directory=data_directory)._collection
+    catalog = PartitionCatalog(catalog_file)
+    vendors = load_vendors()
+    total = collection.count()
+    updated = 0
+
+    for offset in range(0, total, 5000):
+        records = collection.get(include=['metadatas'], limit=5000, offset=offset)
+        ids, metadatas = [], []
+        for record_id, metadata in zip(records['ids'], records['metadatas']):
+            metadata = dict(metadata or {})
+            metadata.update(partition_metadata(metadata.get('source', ''), base_path, vendors))
+            catalog.add(metadata)
+            ids.append(record_id)
+            metadatas.append(metadata)
+
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+        print(f"Updated {updated}/{total} records")
+
+    # Same keys in the lexical index, so the filtered BM25 searches find the backfilled chunks
+    # (it also has the chunks collapsed as near duplicates, which are not in Chroma)
+    sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')))
+    from scripts.lexical_index import LexicalIndex, lexical_index_path
+
+    if os.path.exists(lexical_index_path(data_directory)):
+        lexical_index = LexicalIndex(lexical_index_path(data_directory))
+        print(f"Updated {backfill_lexical_partitions(lexical_index, catalog, base_path, vendors)} lexical index records")
+        lexical_index.close()
+
+    catalog.save()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    def absolute_path(relative_path):
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), relative_path))
+
+    parser = argparse.ArgumentParser(description="Add the partition metadata to the chunks already in the vector store")
+    parser.add_argument("--data-directory", default=absolute_path("../data/APEC_ChromaDB_v2"))
+    parser.add_argument("--catalog-file", default=absolute_path("../data/partitions_catalog.json"))
+    parser.add_argument("--base-path", default=absolute_path(os.getenv('BASE_PATH_PIPELINE', '.')))
+    args = parser.parse_args()
+
+    backfill_partitions(args.data_directory, args.catalog_file, args.base_path)
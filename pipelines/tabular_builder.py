@@ -0,0 +1,132 @@
+# Python Imports
+import os
+
+# Third party imports
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from langchain_core.documents import Document
+
+# Extensions that openpyxl can stream in read-only mode
+STREAMABLE_EXTENSIONS = ['.xlsx', '.xlsm']
+
+
+def valid_columns(columns) -> list:
+    """
+    Columns with a real name (pandas names the empty headers "Unnamed: n")
+    """
+    return [col for col in columns if not str(col).startswith('Unnamed')]
+
+
+def serialize_rows(frame: pd.DataFrame) -> tuple:
+    """
+    Builds the "Column: Value" text of every row column by column instead of row by row.
+    Null cells are skipped and rows without any value in the valid columns are dropped.
+    :param frame: DataFrame of a sheet (or a chunk of it)
+    :return: (array of row texts, array of row positions inside the frame)
+    """
+    texts = np.full(len(frame), '', dtype=object)
+    has_value = np.zeros(len(frame), dtype=bool)
+
+    for col in valid_columns(frame.columns):
+        values = frame[col]
+        mask = values.notna().to_numpy()
+        if not mask.any():
+            continue
+
+        # "Column: Value" for the non-null cells of the column
+        cells = np.full(len(frame), '', dtype=object)
+        cells[mask] = [f"{col}: {value}" for value in values.to_numpy(dtype=object)[mask]]
+
+        # Separate from the previous cells of the row only when both have content
+        separators = np.where(mask & has_value, '\n', '')
+        texts = texts + separators + cells
+        has_value |= mask
+
+    positions = np.flatnonzero(has_value)
+    return texts[positions], positions
+
+
+def unique_headers(header: tuple) -> list:
+    """
+    Names the columns of a streamed sheet the same way pandas does
+    (empty headers become "Unnamed: n" and repeated ones get a ".1", ".2"... suffix)
+    """
+    columns, seen = [], {}
+    for index, name in enumerate(header):
+        name = f"Unnamed: {index}" if name is None else name
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def iter_sheet_frames(filepath: str, chunk_rows: int = 50_000):
+    """
+    Yields every sheet of a workbook as DataFrames of at most chunk_rows rows.
+    .xlsx files are streamed with openpyxl in read-only mode, so large workbooks are never
+    fully loaded; other formats (.xls) are read by pandas one sheet at a time.
+    :return: Generator of (sheet name, first Excel row number of the chunk, DataFrame)
+    """
+    if os.path.splitext(filepath)[1].lower() in STREAMABLE_EXTENSIONS:
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+
+                columns = unique_headers(header)
+                buffer, first_row = [], 2  # Row 1 is the header
+                for row in rows:
+                    # Rows of a read-only sheet can be shorter or longer than the header
+                    buffer.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+                    if len(buffer) >= chunk_rows:
+                        yield sheet.title, first_row, pd.DataFrame(buffer, columns=columns)
+                        first_row += len(buffer)
+                        buffer = []
+
+                if buffer:
+                    yield sheet.title, first_row, pd.DataFrame(buffer, columns=columns)
+        finally:
+            workbook.close()
+    else:
+        # The workbook is parsed once, every sheet is read from the same ExcelFile
+        with pd.ExcelFile(filepath) as workbook:
+            for sheet_name in workbook.sheet_names:
+                frame = workbook.parse(sheet_name)
+                for start in range(0, len(frame), chunk_rows):
+                    yield sheet_name, start + 2, frame.iloc[start:start + chunk_rows]
+
+
+def build_tabular_documents(filepath: str, max_chars: int = 1200, chunk_rows: int = 50_000):
+    """
+    Serializes all the sheets of a workbook and groups consecutive rows into documents
+    of up to max_chars characters (a row longer than that is a document on its own).
+    :param filepath: Path of the Excel file
+    :param max_chars: Maximum size of a document, usually the chunk size of the splitter
+    :param chunk_rows: Number of rows read at once
+    :return: Generator of Documents with the source, sheet and first row in the metadata
+    """
+    for sheet_name, first_row, frame in iter_sheet_frames(filepath, chunk_rows):
+        texts, positions = serialize_rows(frame)
+
+        batch, batch_chars, batch_row = [], 0, None
+        for text, position in zip(texts, positions):
+            if batch and batch_chars + len(text) + 2 > max_chars:
+                yield Document(page_content="\n\n".join(batch),
+                               metadata={'source': filepath, 'sheet': str(sheet_name), 'row': batch_row})
+                batch, batch_chars = [], 0
+
+            if not batch:
+                batch_row = int(first_row + position)
+            batch.append(text)
+            batch_chars += len(text) + 2
+
+        if batch:
+            yield Document(page_content="\n\n".join(batch),
+                           metadata={'source': filepath, 'sheet': str(sheet_name), 'row': batch_row})
@@ -0,0 +1,85 @@
+# Python Imports
+import re
+
+# Precompiled normalizer for ProcessData.preprocess_page_content.
+#
+# The original function ran ~15 re.sub passes plus two word loops. The passes are merged into three
+# groups of patterns that never interfere with each other (they match disjoint characters or whole
+# words, and every replacement is a single space), so one alternation per group gives exactly the
+# same output as running them one by one:
+#   1. "/..." and "\..." sequences, "fp__&__" placeholders, "---" lines and non printable-ASCII
+#      characters (this also removes the emojis, the old emoji pass never matched anything after it).
+#   2. Numbers of two or more digits at the end of a word, runs of punctuation and standalone numbers.
+#   3. Single characters, generic placeholders (xx, yyyy...) and words mixing letters and digits.
+#      The old "mm-dd" placeholder is not included: its hyphen is always removed as a single
+#      character first, so it never matched.
+# After the first group the text is printable ASCII, so the last two groups use re.ASCII.
+
+_FIRST_PASS = re.compile(
+    r'/\S+'               # Sequences like "/..."
+    r'|\\(?:[^\s/]|/(?!\S))+'  # Sequences like "\..." (up to a "/..." removed by the previous pattern)
+    r'|-{3,}'             # Lines with more than three hyphens
+    r'|[^\x20-\x7E]'      # Non printable-ASCII characters (emojis included)
+)
+
+# Same pass including the placeholders like "fp__&__", only used when the text contains "__&__"
+# because that alternative backtracks over every word
+_FIRST_PASS_WITH_PLACEHOLDERS = re.compile(
+    r'/\S+'
+    r'|\\(?:[^\s/]|/(?!\S))+'
+    r'|\b\w+__&__\b'
+    r'|-{3,}'
+    r'|[^\x20-\x7E]'
+)
+
+_SECOND_PASS = re.compile(
+    r'\d{2,}\b'           # Larger numbers likely not semantically important
+    r'|[.,:;!]+'          # Excessive punctuation
+    r'|\b\d+\b',          # Standalone numbers
+    flags=re.ASCII
+)
+
+_THIRD_PASS = re.compile(
+    r'\b[^0-9\s]\b'                               # Single characters except numbers
+    r'|\b(?:xx|xxx|xxxx|yyyy)\b'                  # Generic placeholders and example values
+    r'|\b(?=\w*\d)(?=\w*[a-zA-Z])\w+\b',          # Words with both letters and digits
+    flags=re.ASCII
+)
+
+
+def normalize_text(text: str, n_words: int = 8) -> str:
+    """
+    Normalizes a chunk exactly like the original preprocess_page_content:
+    lowercase, three regex passes, one tokenization, removal of consecutive repeated words
+    and of consecutive repeated blocks of n_words words.
+    :param text: Raw chunk text
+    :param n_words: Size of the word blocks compared to remove repeated phrases
+    :return: Normalized text
+    """
+    processed_text = text.lower()
+    first_pass = _FIRST_PASS_WITH_PLACEHOLDERS if '__&__' in processed_text else _FIRST_PASS
+    processed_text = first_pass.sub(' ', processed_text)
+    processed_text = _SECOND_PASS.sub(' ', processed_text)
+    processed_text = _THIRD_PASS.sub(' ', processed_text)
+
+    # Single tokenization (the text only has spaces at this point)
+    words = processed_text.split()
+
+    # Remove consecutive repeated words
+    words = [word for index, word in enumerate(words) if index == 0 or word != words[index - 1]]
+
+    # Remove consecutive repeated blocks of n_words words
+    blocks = []
+    for start in range(0, len(words), n_words):
+        block = ' '.join(words[start:start + n_words])
+        if not blocks or block != blocks[-1]:
+            blocks.append(block)
+
+    return ' '.join(blocks)
+
+
+def normalize_texts(texts: list, n_words: int = 8) -> list:
+    """
+    Batch version of normalize_text for a list of chunks
+    """
+    return [normalize_text(text, n_words) for text in texts]
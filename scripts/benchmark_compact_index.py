@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Import Third-Party Libraries
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from scripts.compact_index import CompactIndex, build_compact_index, export_from_chroma
+
+
+def synthetic_corpus(records: int, dimension: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """
+    Clustered random embeddings, closer to real text embeddings than uniform noise.
+    """
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[generator.integers(clusters, size=records)] + 0.6 * generator.normal(size=(records, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def perturbed_queries(vectors: np.ndarray, queries: int, seed: int = 1) -> np.ndarray:
+    """
+    Queries close to (but not equal to) stored vectors.
+    """
+    generator = np.random.default_rng(seed)
+    sample = vectors[generator.choice(len(vectors), size=queries, replace=False)]
+    return sample + 0.3 * generator.normal(size=sample.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+
+
+def measure(search, queries: np.ndarray) -> tuple:
+    """
+    Runs a search function over all the queries.
+
+    Returns:
+        tuple: (list of result ID lists, latencies in milliseconds)
+    """
+    results, latencies = [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return results, np.array(latencies)
+
+
+def recall(results: list, ground_truth: list) -> float:
+    return float(np.mean([len(set(result) & set(truth)) / max(len(truth), 1) for result, truth in zip(results, ground_truth)]))
+
+
+def report(name: str, results: list, latencies: np.ndarray, ground_truth: list):
+    print(f"{name:<22} recall@k {recall(results, ground_truth):.3f}   "
+          f"p50 {np.percentile(latencies, 50):7.2f} ms   p95 {np.percentile(latencies, 95):7.2f} ms")
+
+
+def compact_searches(directory: str, k: int, nprobe: int) -> dict:
+    compact_index = CompactIndex(directory)
+
+    def rows_to_ids(rows):
+        return [compact_index.get_record(row)['id'] for row in rows]
+
+    return {
+        'exact': lambda query: rows_to_ids(compact_index.search_rows(query, k=k, mode='exact')[0]),
+        f'ann (nprobe={nprobe})': lambda query: rows_to_ids(compact_index.search_rows(query, k=k, mode='ann', nprobe=nprobe)[0]),
+    }
+
+
+def benchmark_synthetic(records: int, dimension: int, queries: int, k: int, nprobe: int):
+    """
+    Compares the compact index against a float32 brute-force search over synthetic embeddings.
+    """
+    vectors = synthetic_corpus(records, dimension)
+    query_vectors = perturbed_queries(vectors, queries)
+    ids = [str(row) for row in range(records)]
+
+    ground_truth, latencies = measure(lambda query: [ids[row] for row in np.argsort(-(vectors @ query))[:k]], query_vectors)
+    report('float32 brute force', ground_truth, latencies, ground_truth)
+
+    for dtype in ('float16', 'int8'):
+        with tempfile.TemporaryDirectory() as directory:
+            batches = ((ids[start:start + 10000], vectors[start:start + 10000],
+                        [''] * len(ids[start:start + 10000]), [{}] * len(ids[start:start + 10000]))
+                       for start in range(0, records, 10000))
+            build_compact_index(directory, batches, dimension, records, dtype=dtype)
+            size_mb = os.path.getsize(os.path.join(directory, 'embeddings.npy')) / 1024 / 1024
+            print(f"{dtype}: {size_mb:.1f} MB of embeddings ({records * dimension * 4 / 1024 / 1024:.1f} MB in float32)")
+
+            for mode, search in compact_searches(directory, k, nprobe).items():
+                results, latencies = measure(search, query_vectors)
+                report(f"{dtype} {mode}", results, latencies, ground_truth)
+
+
+def benchmark_chroma(data_directory: str, index_directory: str, queries: int, k: int, nprobe: int, dtype: str):
+    """
+    Compares the compact index against the Chroma collection it was exported from. The queries are
+    perturbed stored embeddings, so no embedding request is needed.
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(collection_name="apec_vectorstores", persist_directory=data_directory)._collection
+
+    if not os.path.exists(os.path.join(index_directory, 'index.json')):
+        export_from_chroma(data_directory, index_directory, dtype=dtype)
+
+    sample = collection.get(include=['embeddings'], limit=queries)
+    query_vectors = perturbed_queries(np.asarray(sample['embeddings'], dtype=np.float32), len(sample['ids']))
+
+    ground_truth, latencies = measure(
+        lambda query: collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])['ids'][0], query_vectors)
+    report('chroma (hnsw)', ground_truth, latencies, ground_truth)
+
+    for mode, search in compact_searches(index_directory, k, nprobe).items():
+        results, latencies = measure(search, query_vectors)
+        report(f"compact {mode}", results, latencies, ground_truth)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recall and latency of the compact index")
+    parser.add_argument("--data-directory", help="Chroma store to compare with (synthetic data if not given)")
+    parser.add_argument("--index-directory", default=os.path.join(os.path.dirname(os.path.realpath(__file__)), "../data/compact_index"))
+    parser.add_argument("--dtype", choices=['int8', 'float16'], default='int8')
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.data_directory:
+        benchmark_chroma(args.data_directory, args.index_directory, args.queries, args.k, args.nprobe, args.dtype)
+    else:
+        benchmark_synthetic(args.records, args.dimension, args.queries, args.k, args.nprobe)
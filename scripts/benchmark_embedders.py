@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Import Third-Party Libraries
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from scripts.config import load_config
+from scripts.embedders import create_embedder, MicroBatchingEmbedder, EMBEDDING_BACKENDS
+
+# Queries used when no query file is given
+DEFAULT_QUERIES = [
+    'TLS Console require maintenance?',
+    'What does error E01 mean?',
+    'How do I calibrate the probe of the TLS-450?',
+    'Replacement part number for the KSB pump seal',
+    'Steps to reset the kiosk after a power failure',
+    'Which alarms are raised by a leak in the interstitial space?',
+    'How often must the dispenser filters be replaced?',
+    'Wiring diagram of the submersible turbine pump controller',
+    'What is the maximum operating temperature of the sensor?',
+    'How to configure the printer of the console',
+    'Error code 2001 on the payment terminal',
+    'Procedure to test the line leak detector',
+]
+
+
+def measure_sequential(embedder, queries: list) -> np.ndarray:
+    """
+    One query at a time.
+
+    Returns:
+        np.ndarray: Latencies in milliseconds.
+    """
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        embedder.embed_query(query)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return np.array(latencies)
+
+
+def measure_concurrent(embedder, queries: list, concurrency: int) -> tuple:
+    """
+    Queries sent by several threads at the same time, as the API workers do.
+
+    Returns:
+        tuple: (latencies in milliseconds, queries per second)
+    """
+    def timed_query(query):
+        start_time = time.perf_counter()
+        embedder.embed_query(query)
+        return (time.perf_counter() - start_time) * 1000
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed_query, queries))
+    return np.array(latencies), len(queries) / (time.perf_counter() - start_time)
+
+
+def report(name: str, latencies: np.ndarray, queries_per_second: float, extra: str = ''):
+    print(f"  {name:<28} p50 {np.percentile(latencies, 50):8.2f} ms   p95 {np.percentile(latencies, 95):8.2f} ms   "
+          f"{queries_per_second:8.1f} queries/sec {extra}")
+
+
+def benchmark_backend(backend: str, model: str, queries: list, concurrency: int):
+    """
+    Latency and throughput of one backend: sequential queries, concurrent queries with and without
+    micro-batching, and one batched call with all the queries.
+    """
+    start_time = time.perf_counter()
+    embedder = create_embedder(backend, model)
+    embedder.embed_query(queries[0])  # Warm-up (model load, connection)
+    print(f"{backend} (loaded in {time.perf_counter() - start_time:.1f}s, dimension {len(embedder.embed_query(queries[0]))})")
+
+    latencies = measure_sequential(embedder, queries)
+    report('sequential', latencies, len(queries) / (latencies.sum() / 1000))
+
+    latencies, queries_per_second = measure_concurrent(embedder, queries, concurrency)
+    report(f'concurrent ({concurrency} threads)', latencies, queries_per_second)
+
+    micro_batcher = MicroBatchingEmbedder(embedder)
+    latencies, queries_per_second = measure_concurrent(micro_batcher, queries, concurrency)
+    report(f'micro-batched ({concurrency} threads)', latencies, queries_per_second,
+           f"(average batch {micro_batcher.average_batch_size():.1f})")
+
+    start_time = time.perf_counter()
+    embedder.embed_documents(queries)
+    elapsed = time.perf_counter() - start_time
+    report('one batch', np.array([elapsed * 1000]), len(queries) / elapsed)
+
+
+if __name__ == '__main__':
+    load_config()
+
+    parser = argparse.ArgumentParser(description="Latency and throughput of the embedding backends on the same queries")
+    parser.add_argument("--backends", default="openai", help=f"Comma separated list of {EMBEDDING_BACKENDS}")
+    parser.add_argument("--model", help="Model, Azure deployment or local model directory (defaults to the environment)")
+    parser.add_argument("--queries-file", help="One query per line (a built-in set of queries if not given)")
+    parser.add_argument("--repeat", type=int, default=4, help="Times the query set is repeated")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.queries_file:
+        with open(args.queries_file, 'r') as file:
+            query_set = [line.strip() for line in file if line.strip()]
+    else:
+        query_set = DEFAULT_QUERIES
+    query_set = query_set * args.repeat
+
+    print(f"{len(query_set)} queries")
+    for backend_name in args.backends.split(','):
+        try:
+            benchmark_backend(backend_name.strip(), args.model, query_set, args.concurrency)
+        except Exception as e:
+            print(f"{backend_name}: {e}")
@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import random
+import threading
+import difflib
+import argparse
+from io import BytesIO
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+# Import Third-Party Libraries
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from scripts import tesserac
+from scripts.config import get_vision_client
+from scripts.ocr_tiling import MAX_IMAGE_BYTES, MAX_IMAGE_SIDE
+
+# OCR calls made by all the threads of the OCR pool
+call_counter = 0
+call_counter_lock = threading.Lock()
+
+
+class StandInVisionClient:
+    """
+    Local stand-in of the Azure Vision client: Tesseract lines with their bounding polygons, the size
+    limits of the service and a simulated round trip (fixed latency plus the upload of the image).
+    """
+
+    def __init__(self, call_latency_ms: float, upload_mbps: float):
+        self.call_latency_ms = call_latency_ms
+        self.upload_mbps = upload_mbps
+
+    def analyze(self, image_data: bytes, visual_features: list):
+        import pytesseract
+        from PIL import Image
+
+        image = Image.open(BytesIO(image_data))
+        if len(image_data) > MAX_IMAGE_BYTES or max(image.size) > MAX_IMAGE_SIDE:
+            raise ValueError(f"InvalidImageSize: {image.size}, {len(image_data)} bytes")
+        time.sleep(self.call_latency_ms / 1000 + len(image_data) * 8 / (self.upload_mbps * 1e6))
+
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        lines = {}
+        for index, word in enumerate(data['text']):
+            if not word.strip():
+                continue
+            key = (data['block_num'][index], data['par_num'][index], data['line_num'][index])
+            left, top = data['left'][index], data['top'][index]
+            right, bottom = left + data['width'][index], top + data['height'][index]
+            words, box = lines.get(key, ([], (left, top, right, bottom)))
+            words.append(word)
+            lines[key] = (words, (min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)))
+
+        return SimpleNamespace(read=SimpleNamespace(blocks=[SimpleNamespace(lines=[
+            SimpleNamespace(text=" ".join(words), bounding_polygon=[
+                SimpleNamespace(x=left, y=top), SimpleNamespace(x=right, y=top),
+                SimpleNamespace(x=right, y=bottom), SimpleNamespace(x=left, y=bottom)])
+            for words, (left, top, right, bottom) in lines.values()])]))
+
+
+class CountingVisionClient:
+    """
+    Counts the calls to analyze.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def analyze(self, **kwargs):
+        global call_counter
+        with call_counter_lock:
+            call_counter += 1
+        return self.client.analyze(**kwargs)
+
+
+def install_counting_client(ocr: str, call_latency_ms: float, upload_mbps: float):
+    """
+    The calls of tesserac go through a counting client.
+    """
+    if ocr == 'stand-in':
+        counting_client = CountingVisionClient(StandInVisionClient(call_latency_ms, upload_mbps))
+    else:
+        counting_client = CountingVisionClient(get_vision_client())
+    tesserac.get_vision_client = lambda: counting_client
+
+
+def sample_queries(pdf_directory: str, queries: int, hits_per_query: int, seed: int = 0) -> list:
+    """
+    Random (PDF path, page number) hits, grouped as the results of a query.
+    """
+    from PyPDF2 import PdfReader
+
+    pdf_paths = [os.path.join(root, file) for root, _, files in os.walk(pdf_directory)
+                 for file in files if file.lower().endswith('.pdf')]
+    generator = random.Random(seed)
+    page_counts = {}
+    sampled = []
+    for _ in range(queries):
+        hits = []
+        for pdf_path in generator.choices(pdf_paths, k=hits_per_query):
+            if pdf_path not in page_counts:
+                page_counts[pdf_path] = len(PdfReader(pdf_path).pages)
+            hits.append((pdf_path, generator.randint(1, page_counts[pdf_path])))
+        sampled.append(hits)
+    return sampled
+
+
+def run_queries(queries: list, window: int, batching: bool) -> tuple:
+    """
+    OCR of the hits of every query in parallel, as extract_context_from_vector_search does.
+
+    Returns:
+        tuple: (latency of every query in milliseconds, calls of every query, texts of all the hits)
+    """
+    latencies, calls, texts = [], [], []
+    for hits in queries:
+        calls_before = call_counter
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(hits)) as executor:
+            texts += list(executor.map(
+                lambda hit: tesserac.pdf_to_text(hit[0], page=hit[1], n=window, batching=batching), hits))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        calls.append(call_counter - calls_before)
+    return np.array(latencies), np.array(calls), texts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="OCR calls per query and latency, with and without page batching")
+    parser.add_argument("--pdf-directory", default=os.getenv('BASE_PATH_PIPELINE'), help="Directory with the PDFs to sample")
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--hits-per-query", type=int, default=3)
+    parser.add_argument("--window", type=int, default=1, help="Pages before and after every hit")
+    parser.add_argument("--ocr", choices=["stand-in", "azure"], default="stand-in",
+                        help="stand-in: Tesseract with a simulated round trip, azure: the real service (billed)")
+    parser.add_argument("--call-latency-ms", type=float, default=800.0, help="Round trip of a stand-in call")
+    parser.add_argument("--upload-mbps", type=float, default=20.0, help="Upload bandwidth of the stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.pdf_directory:
+        parser.error("--pdf-directory (or BASE_PATH_PIPELINE) is required")
+
+    query_hits = sample_queries(args.pdf_directory, args.queries, args.hits_per_query, args.seed)
+    install_counting_client(args.ocr, args.call_latency_ms, args.upload_mbps)
+
+    print(f"{len(query_hits)} queries, {args.hits_per_query} hits per query, +-{args.window} pages per hit, OCR: {args.ocr}")
+    reference_texts = None
+    for mode, batching in (('per-page', False), ('batched', True)):
+        latencies, calls, texts = run_queries(query_hits, args.window, batching)
+        line = (f"  {mode:<10} calls/query {calls.mean():5.1f}   p50 {np.percentile(latencies, 50):8.1f} ms   "
+                f"p95 {np.percentile(latencies, 95):8.1f} ms")
+        if reference_texts is None:
+            reference_texts = texts
+        else:
+            similarity = np.mean([difflib.SequenceMatcher(None, text, reference, autojunk=False).ratio()
+                                  for text, reference in zip(texts, reference_texts)])
+            line += f"   text similarity to per-page {similarity:.3f}"
+        print(line)
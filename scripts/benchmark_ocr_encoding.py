@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+from io import BytesIO
+
+# Import Third-Party Libraries
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from scripts.ocr_encoding import encode_page, ENCODING_PROFILES, DEFAULT_PROFILE
+
+
+def sample_pages(pdf_directory: str, sample_pdfs: int, pages_per_pdf: int, dpi: int, seed: int = 0) -> list:
+    """
+    Renders random pages of a random sample of the PDFs of a directory.
+
+    Returns:
+        list: (PDF name, page number, PIL image) tuples.
+    """
+    from pdf2image import convert_from_path
+    from PyPDF2 import PdfReader
+
+    pdf_paths = [os.path.join(root, file) for root, _, files in os.walk(pdf_directory)
+                 for file in files if file.lower().endswith('.pdf')]
+    generator = random.Random(seed)
+    pages = []
+    for pdf_path in generator.sample(pdf_paths, min(sample_pdfs, len(pdf_paths))):
+        try:
+            total_pages = len(PdfReader(pdf_path).pages)
+            for page in sorted(generator.sample(range(1, total_pages + 1), min(pages_per_pdf, total_pages))):
+                image = convert_from_path(pdf_path, first_page=page, last_page=page, dpi=dpi)[0]
+                pages.append((os.path.basename(pdf_path), page, image))
+        except Exception as e:
+            print(f"Skipping {pdf_path}: {e}")
+    return pages
+
+
+def tesseract_ocr(image_bytes: bytes) -> str:
+    """
+    Local stand-in of the OCR service: Tesseract on the encoded image, as the service receives it.
+    """
+    import pytesseract
+    from PIL import Image
+
+    return pytesseract.image_to_string(Image.open(BytesIO(image_bytes)))
+
+
+def azure_ocr(image_bytes: bytes) -> str:
+    from scripts.config import load_config, get_vision_client
+
+    load_config()
+    result = get_vision_client().analyze(image_data=image_bytes, visual_features=["Read"])
+    if result.read is None:
+        return ""
+    return "\n".join(line.text for block in result.read.blocks for line in block.lines)
+
+
+def text_similarity(text: str, reference: str) -> float:
+    """
+    Similarity of the recognized text to the reference, ignoring the whitespace layout (1.0 = identical).
+    """
+    return difflib.SequenceMatcher(None, " ".join(text.split()), " ".join(reference.split()), autojunk=False).ratio()
+
+
+def benchmark_profiles(pages: list, profiles: list, ocr, upload_mbps: float):
+    """
+    Bytes per page, encoding time, estimated upload time, OCR latency and text accuracy of every
+    profile. The reference text of a page is the OCR of its DEFAULT_PROFILE encoding (the original one).
+    """
+    references = [ocr(encode_page(image, DEFAULT_PROFILE)) for _, _, image in pages]
+
+    print(f"{len(pages)} pages, upload bandwidth {upload_mbps:.0f} Mbit/s")
+    print(f"{'profile':<18} {'KB/page':>9} {'encode ms':>10} {'upload ms':>10} {'OCR p50 ms':>11} "
+          f"{'OCR p95 ms':>11} {'total ms':>9} {'accuracy':>9} {'delta':>8}")
+
+    for profile in profiles:
+        sizes, encode_times, ocr_times, similarities = [], [], [], []
+        for (_, _, image), reference in zip(pages, references):
+            start_time = time.perf_counter()
+            image_bytes = encode_page(image, profile)
+            encode_times.append((time.perf_counter() - start_time) * 1000)
+            sizes.append(len(image_bytes))
+
+            start_time = time.perf_counter()
+            text = ocr(image_bytes)
+            ocr_times.append((time.perf_counter() - start_time) * 1000)
+            similarities.append(text_similarity(text, reference))
+
+        upload_ms = np.mean(sizes) * 8 / (upload_mbps * 1e6) * 1000
+        accuracy = float(np.mean(similarities))
+        print(f"{profile:<18} {np.mean(sizes) / 1024:9.1f} {np.mean(encode_times):10.1f} {upload_ms:10.1f} "
+              f"{np.percentile(ocr_times, 50):11.1f} {np.percentile(ocr_times, 95):11.1f} "
+              f"{np.mean(encode_times) + upload_ms + np.median(ocr_times):9.1f} {accuracy:9.3f} {accuracy - 1:+8.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the OCR encoding profiles on a sample of our PDFs")
+    parser.add_argument("--pdf-directory", default=os.getenv('BASE_PATH_PIPELINE'), help="Directory with the PDFs to sample")
+    parser.add_argument("--sample-pdfs", type=int, default=10)
+    parser.add_argument("--pages-per-pdf", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--profiles", default=",".join(ENCODING_PROFILES), help="Comma separated list of profiles")
+    parser.add_argument("--ocr", choices=["tesseract", "azure"], default="tesseract",
+                        help="tesseract: local stand-in, azure: the real service (billed)")
+    parser.add_argument("--upload-mbps", type=float, default=20.0, help="Upload bandwidth used to estimate the upload time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.pdf_directory:
+        parser.error("--pdf-directory (or BASE_PATH_PIPELINE) is required")
+
+    sampled_pages = sample_pages(args.pdf_directory, args.sample_pdfs, args.pages_per_pdf, args.dpi, args.seed)
+    if not sampled_pages:
+        sys.exit("No pages could be rendered")
+
+    benchmark_profiles(sampled_pages, [profile.strip() for profile in args.profiles.split(',')],
+                       tesseract_ocr if args.ocr == 'tesseract' else azure_ocr, args.upload_mbps)
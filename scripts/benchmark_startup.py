@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+# Root of the repository, where app.py is imported from
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+IMPORT_TIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def run_import(module: str) -> tuple:
+    """
+    Imports a module in a new interpreter, as a worker does on a cold start.
+
+    Returns:
+        tuple: (seconds, stderr with the -X importtime report)
+    """
+    start_time = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=ROOT_DIRECTORY, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start_time
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed (exit code {completed.returncode}):\n{completed.stderr[-2000:]}")
+    return elapsed, completed.stderr
+
+
+def slowest_imports(report: str, top: int = 10) -> list:
+    """
+    Distributions with the highest import time: the own time of all their modules is added up
+    under the top-level package name (e.g. every langchain_core.* module counts as langchain_core).
+
+    Returns:
+        list: (package, milliseconds) tuples, slowest first.
+    """
+    packages = {}
+    for self_us, _, _, module in IMPORT_TIME_LINE.findall(report):
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def benchmark_startup(module: str, repeat: int, budget: float) -> bool:
+    """
+    Measures the import time of a module, without the start of the interpreter.
+
+    Returns:
+        bool: True if the median is within the budget.
+    """
+    interpreter_times = [run_import('sys')[0] for _ in range(repeat)]
+    baseline = statistics.median(interpreter_times)
+
+    import_times, report = [], ''
+    for _ in range(repeat):
+        elapsed, report = run_import(module)
+        import_times.append(elapsed - baseline)
+
+    median = statistics.median(import_times)
+    print(f"import {module}: median {median:.3f}s, min {min(import_times):.3f}s, max {max(import_times):.3f}s "
+          f"(interpreter start {baseline:.3f}s, {repeat} runs)")
+    print("Slowest imports:")
+    for package, milliseconds in slowest_imports(report):
+        print(f"  {package:<45} {milliseconds:8.1f} ms")
+
+    if median > budget:
+        print(f"FAIL: import time {median:.3f}s is over the budget of {budget:.3f}s")
+        return False
+    print(f"OK: import time {median:.3f}s is within the budget of {budget:.3f}s")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold import time of the API, with a budget (exit code 1 when it is exceeded)")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET", "1.5")),
+                        help="Maximum median import time in seconds")
+    args = parser.parse_args()
+
+    sys.exit(0 if benchmark_startup(args.module, args.repeat, args.budget) else 1)
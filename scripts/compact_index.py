@@ -0,0 +1,320 @@
+import os
+import json
+import argparse
+
+# Import Third-Party Libraries
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    from scripts.partition_router import where_to_conditions
+except ImportError:  # Run as a script from the scripts directory
+    from partition_router import where_to_conditions
+
+# Rows scored at once by the exact search (bounds the temporary memory per query)
+SEARCH_BLOCK_ROWS = 65536
+
+# Records read from Chroma per call during the export
+EXPORT_BATCH_SIZE = 5000
+
+# Metadata keys with a row list per value, so a partition is searched without scanning the rest
+PARTITION_KEYS = ['family', 'vendor', 'type_data']
+
+
+def quantize(embeddings: np.ndarray, dtype: str) -> tuple:
+    """
+    Normalizes the embeddings (cosine similarity becomes a dot product) and quantizes them.
+
+    Args:
+        embeddings (np.ndarray): Float embeddings, one per row.
+        dtype (str): 'float16' or 'int8'. int8 uses a scale per row.
+
+    Returns:
+        tuple: (quantized embeddings, scale of every row)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.maximum(norms, 1e-12)
+
+    if dtype == 'float16':
+        return embeddings.astype(np.float16), np.ones(len(embeddings), dtype=np.float32)
+
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    return np.round(embeddings / scales[:, None]).astype(np.int8), scales
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means used as the coarse quantizer of the ANN mode.
+
+    Args:
+        vectors (np.ndarray): Normalized float32 vectors (a sample of the index is enough).
+        n_lists (int): Number of centroids (inverted lists).
+
+    Returns:
+        np.ndarray: Normalized centroids, one per row.
+    """
+    generator = np.random.default_rng(seed)
+    centroids = vectors[generator.choice(len(vectors), size=n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for list_id in range(n_lists):
+            members = vectors[assignments == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+            else:
+                # Empty list: restart it from a random vector
+                centroids[list_id] = vectors[generator.integers(len(vectors))]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    return centroids
+
+
+def build_compact_index(output_directory: str, records, dimension: int, total: int,
+                        dtype: str = 'int8', n_lists: int = None, sample_size: int = 100_000):
+    """
+    Writes a read-only compact index: quantized embeddings in a memory-mapped file, the texts and
+    metadata in a JSON lines file with an offsets table, and the inverted lists of the ANN mode.
+
+    Args:
+        output_directory (str): Directory of the index.
+        records (iterable): Batches of (ids, embeddings, documents, metadatas).
+        dimension (int): Size of the embeddings.
+        total (int): Number of records.
+        dtype (str): 'float16' or 'int8'.
+        n_lists (int): Number of inverted lists of the ANN mode (sqrt of the records by default).
+        sample_size (int): Records used to train the ANN centroids.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+
+    embeddings = np.lib.format.open_memmap(os.path.join(output_directory, 'embeddings.npy'), mode='w+',
+                                           dtype=np.dtype(dtype), shape=(total, dimension))
+    scales = np.lib.format.open_memmap(os.path.join(output_directory, 'scales.npy'), mode='w+',
+                                       dtype=np.float32, shape=(total,))
+    offsets = np.zeros(total + 1, dtype=np.uint64)
+    partition_rows = {}  # (key, value) -> rows
+
+    row = 0
+    with open(os.path.join(output_directory, 'records.jsonl'), 'wb') as records_file:
+        for ids, batch_embeddings, documents, metadatas in records:
+            quantized, batch_scales = quantize(batch_embeddings, dtype)
+            embeddings[row:row + len(ids)] = quantized
+            scales[row:row + len(ids)] = batch_scales
+
+            for index, (record_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+                line = json.dumps({'id': record_id, 'document': document, 'metadata': metadata or {}}).encode('utf-8') + b'\n'
+                records_file.write(line)
+                offsets[row + index + 1] = offsets[row + index] + len(line)
+
+                for key in PARTITION_KEYS:
+                    if metadata and metadata.get(key):
+                        partition_rows.setdefault((key, metadata[key]), []).append(row + index)
+
+            row += len(ids)
+            print(f"Exported {row}/{total} records")
+
+    np.save(os.path.join(output_directory, 'offsets.npy'), offsets[:row + 1])
+
+    # Inverted lists of the ANN mode: rows sorted by their closest centroid
+    n_lists = n_lists or max(1, int(np.sqrt(row)))
+    n_lists = min(n_lists, row)
+    generator = np.random.default_rng(0)
+    sample_rows = np.sort(generator.choice(row, size=min(sample_size, row), replace=False))
+    sample = embeddings[sample_rows].astype(np.float32) * scales[sample_rows, None]
+    centroids = train_centroids(sample, n_lists)
+
+    assignments = np.empty(row, dtype=np.int32)
+    for start in range(0, row, SEARCH_BLOCK_ROWS):
+        block = embeddings[start:start + SEARCH_BLOCK_ROWS].astype(np.float32)
+        assignments[start:start + SEARCH_BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+
+    list_rows = np.argsort(assignments, kind='stable').astype(np.uint32)
+    list_offsets = np.searchsorted(assignments[list_rows], np.arange(n_lists + 1)).astype(np.uint64)
+
+    np.save(os.path.join(output_directory, 'centroids.npy'), centroids.astype(np.float32))
+    np.save(os.path.join(output_directory, 'list_rows.npy'), list_rows)
+    np.save(os.path.join(output_directory, 'list_offsets.npy'), list_offsets)
+
+    # Rows of every partition value (the names in the npz file are generic, values can have any character)
+    partition_names = {}
+    for number, ((key, value), rows) in enumerate(partition_rows.items()):
+        partition_names.setdefault(key, {})[value] = f"p{number}"
+    np.savez(os.path.join(output_directory, 'partitions.npz'),
+             **{partition_names[key][value]: np.asarray(rows, dtype=np.uint32) for (key, value), rows in partition_rows.items()})
+    with open(os.path.join(output_directory, 'partitions.json'), 'w') as file:
+        json.dump(partition_names, file)
+
+    embeddings.flush()
+    scales.flush()
+    with open(os.path.join(output_directory, 'index.json'), 'w') as file:
+        json.dump({'records': row, 'dimension': dimension, 'dtype': dtype, 'n_lists': n_lists, 'metric': 'cosine'}, file)
+
+
+def export_from_chroma(data_directory: str, output_directory: str, dtype: str = 'int8',
+                       collection_name: str = 'apec_vectorstores', n_lists: int = None):
+    """
+    Exports a Chroma collection to a compact index.
+
+    Args:
+        data_directory (str): Persist directory of the Chroma store.
+        output_directory (str): Directory of the compact index.
+        dtype (str): 'float16' or 'int8'.
+        collection_name (str): Name of the collection.
+        n_lists (int): Number of inverted lists of the ANN mode.
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(collection_name=collection_name, persist_directory=data_directory)._collection
+    total = collection.count()
+    if total == 0:
+        raise ValueError(f"The collection '{collection_name}' is empty")
+
+    dimension = len(collection.get(limit=1, include=['embeddings'])['embeddings'][0])
+
+    def batches():
+        for offset in range(0, total, EXPORT_BATCH_SIZE):
+            batch = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=EXPORT_BATCH_SIZE, offset=offset)
+            yield batch['ids'], batch['embeddings'], batch['documents'], batch['metadatas']
+
+    build_compact_index(output_directory, batches(), dimension, total, dtype=dtype, n_lists=n_lists)
+
+
+class CompactIndex:
+    """
+    Read-only index over a compact index directory.
+
+    The embeddings, offsets and inverted lists are memory-mapped, so several worker processes share
+    the same page-cached copy and only the rows that are scored are read from disk.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as file:
+            self.info = json.load(file)
+
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.scales = np.load(os.path.join(directory, 'scales.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        self.centroids = np.load(os.path.join(directory, 'centroids.npy'))
+        self.list_rows = np.load(os.path.join(directory, 'list_rows.npy'), mmap_mode='r')
+        self.list_offsets = np.load(os.path.join(directory, 'list_offsets.npy'))
+        self.records_file = os.path.join(directory, 'records.jsonl')
+
+        # Row lists of the partitions (indexes exported before the partitions existed have none)
+        self.partition_names, self.partitions = {}, None
+        if os.path.exists(os.path.join(directory, 'partitions.json')):
+            with open(os.path.join(directory, 'partitions.json')) as file:
+                self.partition_names = json.load(file)
+            self.partitions = np.load(os.path.join(directory, 'partitions.npz'))
+
+    def filter_rows(self, conditions: list):
+        """
+        Rows matching all the (key, value) equality conditions.
+
+        Returns:
+            np.ndarray: Sorted rows, or None if there are no conditions.
+        """
+        if not conditions:
+            return None
+
+        rows = None
+        for key, value in conditions:
+            name = self.partition_names.get(key, {}).get(value)
+            if name is None or self.partitions is None:
+                return np.empty(0, dtype=np.int64)
+            partition = self.partitions[name].astype(np.int64)
+            rows = partition if rows is None else np.intersect1d(rows, partition, assume_unique=True)
+        return rows
+
+    def __len__(self):
+        return self.info['records']
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray = None, start: int = 0, end: int = None) -> np.ndarray:
+        if rows is None:
+            block, scales = self.embeddings[start:end], self.scales[start:end]
+        else:
+            block, scales = self.embeddings[rows], self.scales[rows]
+        return (block.astype(np.float32) @ query) * scales
+
+    def search_rows(self, query_embedding, k: int = 4, mode: str = 'exact', nprobe: int = 8, where: dict = None) -> tuple:
+        """
+        Finds the rows most similar to a query embedding.
+
+        Args:
+            query_embedding (list): Embedding of the query.
+            k (int): Number of results.
+            mode (str): 'exact' scores every row, 'ann' only the rows of the nprobe closest lists.
+            nprobe (int): Inverted lists scored by the ANN mode.
+            where (dict): Chroma-like metadata filter (equalities on the partition keys).
+
+        Returns:
+            tuple: (rows, cosine similarities), best first.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        # Not in place: asarray returns the caller's array when it already is float32
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        partition_rows = self.filter_rows(where_to_conditions(where))
+
+        if partition_rows is not None and (mode != 'ann' or len(partition_rows) <= SEARCH_BLOCK_ROWS):
+            # Only the rows of the partition are scored (small partitions are always scored exactly)
+            candidate_blocks, score_blocks = [], []
+            for start in range(0, len(partition_rows), SEARCH_BLOCK_ROWS):
+                rows = partition_rows[start:start + SEARCH_BLOCK_ROWS]
+                candidate_blocks.append(rows)
+                score_blocks.append(self._score_rows(query, rows=rows))
+            if not candidate_blocks:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            candidates, scores = np.concatenate(candidate_blocks), np.concatenate(score_blocks)
+        elif mode == 'ann':
+            lists = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.concatenate([self.list_rows[self.list_offsets[list_id]:self.list_offsets[list_id + 1]]
+                                   for list_id in lists]).astype(np.int64)
+            rows.sort()  # Sequential reads of the memory map
+            if partition_rows is not None:
+                rows = rows[np.isin(rows, partition_rows, assume_unique=True)]
+            candidates, scores = rows, self._score_rows(query, rows=rows)
+        else:
+            candidate_blocks, score_blocks = [], []
+            for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+                block_scores = self._score_rows(query, start=start, end=start + SEARCH_BLOCK_ROWS)
+                top = np.argpartition(-block_scores, min(k, len(block_scores)) - 1)[:k]
+                candidate_blocks.append(top + start)
+                score_blocks.append(block_scores[top])
+            candidates, scores = np.concatenate(candidate_blocks), np.concatenate(score_blocks)
+
+        best = np.argsort(-scores)[:k]
+        return candidates[best], scores[best]
+
+    def get_record(self, row: int) -> dict:
+        with open(self.records_file, 'rb') as file:
+            file.seek(int(self.offsets[row]))
+            return json.loads(file.readline())
+
+    def search(self, query_embedding, k: int = 4, mode: str = 'exact', nprobe: int = 8, where: dict = None) -> list:
+        """
+        Same results format as Chroma.similarity_search_with_score: (Document, distance) tuples,
+        with the cosine distance (lower is more similar).
+        """
+        rows, scores = self.search_rows(query_embedding, k=k, mode=mode, nprobe=nprobe, where=where)
+        results = []
+        for row, score in zip(rows, scores):
+            record = self.get_record(row)
+            results.append((Document(id=record['id'], page_content=record['document'], metadata=record['metadata']),
+                            1.0 - float(score)))
+        return results
+
+
+if __name__ == '__main__':
+    from auxiliar_functions import absolute_path
+
+    parser = argparse.ArgumentParser(description="Export the Chroma collection to a compact quantized index")
+    parser.add_argument("--data-directory", default=absolute_path("../data/APEC_ChromaDB_v2"))
+    parser.add_argument("--output-directory", default=absolute_path("../data/compact_index"))
+    parser.add_argument("--dtype", choices=['int8', 'float16'], default='int8')
+    parser.add_argument("--n-lists", type=int, default=None)
+    args = parser.parse_args()
+
+    export_from_chroma(args.data_directory, args.output_directory, dtype=args.dtype, n_lists=args.n_lists)
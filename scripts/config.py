@@ -0,0 +1,80 @@
+import os
+import threading
+
+# Same API version for all the Azure OpenAI clients
+AZURE_OPENAI_API_VERSION = "2024-10-01-preview"
+
+_config_loaded = False
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def load_config():
+    """
+    Load the environment variables from the .env file. Only the first call reads the file, so every
+    module can call it at import time without paying for it again.
+    """
+    global _config_loaded
+    if not _config_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+        _config_loaded = True
+
+
+def _get_client(name: str, factory):
+    """
+    Create a client on first use and share it (with its connection pool) between the requests of the process.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def get_azure_openai_client():
+    """
+    Synchronous Azure OpenAI client.
+    """
+    def factory():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=AZURE_OPENAI_API_VERSION,
+        )
+    return _get_client('azure_openai', factory)
+
+
+def get_async_azure_openai_client():
+    """
+    Asynchronous Azure OpenAI client.
+    """
+    def factory():
+        from openai import AsyncAzureOpenAI
+        return AsyncAzureOpenAI(
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=AZURE_OPENAI_API_VERSION,
+        )
+    return _get_client('async_azure_openai', factory)
+
+
+def get_vision_client():
+    """
+    Azure AI Vision client used by the OCR of the retrieved pages.
+
+    Raises:
+        RuntimeError: If VISION_ENDPOINT or VISION_KEY are not set.
+    """
+    def factory():
+        from azure.ai.vision.imageanalysis import ImageAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
+        endpoint, key = os.getenv("VISION_ENDPOINT"), os.getenv("VISION_KEY")
+        if not endpoint or not key:
+            raise RuntimeError("Missing environment variable 'VISION_ENDPOINT' or 'VISION_KEY'")
+        return ImageAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+    return _get_client('vision', factory)
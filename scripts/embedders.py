@@ -0,0 +1,203 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# Import Third-Party Libraries
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from scripts.config import AZURE_OPENAI_API_VERSION
+except ImportError:  # Run as a script from the scripts directory
+    from config import AZURE_OPENAI_API_VERSION
+
+# Backends accepted by create_embedder (EMBEDDING_BACKEND)
+EMBEDDING_BACKENDS = ['openai', 'azure', 'sentence-transformers', 'onnx']
+
+
+class SentenceTransformerEmbedder(Embeddings):
+    """
+    Local sentence-transformers model loaded from disk (or from the Hugging Face cache), run on CPU by default.
+    """
+
+    def __init__(self, model_path: str, device: str = 'cpu', batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path, device=device)
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: list) -> list:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+class OnnxEmbedder(Embeddings):
+    """
+    Local transformer encoder exported to ONNX. The model directory must contain model.onnx and the
+    tokenizer.json of the model. The embedding is the mean of the token vectors, normalized.
+    """
+
+    def __init__(self, model_directory: str, batch_size: int = 32, max_length: int = 512, threads: int = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_directory, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_directory, 'model.onnx'), options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.zeros_like(input_ids)
+
+        token_vectors = self.session.run(None, inputs)[0]
+
+        # Mean pooling over the real tokens (the padding is masked out)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        vectors = (token_vectors * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = [self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+class MicroBatchingEmbedder(Embeddings):
+    """
+    Groups the queries embedded at the same time by different threads into a single request.
+
+    The first query waits at most max_wait_ms for other queries, so under load one request (or one
+    forward pass of a local model) embeds up to max_batch_size queries, and a lone query only pays
+    the wait.
+    """
+
+    def __init__(self, embedder: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue()
+        self.stats = {'batches': 0, 'queries': 0}
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _start_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self._worker_lock:
+                self.stats['batches'] += 1
+                self.stats['queries'] += len(batch)
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.embedder.embed_documents(texts)
+                # A short answer would leave some callers waiting forever
+                if len(vectors) != len(batch):
+                    raise ValueError(f"The embedder returned {len(vectors)} vectors for {len(batch)} queries")
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def embed_query(self, text: str) -> list:
+        self._start_worker()
+        future = Future()
+        self.pending.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embedder.embed_documents(texts)
+
+    def average_batch_size(self) -> float:
+        with self._worker_lock:
+            return self.stats['queries'] / max(self.stats['batches'], 1)
+
+
+def create_embedder(backend: str = None, model: str = None, micro_batch: bool = False) -> Embeddings:
+    """
+    Embedding model used both by the ingestion and by the retrieval. The vector store must be built
+    with the same backend and model it is queried with.
+
+    Args:
+        backend (str): 'openai', 'azure', 'sentence-transformers' or 'onnx'. Defaults to EMBEDDING_BACKEND, or 'openai'.
+        model (str): OpenAI model, Azure deployment, or directory of the local model. Defaults to
+            EMBEDDING_MODEL (EMBEDDING_MODEL_PATH for the local backends).
+        micro_batch (bool): Group the concurrent queries into batched requests.
+
+    Returns:
+        Embeddings: LangChain embeddings, so it can be given to Chroma as its embedding function.
+    """
+    backend = backend or os.getenv('EMBEDDING_BACKEND', 'openai')
+
+    if backend == 'openai':
+        from langchain_openai import OpenAIEmbeddings
+        embedder = OpenAIEmbeddings(disallowed_special=(), model=model or os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'))
+    elif backend == 'azure':
+        from langchain_openai import AzureOpenAIEmbeddings
+        embedder = AzureOpenAIEmbeddings(
+            disallowed_special=(),
+            azure_deployment=model or os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=AZURE_OPENAI_API_VERSION,
+        )
+    elif backend == 'sentence-transformers':
+        embedder = SentenceTransformerEmbedder(model or os.getenv('EMBEDDING_MODEL_PATH'))
+    elif backend == 'onnx':
+        embedder = OnnxEmbedder(model or os.getenv('EMBEDDING_MODEL_PATH'),
+                                threads=int(os.getenv('EMBEDDING_THREADS', '0')) or None)
+    else:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+    if micro_batch:
+        embedder = MicroBatchingEmbedder(embedder,
+                                         max_batch_size=int(os.getenv('EMBEDDING_MICRO_BATCH_SIZE', '32')),
+                                         max_wait_ms=float(os.getenv('EMBEDDING_MICRO_BATCH_WAIT_MS', '5')))
+    return embedder
+
+
+def embedder_cache_key(backend: str = None, model: str = None) -> str:
+    """
+    Name of the embedding model in the embedding cache. The OpenAI/Azure models keep their plain
+    name, so the entries cached before the backends existed are still valid.
+    """
+    backend = backend or os.getenv('EMBEDDING_BACKEND', 'openai')
+    if backend in ('openai', 'azure'):
+        return model or os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    model = model or os.getenv('EMBEDDING_MODEL_PATH', '')
+    return f"{backend}-{os.path.basename(os.path.normpath(model))}"
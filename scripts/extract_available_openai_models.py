@@ -1,9 +1,12 @@
 import os
-import requests
-from dotenv import load_dotenv
+
+try:
+    from scripts.config import load_config
+except ImportError:  # Run as a script from the scripts directory
+    from config import load_config
 
 # Load environment variables from the .env file
-load_dotenv(override=True)
+load_config()
 
 def extract_openai_models() -> list:
     """
@@ -21,6 +24,7 @@ def extract_openai_models() -> list:
     }
 
     # Make the GET request to the OpenAI API
+    import requests
     response = requests.get(url, headers=headers)
 
     # Check if the request was successful
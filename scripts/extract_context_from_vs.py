@@ -1,19 +1,26 @@
 import os
 import time
 from scripts.auxiliar_functions import absolute_path
-from scripts.tesserac import pdf_to_text  # Assuming this is your modified pdf_to_text function
+from scripts.tesserac import pdf_to_text, ocr_batching_enabled  # Assuming this is your modified pdf_to_text function
+from scripts.compact_index import CompactIndex
+from scripts.partition_router import PartitionRouter
+from scripts.lexical_index import LexicalIndex, lexical_index_path, is_code_query, reciprocal_rank_fusion
+from scripts.embedders import create_embedder
+from scripts.page_text_cache import PageTextCache
+from scripts.ocr_encoding import select_profile
+from scripts.config import load_config
 
-from dotenv import load_dotenv
-
-from langchain_community.vectorstores import MongoDBAtlasVectorSearch
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 
 # Import required for ThreadPoolExecutor
 from concurrent.futures import ThreadPoolExecutor
 
 # Load the environment variables
-load_dotenv(override=True)
+load_config()
+
+# Text of the retrieved pages, shared by all the workers of the server through a SQLite file
+page_text_cache = PageTextCache(absolute_path(os.getenv('PATH_PAGE_TEXT_CACHE', '../data/page_text_cache.sqlite')),
+                                memory_items=int(os.getenv('PAGE_TEXT_CACHE_MEMORY_ITEMS', '2048')))
 
 def process_single_result(args):
     """
@@ -32,9 +39,14 @@ def process_single_result(args):
         pdf_path = doc.metadata['source']
         page_number = doc.metadata['page']
         try:
-            # Extract text from the specific page using pdf_to_text
+            # Extract text from the specific page using pdf_to_text (unless another request already did it)
             # Set num_workers=1 to avoid too many nested threads
-            extracted_text = pdf_to_text(pdf_path, page=page_number + 1, n=1)
+            profile, batching = select_profile(doc.metadata), ocr_batching_enabled()
+            cache_key = page_text_cache.key(pdf_path, page_number + 1, n=1, profile=profile, batching=batching)
+            extracted_text = page_text_cache.get(cache_key)
+            if extracted_text is None:
+                extracted_text = pdf_to_text(pdf_path, page=page_number + 1, n=1, profile=profile, batching=batching)
+                page_text_cache.put(cache_key, extracted_text)
 
             # Use the extracted text as the processed text
             processed_text = f"\nSOURCE #{index + 1}:\n {extracted_text}"
@@ -48,31 +60,174 @@ def process_single_result(args):
     print(processed_text)
     return processed_text
 
-def extract_context_from_vector_search(query: str = '', k: int = 4):
+# Compact indexes opened by this process (memory-mapped, so they are shared with the other workers)
+compact_indexes = {}
+
+def get_compact_index(directory: str) -> CompactIndex:
+    """
+    Open the compact index of a directory only once per process.
+    """
+    if directory not in compact_indexes:
+        compact_indexes[directory] = CompactIndex(directory)
+    return compact_indexes[directory]
+
+# Query embedder, created on first use and shared by all the requests of the process
+query_embedder = None
+
+def get_query_embedder() -> Embeddings:
+    """
+    Embedder of the queries (EMBEDDING_BACKEND). The concurrent queries are grouped into batched
+    requests unless EMBEDDING_MICRO_BATCH is disabled.
+    """
+    global query_embedder
+    if query_embedder is None:
+        query_embedder = create_embedder(micro_batch=os.getenv('EMBEDDING_MICRO_BATCH', 'true').lower() in ('1', 'true', 'yes'))
+    return query_embedder
+
+# Chroma stores opened by this process (opening the client and loading the HNSW index is paid once)
+vector_stores = {}
+
+def get_vector_store(data_directory: str):
+    """
+    Open the Chroma collection of a directory only once per process.
+    """
+    if data_directory not in vector_stores:
+        # Imported on first use, it is the slowest import of the retrieval
+        from langchain_chroma import Chroma
+
+        vector_stores[data_directory] = Chroma(
+            collection_name="apec_vectorstores",
+            embedding_function=get_query_embedder(),
+            persist_directory=data_directory,
+        )
+    return vector_stores[data_directory]
+
+# Lexical indexes opened by this process
+lexical_indexes = {}
+
+def get_lexical_index(data_directory: str):
+    """
+    Open the BM25 index stored in a Chroma directory only once per process (None if it was not built).
+    """
+    if data_directory not in lexical_indexes:
+        index_file = lexical_index_path(data_directory)
+        lexical_indexes[data_directory] = None
+        if os.path.exists(index_file):
+            try:
+                lexical_indexes[data_directory] = LexicalIndex(index_file, read_only=True)
+            except Exception as e:
+                print(f"Lexical index not available: {e}")
+    return lexical_indexes[data_directory]
+
+# Router that picks the partition of a query, created on first use
+partition_router = None
+
+def route_query(query: str):
+    """
+    Metadata filter of a query picked by the partition router (None when PARTITION_ROUTER is not enabled).
     """
-    Perform a vector search and extract context from the results using pdf_to_text in parallel.
+    global partition_router
+    if os.getenv('PARTITION_ROUTER', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    if partition_router is None:
+        partition_router = PartitionRouter(absolute_path(os.getenv('PATH_PARTITION_CATALOG', '../data/partitions_catalog.json')))
+    return partition_router.route(query)
+
+def preload_retriever():
+    """
+    Loads the read-only state of the retriever, so a server that forks its workers afterwards shares
+    it between them (copy-on-write) instead of loading it once per worker. The SQLite indexes and the
+    API clients are not preloaded: their connections must not cross a fork.
+
+    Returns:
+        dict: What was loaded.
+    """
+    loaded = {}
+
+    if os.getenv('VECTOR_INDEX_BACKEND', 'chroma') in ('compact', 'compact-ann'):
+        compact_index = get_compact_index(absolute_path(os.getenv('PATH_COMPACT_INDEX', '../data/compact_index')))
+        loaded['compact_index_records'] = len(compact_index)
+
+    # Catalog of the partition router (only loaded when PARTITION_ROUTER is enabled)
+    route_query('')
+    loaded['partition_router'] = partition_router is not None
+
+    # Local embedding models (the weights are the biggest part of the memory of a worker)
+    if os.getenv('EMBEDDING_BACKEND', 'openai') in ('sentence-transformers', 'onnx'):
+        get_query_embedder()
+        loaded['embedder'] = os.getenv('EMBEDDING_BACKEND')
+
+    loaded['cached_pages'] = page_text_cache.preload()
+    return loaded
+
+def open_search_indexes() -> dict:
+    """
+    Open the indexes used by the retrieval in this process (vector store or compact index, lexical index)
+    and the query embedder.
+
+    Returns:
+        dict: Number of records of every index opened.
+    """
+    opened = {}
+    get_query_embedder()
+
+    if os.getenv('VECTOR_INDEX_BACKEND', 'chroma') in ('compact', 'compact-ann'):
+        opened['compact_index'] = len(get_compact_index(absolute_path(os.getenv('PATH_COMPACT_INDEX', '../data/compact_index'))))
+    else:
+        opened['vector_store'] = get_vector_store(absolute_path(os.getenv('PATH_VECTOR_DB')))._collection.count()
+
+    if os.getenv('PATH_VECTOR_DB'):
+        lexical_index = get_lexical_index(absolute_path(os.getenv('PATH_VECTOR_DB')))
+        if lexical_index is not None:
+            opened['lexical_index'] = lexical_index.count()
+    return opened
+
+def extract_context_from_vector_search(query: str = '', k: int = 4, backend: str = None, where: dict = None):
+    """
+    Perform a hybrid search (vector + BM25, fused by rank) and extract context from the results using
+    pdf_to_text in parallel. Short queries made of codes or part numbers (e.g. "E01") only use the
+    lexical index and skip the embedding request.
 
     Args:
         query (str): The query string for the vector search.
         k (int): The number of top results to consider.
+        backend (str): 'chroma', 'compact' (exact search over the quantized index) or 'compact-ann'.
+            Defaults to the VECTOR_INDEX_BACKEND environment variable, or 'chroma'.
+        where (dict): Metadata filter (e.g. {'family': 'Kiosks'} or {'type_data': 'tabular'}).
+            If not given, the partition router can pick one from the query.
 
     Returns:
         tuple: A string containing the extracted text and a list of source information.
     """
+    backend = backend or os.getenv('VECTOR_INDEX_BACKEND', 'chroma')
+    embeddings = get_query_embedder()
+
+    # Partition of the query, the whole collection is searched when there is none
+    routed = where is None
+    if routed:
+        where = route_query(query)
+        if where:
+            print(f"Query routed to partition {where}")
 
-    # Data directory absolute path
-    data_directory = absolute_path(os.getenv('PATH_VECTOR_DB'))
+    # Lexical search, unless HYBRID_SEARCH is disabled or the index was not built
+    lexical_results = []
+    lexical_index = None
+    if os.getenv('HYBRID_SEARCH', 'true').lower() in ('1', 'true', 'yes') and os.getenv('PATH_VECTOR_DB'):
+        lexical_index = get_lexical_index(absolute_path(os.getenv('PATH_VECTOR_DB')))
+    if lexical_index is not None:
+        lexical_results = lexical_index.search(query, k=k, where=where)
+        if routed and where and len(lexical_results) < k:
+            lexical_results = lexical_index.search(query, k=k)
 
-    vector_search = Chroma(
-        collection_name="apec_vectorstores",
-        embedding_function=OpenAIEmbeddings(disallowed_special=(), model='text-embedding-3-small'),
-        persist_directory=data_directory,
-    )
-    # Perform the similarity search with a filter
-    results = vector_search.similarity_search_with_score(
-        query=query,
-        k=k,  # Limit to the number of IDs provided
-    )
+    if lexical_results and is_code_query(query, max_words=int(os.getenv('LEXICAL_FAST_PATH_MAX_WORDS', '3'))):
+        print(f"Code-like query, using only the lexical index ({len(lexical_results)} results)")
+        results = lexical_results
+    else:
+        results = vector_search_results(query, embeddings, k, backend, where, routed)
+
+        # Reciprocal rank fusion of both rankings
+        if lexical_results:
+            results = reciprocal_rank_fusion([results, lexical_results], k=k)
 
     # Prepare arguments for parallel processing
     args_list = [(index, doc, score) for index, (doc, score) in enumerate(results)]
@@ -91,6 +246,47 @@ def extract_context_from_vector_search(query: str = '', k: int = 4):
 
     return string, sources
 
+def vector_search_results(query: str, embeddings: Embeddings, k: int, backend: str, where: dict, routed: bool) -> list:
+    """
+    Vector search of the query in the Chroma collection or the compact index.
+
+    Returns:
+        list: (Document, score) tuples, best first.
+    """
+    query_embedding = embeddings.embed_query(query)
+
+    if backend in ('compact', 'compact-ann'):
+        # Read-only quantized index exported from the Chroma collection
+        compact_index = get_compact_index(absolute_path(os.getenv('PATH_COMPACT_INDEX', '../data/compact_index')))
+
+        def search(where_filter):
+            return compact_index.search(
+                query_embedding,
+                k=k,
+                mode='ann' if backend == 'compact-ann' else 'exact',
+                nprobe=int(os.getenv('COMPACT_INDEX_NPROBE', '8')),
+                where=where_filter,
+            )
+    else:
+        # Data directory absolute path
+        vector_search = get_vector_store(absolute_path(os.getenv('PATH_VECTOR_DB')))
+
+        def search(where_filter):
+            # Perform the similarity search with a filter
+            return vector_search.similarity_search_by_vector_with_relevance_scores(
+                embedding=query_embedding,
+                k=k,  # Limit to the number of IDs provided
+                filter=where_filter,
+            )
+
+    results = search(where)
+
+    # A routed partition with too few results falls back to the whole collection
+    if routed and where and len(results) < k:
+        results = search(None)
+
+    return results
+
 # Example usage
 if __name__ == '__main__':
     start_time = time.time()
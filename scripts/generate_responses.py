@@ -7,24 +7,20 @@ import json
 from scripts.extract_context_from_vs import extract_context_from_vector_search
 from scripts.image_to_base_64 import image_to_base64_markdown
 from scripts.auxiliar_functions import sources_to_md, replace_sources, extract_user_messages
+from scripts.config import load_config, get_azure_openai_client, get_async_azure_openai_client
 from prompts.prompts import system_prompt
 
 # Import Third-Party Libraries
 from fastapi.responses import JSONResponse, StreamingResponse
-from openai import OpenAI, AsyncOpenAI, AzureOpenAI, AsyncAzureOpenAI
-from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables from the .env file
-load_dotenv(override=True)
+load_config()
 
 async def generate_chat_response(data):
     try:
-        client = AzureOpenAI(
-                            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"), 
-                            api_key=os.getenv("AZURE_OPENAI_API_KEY"),  
-                            api_version="2024-10-01-preview"
-                            )
+        # Shared client (created on the first request)
+        client = get_azure_openai_client()
 
         if data.get("model", "gpt-4o").split("&")[0] in ["o1-preview", "o1-preview-mini"]:
             model = "gpt-4o"
@@ -145,11 +141,7 @@ async def generate_chat_responses_stream(data):
         data["messages"].insert(-1, {"role": "system", "content": system_prompt})
         
         print(data["messages"])
-        client = AsyncAzureOpenAI(
-                                    azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"), 
-                                    api_key=os.getenv("AZURE_OPENAI_API_KEY"),  
-                                    api_version="2024-10-01-preview"
-                                    )  
+        client = get_async_azure_openai_client()
         # Use AsyncOpenAI for async handling
         print(data.get("model", "gpt-4o").split("&")[0])
 
@@ -0,0 +1,321 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+
+# Import Third-Party Libraries
+from langchain_core.documents import Document
+
+try:
+    from scripts.partition_router import where_to_conditions
+except ImportError:  # Run as a script from the scripts directory
+    from partition_router import where_to_conditions
+
+# Name of the lexical index, stored inside the Chroma data directory so both are always copied together
+LEXICAL_INDEX_FILE = 'lexical_index.sqlite'
+
+# Records read from Chroma per call when the index is built from an existing collection
+BUILD_BATCH_SIZE = 5000
+
+# Terms of a query sent to the full-text search
+MAX_QUERY_TERMS = 32
+
+# Constant of the reciprocal rank fusion (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+
+# Metadata key that carries the raw text of a chunk from the splitter to the lexical index. The vector
+# store keeps the normalized text, which has no codes or part numbers left (normalize_text removes the
+# words mixing letters and digits and the numbers), so the raw text is the one indexed. The key is
+# never written to the vector store.
+RAW_TEXT_KEY = 'raw_text'
+
+# Error codes and part numbers ("E01", "3M-8845", "TLS-450") and short acronyms ("KSB")
+CODE_TOKEN = re.compile(r'^(?=[^\s]*\d)[A-Za-z0-9][A-Za-z0-9\-_./]*$|^[A-Z]{2,6}$')
+
+
+def lexical_index_path(data_directory: str) -> str:
+    return os.path.join(data_directory, LEXICAL_INDEX_FILE)
+
+
+def query_terms(query: str) -> list:
+    """
+    Words of a query without the surrounding punctuation.
+    """
+    terms = [term.strip('¿?¡!.,;:()[]{}"\'') for term in query.split()]
+    return [term for term in terms if term][:MAX_QUERY_TERMS]
+
+
+def is_code_query(query: str, max_words: int = 3) -> bool:
+    """
+    Short query made of codes or part numbers, e.g. "E01" or "KSB 3M-8845". The embedding of these
+    queries says little about them, the exact lexical match is what matters.
+    """
+    terms = query_terms(query)
+    return 0 < len(terms) <= max_words and any(CODE_TOKEN.match(term) for term in terms)
+
+
+def match_expression(query: str) -> str:
+    """
+    FTS5 expression matching any of the words of the query. Every word is quoted, so a part number
+    like "123-456/A" is matched as the phrase of its tokens and no word is read as an operator.
+    """
+    return ' OR '.join('"' + term.replace('"', '""') + '"' for term in query_terms(query))
+
+
+def split_raw_texts(documents: list) -> tuple:
+    """
+    Separates the raw text of the chunks from their metadata.
+
+    Args:
+        documents (list): Documents whose metadata may have RAW_TEXT_KEY (their page_content otherwise).
+
+    Returns:
+        tuple: (texts to index, metadatas without RAW_TEXT_KEY)
+    """
+    texts, metadatas = [], []
+    for document in documents:
+        metadata = dict(document.metadata)
+        texts.append(metadata.pop(RAW_TEXT_KEY, None) or document.page_content)
+        metadatas.append(metadata)
+    return texts, metadatas
+
+
+# Chunks (regular table, indexed by chunk id and by source) and their terms (FTS5 index with the text of
+# the chunks as external content). The triggers keep both in sync, so deleting a chunk by its id or
+# its source uses the indexes of the table and removes its terms by rowid.
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS chunk_rows ("
+    "id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, source TEXT, text TEXT, metadata TEXT)",
+    "CREATE INDEX IF NOT EXISTS chunk_rows_source ON chunk_rows (source)",
+    # remove_diacritics: "presión" and "presion" are the same term
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5("
+    "text, content = 'chunk_rows', content_rowid = 'id', tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS chunk_rows_insert AFTER INSERT ON chunk_rows BEGIN "
+    "INSERT INTO chunk_terms (rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS chunk_rows_delete AFTER DELETE ON chunk_rows BEGIN "
+    "INSERT INTO chunk_terms (chunk_terms, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS chunk_rows_update AFTER UPDATE OF text ON chunk_rows BEGIN "
+    "INSERT INTO chunk_terms (chunk_terms, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO chunk_terms (rowid, text) VALUES (new.id, new.text); END",
+]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index of the chunks of the vector store (SQLite FTS5).
+
+    Every row keeps the chunk id, its raw text and its metadata, so the lexical hits are returned
+    as Documents with the same ids as the vector search and both lists can be fused by id.
+    """
+
+    def __init__(self, index_file: str, read_only: bool = False):
+        self.index_file = index_file
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{index_file}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(index_file), exist_ok=True)
+            self.connection = sqlite3.connect(index_file)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            self.connection.commit()
+
+    def add(self, ids: list, texts: list, metadatas: list, commit: bool = True):
+        """
+        Adds (or replaces) chunks in the index.
+        """
+        self.remove(ids, commit=False)
+        self.connection.executemany(
+            "INSERT INTO chunk_rows (chunk_id, text, source, metadata) VALUES (?, ?, ?, ?)",
+            [(chunk_id, text, (metadata or {}).get('source'), json.dumps(metadata or {}))
+             for chunk_id, text, metadata in zip(ids, texts, metadatas)]
+        )
+        if commit:
+            self.connection.commit()
+
+    def remove(self, ids: list, commit: bool = True):
+        self.connection.executemany("DELETE FROM chunk_rows WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+        if commit:
+            self.connection.commit()
+
+    def remove_source(self, source: str):
+        """
+        Removes all the chunks of a file.
+        """
+        self.connection.execute("DELETE FROM chunk_rows WHERE source = ?", (source,))
+        self.connection.commit()
+
+    def move_source(self, source: str, new_source: str):
+        """
+        Re-points the chunks of a file to another file with the same content (the text, and so the terms, do not change).
+        """
+        rows = self.connection.execute("SELECT id, metadata FROM chunk_rows WHERE source = ?", (source,)).fetchall()
+        self.connection.executemany(
+            "UPDATE chunk_rows SET source = ?, metadata = ? WHERE id = ?",
+            [(new_source, json.dumps(dict(json.loads(metadata), source=new_source)), row_id) for row_id, metadata in rows]
+        )
+        self.connection.commit()
+
+    def update_metadatas(self, ids: list, metadatas: list):
+        """
+        Replaces the metadata of chunks (their text, and so their terms, do not change).
+        """
+        self.connection.executemany(
+            "UPDATE chunk_rows SET source = ?, metadata = ? WHERE chunk_id = ?",
+            [((metadata or {}).get('source'), json.dumps(metadata or {}), chunk_id) for chunk_id, metadata in zip(ids, metadatas)]
+        )
+        self.connection.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def optimize(self):
+        """
+        Merges the b-trees of the full-text index, after a bulk load.
+        """
+        self.connection.execute("INSERT INTO chunk_terms (chunk_terms) VALUES ('optimize')")
+        self.connection.commit()
+
+    def contains(self, chunk_id: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM chunk_rows WHERE chunk_id = ?", (chunk_id,)).fetchone() is not None
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM chunk_rows").fetchone()[0]
+
+    def search(self, query: str, k: int = 4, where: dict = None) -> list:
+        """
+        BM25 search.
+
+        Args:
+            query (str): Query string.
+            k (int): Number of results.
+            where (dict): Metadata filter made of equalities, as in Chroma.
+
+        Returns:
+            list: (Document, score) tuples, best first. The score is the BM25 score (higher is better).
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+
+        conditions = where_to_conditions(where)
+        # The filter is applied after the ranking, so more candidates than k are read when there is one
+        limit = k * 20 if conditions else k
+        rows = self.connection.execute(
+            "SELECT chunk_rows.chunk_id, chunk_rows.text, chunk_rows.metadata, bm25(chunk_terms) "
+            "FROM chunk_terms JOIN chunk_rows ON chunk_rows.id = chunk_terms.rowid "
+            "WHERE chunk_terms MATCH ? ORDER BY bm25(chunk_terms) LIMIT ?",
+            (expression, limit)
+        ).fetchall()
+
+        results = []
+        for chunk_id, text, metadata, score in rows:
+            metadata = json.loads(metadata)
+            if any(metadata.get(key) != value for key, value in conditions):
+                continue
+            # FTS5 returns the BM25 score negated, so the best match has the lowest value
+            results.append((Document(id=chunk_id, page_content=text, metadata=metadata), -score))
+            if len(results) == k:
+                break
+        return results
+
+    def iter_chunks(self, batch_size: int = BUILD_BATCH_SIZE):
+        """
+        Reads all the chunks of the index.
+
+        Returns:
+            Generator of (ids, raw texts, metadatas) batches.
+        """
+        last_id = 0
+        while True:
+            rows = self.connection.execute(
+                "SELECT id, chunk_id, text, metadata FROM chunk_rows WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1] for row in rows], [row[2] for row in rows], [json.loads(row[3]) for row in rows]
+
+    def backup(self, target_file: str):
+        """
+        Copies the whole index (chunks, terms and triggers) to another file, consistent even while it is being written.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(target_file)), exist_ok=True)
+        target = sqlite3.connect(target_file)
+        try:
+            self.connection.backup(target)
+        finally:
+            target.close()
+
+    def close(self):
+        self.connection.close()
+
+
+def reciprocal_rank_fusion(result_lists: list, k: int = 4, rrf_k: int = RRF_K) -> list:
+    """
+    Fuses ranked result lists by their ranks, so scores of different scales (cosine distance, BM25) can be mixed.
+
+    Args:
+        result_lists (list): Lists of (Document, score) tuples, best first.
+        k (int): Number of results.
+
+    Returns:
+        list: (Document, fused score) tuples, best first.
+    """
+    fused, documents = {}, {}
+    for results in result_lists:
+        for rank, (document, _) in enumerate(results):
+            key = document.id or (document.metadata.get('source'), document.page_content)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+
+    best = sorted(fused, key=fused.get, reverse=True)[:k]
+    return [(documents[key], fused[key]) for key in best]
+
+
+def build_from_chroma(data_directory: str, collection_name: str = "apec_vectorstores"):
+    """
+    Builds the lexical index of an existing Chroma collection (the ingestion keeps it up to date afterwards).
+    Chroma only has the normalized text, without the codes, so the chunks already indexed by the ingestion
+    (with their raw text) are kept and only the missing ones are added.
+    """
+    from langchain_chroma import Chroma
+
+    collection = Chroma(collection_name=collection_name, persist_directory=data_directory)._collection
+    lexical_index = LexicalIndex(lexical_index_path(data_directory))
+    total, indexed = collection.count(), 0
+    start_time = time.perf_counter()
+
+    for offset in range(0, total, BUILD_BATCH_SIZE):
+        records = collection.get(include=['documents', 'metadatas'], limit=BUILD_BATCH_SIZE, offset=offset)
+        if not records['ids']:
+            break
+        missing = [index for index, chunk_id in enumerate(records['ids']) if not lexical_index.contains(chunk_id)]
+        lexical_index.add([records['ids'][index] for index in missing],
+                          [records['documents'][index] for index in missing],
+                          [records['metadatas'][index] for index in missing])
+        indexed += len(records['ids'])
+        print(f"Indexed {indexed}/{total} chunks")
+
+    lexical_index.optimize()
+    lexical_index.close()
+    print(f"Lexical index built in {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == '__main__':
+    from auxiliar_functions import absolute_path
+
+    parser = argparse.ArgumentParser(description='Build the BM25 index of the vector store, or query it')
+    parser.add_argument('--data-directory', default=os.getenv('PATH_VECTOR_DB', '../data/APEC_ChromaDB_v2'))
+    parser.add_argument('--query', help='Search the index instead of building it')
+    parser.add_argument('--k', type=int, default=4)
+    args = parser.parse_args()
+
+    data_directory = absolute_path(args.data_directory)
+    if args.query:
+        for document, score in LexicalIndex(lexical_index_path(data_directory), read_only=True).search(args.query, args.k):
+            print(f"{score:.3f} {document.metadata.get('source')} page={document.metadata.get('page')}")
+    else:
+        build_from_chroma(data_directory)
@@ -0,0 +1,118 @@
+import os
+import json
+from io import BytesIO
+
+# Encoding profiles of the page images sent to the OCR.
+#   format: PNG, JPEG or WEBP
+#   compress_level: PNG zlib level (0-9), quality: JPEG/WebP quality (1-100)
+#   binarize: threshold (0-255) to turn the grayscale page into black and white, None to keep the grays
+#   max_side: maximum width/height in pixels (the page is scaled down when it is bigger), None for no cap
+ENCODING_PROFILES = {
+    # Grayscale PNG with the default compression, the original encoding
+    'png-default': {'format': 'PNG', 'compress_level': 6},
+    # Same pixels, faster encoding and slightly bigger files
+    'png-fast': {'format': 'PNG', 'compress_level': 1},
+    # Black and white PNG: 1 bit per pixel, the smallest lossless option for printed text
+    'png-binary': {'format': 'PNG', 'compress_level': 6, 'binarize': 160},
+    # Lossy formats, for scanned pages and photos where PNG compresses badly
+    'jpeg-85': {'format': 'JPEG', 'quality': 85},
+    'jpeg-70': {'format': 'JPEG', 'quality': 70},
+    'webp-75': {'format': 'WEBP', 'quality': 75},
+    # Capped resolution for large-format pages (drawings, posters)
+    'webp-75-capped': {'format': 'WEBP', 'quality': 75, 'max_side': 2200},
+}
+
+DEFAULT_PROFILE = 'png-default'
+
+
+def prepare_page(image, profile: str = DEFAULT_PROFILE):
+    """
+    Applies the pixel settings of a profile to a rendered page: grayscale, resolution cap and binarization.
+
+    Args:
+        image (PIL.Image.Image): Rendered page.
+        profile (str): Name of a profile of ENCODING_PROFILES.
+
+    Returns:
+        PIL.Image.Image: The page as it is sent to the OCR ('L' or, when binarized, '1' mode).
+    """
+    from PIL import Image, ImageOps
+
+    settings = ENCODING_PROFILES[profile]
+
+    image = ImageOps.grayscale(image)
+
+    max_side = settings.get('max_side')
+    if max_side and max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+    threshold = settings.get('binarize')
+    if threshold is not None:
+        image = image.point(lambda value: 255 if value > threshold else 0, mode='1')
+    return image
+
+
+def save_page(image, profile: str = DEFAULT_PROFILE) -> bytes:
+    """
+    Saves a prepared page (or several pages tiled together) in the format of a profile.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    settings = ENCODING_PROFILES[profile]
+
+    output = BytesIO()
+    if settings['format'] == 'PNG':
+        image.save(output, format='PNG', compress_level=settings.get('compress_level', 6))
+    else:
+        if image.mode == '1':
+            image = image.convert('L')
+        image.save(output, format=settings['format'], quality=settings.get('quality', 85))
+    return output.getvalue()
+
+
+def encode_page(image, profile: str = DEFAULT_PROFILE) -> bytes:
+    """
+    Encodes a rendered page for the OCR.
+
+    Args:
+        image (PIL.Image.Image): Rendered page.
+        profile (str): Name of a profile of ENCODING_PROFILES.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    return save_page(prepare_page(image, profile), profile)
+
+
+def resolve_profile(profile: str = None) -> str:
+    """
+    Checks a profile name, OCR_ENCODING_PROFILE is used when none is given.
+
+    Returns:
+        str: The profile, or DEFAULT_PROFILE (with a warning) when it is not in ENCODING_PROFILES.
+    """
+    profile = profile or os.getenv('OCR_ENCODING_PROFILE', DEFAULT_PROFILE)
+    if profile not in ENCODING_PROFILES:
+        print(f"Unknown OCR encoding profile '{profile}', using {DEFAULT_PROFILE}")
+        return DEFAULT_PROFILE
+    return profile
+
+
+def select_profile(metadata: dict = None) -> str:
+    """
+    Profile of a document. OCR_ENCODING_PROFILES maps metadata values to profiles, e.g.
+    {"family=Drawings": "webp-75-capped", "vendor=Gilbarco": "png-binary"}; the first matching key
+    (family, vendor, type_data) wins, otherwise OCR_ENCODING_PROFILE is used.
+
+    Returns:
+        str: Name of the profile.
+    """
+    profiles_by_value = json.loads(os.getenv('OCR_ENCODING_PROFILES', '{}'))
+
+    for key in ('family', 'vendor', 'type_data'):
+        value = (metadata or {}).get(key)
+        if value is not None and f"{key}={value}" in profiles_by_value:
+            return resolve_profile(profiles_by_value[f"{key}={value}"])
+    return resolve_profile()
@@ -0,0 +1,84 @@
+import os
+
+# Limits of an image sent to Azure Image Analysis (Read): 20 MB and 10000 pixels per side
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_IMAGE_SIDE = 10000
+
+# White band between two tiled pages, so that no line of text touches two pages
+TILE_GAP = 40
+
+
+def plan_tiles(page_sizes: list, max_side: int = None, max_pages: int = None, gap: int = TILE_GAP) -> list:
+    """
+    Groups consecutive pages into tiles: the pages of a tile are stacked vertically and the tile must
+    fit in max_side x max_side. A page that does not fit alone is left in a tile of its own.
+
+    Args:
+        page_sizes (list): (width, height) of every page, in order.
+        max_side (int, optional): Maximum width/height of a tile (OCR_TILE_MAX_SIDE, MAX_IMAGE_SIDE by default).
+        max_pages (int, optional): Maximum number of pages of a tile (OCR_TILE_MAX_PAGES, no limit by default).
+        gap (int): Pixels between two pages.
+
+    Returns:
+        list: Lists with the indexes of the pages of every tile.
+    """
+    max_side = max_side or int(os.getenv('OCR_TILE_MAX_SIDE', str(MAX_IMAGE_SIDE)))
+    max_pages = max_pages or int(os.getenv('OCR_TILE_MAX_PAGES', '0')) or len(page_sizes)
+
+    tiles, current, current_height = [], [], 0
+    for index, (width, height) in enumerate(page_sizes):
+        if max(width, height) > max_side:
+            # Too big to share a tile, the page is sent on its own
+            tiles += [current, [index]] if current else [[index]]
+            current, current_height = [], 0
+            continue
+        if current and (current_height + gap + height > max_side or len(current) >= max_pages):
+            tiles.append(current)
+            current, current_height = [], 0
+        current_height += (gap if current else 0) + height
+        current.append(index)
+    if current:
+        tiles.append(current)
+    return tiles
+
+
+def tile_pages(images: list, gap: int = TILE_GAP) -> tuple:
+    """
+    Stacks prepared pages (same mode) vertically on a white canvas.
+
+    Returns:
+        tuple: (tiled image, list of (top, bottom) pixel rows of every page)
+    """
+    from PIL import Image
+
+    width = max(image.width for image in images)
+    height = sum(image.height for image in images) + gap * (len(images) - 1)
+    tile = Image.new(images[0].mode, (width, height), 'white')
+
+    offsets, top = [], 0
+    for image in images:
+        tile.paste(image, (0, top))
+        offsets.append((top, top + image.height))
+        top += image.height + gap
+    return tile, offsets
+
+
+def split_lines(lines: list, offsets: list) -> list:
+    """
+    Assigns the lines recognized in a tile to their pages, by the vertical center of their bounding
+    polygon. A line in a gap goes to the closest page. The order of the lines of every page is kept.
+
+    Args:
+        lines (list): Lines of the Read result (with text and bounding_polygon).
+        offsets (list): (top, bottom) of every page in the tile, as returned by tile_pages.
+
+    Returns:
+        list: The text of every page.
+    """
+    page_lines = [[] for _ in offsets]
+    for line in lines:
+        center = sum(point.y for point in line.bounding_polygon) / len(line.bounding_polygon)
+        distances = [0 if top <= center < bottom else min(abs(center - top), abs(center - bottom))
+                     for top, bottom in offsets]
+        page_lines[distances.index(min(distances))].append(line.text)
+    return ["".join(text + "\n" for text in texts) for texts in page_lines]
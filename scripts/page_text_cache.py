@@ -0,0 +1,112 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PageTextCache:
+    """
+    Cache of the text extracted (OCR) from the pages of the retrieved PDFs, in two tiers:
+
+    - Memory: LRU dictionary of the hot pages of this process. The entries loaded by preload() before
+      the server forks its workers are shared by all of them (copy-on-write).
+    - Disk: SQLite file shared by all the workers, so a page read by one worker is not sent to the
+      OCR again by the others, nor after a restart.
+
+    The key includes the size and modification time of the PDF, so a replaced file is read again, and the
+    OCR settings, so the text read with another profile or batching mode is not served.
+    """
+
+    def __init__(self, cache_file: str, memory_items: int = 2048):
+        self.cache_file = cache_file
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        # SQLite connections must not cross a fork, every process opens its own on first use
+        self._connection = None
+        self._connection_pid = None
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_file, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._connection.commit()
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def key(pdf_path: str, page: int, n: int = 1, profile: str = '', batching: bool = False) -> str:
+        """
+        Key of the text of a page (and its n neighbours) of a PDF, read with an OCR encoding profile
+        and with or without page batching (both change the text the OCR returns).
+        """
+        stat = os.stat(pdf_path)
+        return hashlib.sha256(
+            f"{pdf_path}\0{stat.st_size}\0{stat.st_mtime}\0{page}\0{n}\0{profile}\0{int(batching)}".encode('utf-8')
+        ).hexdigest()
+
+    def _remember(self, key: str, text: str):
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        """
+        Returns:
+            str: The cached text, or None.
+        """
+        with self.lock:
+            text = self.memory.get(key)
+            if text is not None:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return text
+
+            row = self.connection().execute("SELECT text FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['disk_hits'] += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, text: str):
+        with self.lock:
+            self._remember(key, text)
+            connection = self.connection()
+            connection.execute("INSERT OR REPLACE INTO pages (key, text, created) VALUES (?, ?, ?)", (key, text, time.time()))
+            connection.commit()
+
+    def preload(self, limit: int = None) -> int:
+        """
+        Loads the most recent pages of the disk tier into memory (call it before forking the workers).
+
+        Returns:
+            int: Number of pages loaded.
+        """
+        if not os.path.exists(self.cache_file):
+            return 0
+
+        limit = self.memory_items if limit is None else min(limit, self.memory_items)
+        connection = sqlite3.connect(f"file:{self.cache_file}?mode=ro", uri=True)
+        try:
+            rows = connection.execute("SELECT key, text FROM pages ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            connection.close()
+
+        with self.lock:
+            # Oldest first, so the most recent pages are the last ones evicted
+            for key, text in reversed(rows):
+                self._remember(key, text)
+        return len(rows)
@@ -0,0 +1,75 @@
+import os
+import re
+import json
+
+# Words of the query that point to the tabular data. Only unambiguous ones: "list the steps", "data sheet"
+# or "inventory procedure" are text queries, and a routed query only falls back to the whole collection
+# when the partition has fewer than k results
+TABULAR_WORDS = {'table', 'tables', 'spreadsheet', 'spreadsheets', 'excel'}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase name with separators replaced by spaces (e.g. "Kiosk_Manuals-2020" -> "kiosk manuals 2020").
+    """
+    return ' '.join(re.split(r'[\W_]+', name.lower())).strip()
+
+
+class PartitionRouter:
+    """
+    Picks the partition of a query from the family and vendor names found in it.
+
+    The partition values are read from the catalog written by the ingestion pipeline.
+    """
+
+    def __init__(self, catalog_file: str):
+        self.names = {'vendor': {}, 'family': {}}
+
+        if os.path.exists(catalog_file):
+            with open(catalog_file) as file:
+                catalog = json.load(file)
+            for key in self.names:
+                for value in catalog.get(key, []):
+                    name = normalize_name(value)
+                    # Very short names (e.g. "a", "pc") would match too many queries
+                    if len(name) >= 3:
+                        self.names[key][name] = value
+
+    def route(self, query: str):
+        """
+        Build the metadata filter of a query.
+
+        Args:
+            query (str): The user query.
+
+        Returns:
+            dict: Chroma "where" filter, or None to search the whole collection.
+        """
+        normalized_query = f" {normalize_name(query)} "
+        conditions = []
+
+        # The vendor is more specific than the family, the longest matching name wins
+        for key in ('vendor', 'family'):
+            matches = [name for name in self.names[key] if f" {name} " in normalized_query]
+            if matches:
+                conditions.append({key: self.names[key][max(matches, key=len)]})
+
+        if TABULAR_WORDS & set(normalized_query.split()):
+            conditions.append({'type_data': 'tabular'})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'$and': conditions}
+
+
+def where_to_conditions(where: dict) -> list:
+    """
+    Flatten a Chroma "where" filter made of equalities (optionally inside '$and') into (key, value) pairs.
+    """
+    if not where:
+        return []
+    if '$and' in where:
+        return [pair for condition in where['$and'] for pair in where_to_conditions(condition)]
+    return [(key, value['$eq'] if isinstance(value, dict) else value) for key, value in where.items()]
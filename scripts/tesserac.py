@@ -1,51 +1,59 @@
 import os
-from pdf2image import convert_from_path
-from PyPDF2 import PdfReader
 import re
-import multiprocessing
-from PIL import ImageOps
-from azure.ai.vision.imageanalysis import ImageAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-from dotenv import load_dotenv
-
-# Load environment variables for Azure Vision credentials
-load_dotenv(override=True)
+import threading
+from functools import partial
+from multiprocessing.pool import ThreadPool
+
 try:
-    endpoint = os.environ["VISION_ENDPOINT"]
-    key = os.environ["VISION_KEY"]
-except KeyError:
-    print("Missing environment variable 'VISION_ENDPOINT' or 'VISION_KEY'")
-    print("Set them before running this sample.")
-    exit()
-
-# Create a global ImageAnalysisClient for Azure OCR
-client = ImageAnalysisClient(
-    endpoint=endpoint,
-    credential=AzureKeyCredential(key)
-)
-
-def preprocess_image(image):
+    from scripts.config import load_config, get_vision_client
+    from scripts.ocr_encoding import encode_page, prepare_page, save_page, resolve_profile, DEFAULT_PROFILE
+    from scripts.ocr_tiling import plan_tiles, tile_pages, split_lines, MAX_IMAGE_BYTES
+except ImportError:  # Run as a script from the scripts directory
+    from config import load_config, get_vision_client
+    from ocr_encoding import encode_page, prepare_page, save_page, resolve_profile, DEFAULT_PROFILE
+    from ocr_tiling import plan_tiles, tile_pages, split_lines, MAX_IMAGE_BYTES
+
+# Load environment variables for Azure Vision credentials (the client is created on first use,
+# and the PDF and image libraries are imported when a PDF is read)
+load_config()
+
+# Pool of OCR threads, created on first use (or by the warm-up of the API) and kept for the next requests
+ocr_pool = None
+ocr_pool_lock = threading.Lock()
+
+# Pages OCRed at the same time by a query: k=4 search results x the +-1 page window of every result
+DEFAULT_OCR_WORKERS = 4 * 3
+
+def create_ocr_pool():
+    """
+    Pool of threads that encode the pages and send them to Azure Vision (OCR_WORKERS threads, all the
+    pages of a query by default). The calls wait on the network and the image encoding releases the
+    GIL, so threads are enough: there are no processes to start or to keep in every API worker.
+    """
+    workers = int(os.getenv('OCR_WORKERS', str(DEFAULT_OCR_WORKERS)))
+    return ThreadPool(workers)
+
+def get_ocr_pool():
     """
-    Preprocess the image by converting it to grayscale.
+    OCR pool of this process, shared by its concurrent requests.
     """
-    return ImageOps.grayscale(image)
+    global ocr_pool
+    with ocr_pool_lock:
+        if ocr_pool is None:
+            ocr_pool = create_ocr_pool()
+    return ocr_pool
 
-def process_single_page_with_azure(page_image):
+def process_single_page_with_azure(page_image, profile=DEFAULT_PROFILE):
     """
     Process a single PDF page using Azure Vision OCR.
     Extract and return the recognized text from the image.
+    The page is encoded with the given profile of ocr_encoding.ENCODING_PROFILES (grayscale PNG by default).
     """
-    # Preprocess image to grayscale
-    processed_image = preprocess_image(page_image)
-
-    # Convert PIL image to byte array
-    from io import BytesIO
-    img_byte_array = BytesIO()
-    processed_image.save(img_byte_array, format='PNG')
-    img_byte_array = img_byte_array.getvalue()
+    # Convert PIL image to byte array (grayscale, resized and compressed as the profile says)
+    img_byte_array = encode_page(page_image, profile)
 
     # Call Azure vision API for OCR
-    result = client.analyze(
+    result = get_vision_client().analyze(
         image_data=img_byte_array,
         visual_features=["Read"]  # Especificamos que queremos usar solo las características de OCR (lectura de texto)
     )
@@ -57,7 +65,37 @@ def process_single_page_with_azure(page_image):
 
     return extracted_text
 
-def pdf_to_text(pdf_path, page=None, n=1, dpi=150):
+def process_tile_with_azure(page_images, profile=DEFAULT_PROFILE):
+    """
+    Process several PDF pages with a single Azure Vision OCR call: the pages are stacked into one image
+    and the recognized lines are split back to their pages by their bounding box.
+    If the tile is too big or the call fails, every page is sent on its own.
+    Returns the text of every page.
+    """
+    if len(page_images) == 1:
+        return [process_single_page_with_azure(page_images[0], profile)]
+
+    try:
+        tile, offsets = tile_pages([prepare_page(page_image, profile) for page_image in page_images])
+        img_byte_array = save_page(tile, profile)
+        if len(img_byte_array) > MAX_IMAGE_BYTES:
+            raise ValueError(f"tile of {len(img_byte_array)} bytes is over the limit of {MAX_IMAGE_BYTES}")
+
+        result = get_vision_client().analyze(image_data=img_byte_array, visual_features=["Read"])
+
+        lines = [line for block in result.read.blocks for line in block.lines] if result.read is not None else []
+        return split_lines(lines, offsets)
+    except Exception as e:
+        print(f"OCR of a tile of {len(page_images)} pages failed ({e}), processing the pages one by one")
+        return [process_single_page_with_azure(page_image, profile) for page_image in page_images]
+
+def ocr_batching_enabled() -> bool:
+    """
+    Whether the pages are tiled several per OCR call (OCR_BATCHING).
+    """
+    return os.getenv('OCR_BATCHING', 'false').lower() in ('1', 'true', 'yes')
+
+def pdf_to_text(pdf_path, page=None, n=1, dpi=150, profile=None, batching=None):
     """
     Converts a PDF file into text using Azure Vision OCR, limiting the number of pages
     to process based on a central page (defined by 'page') and a number of pages before and after ('n').
@@ -67,10 +105,18 @@ def pdf_to_text(pdf_path, page=None, n=1, dpi=150):
         page (int, optional): Number of the central page to process. If None, the entire PDF is processed.
         n (int): The number of pages before and after 'page' to analyze.
         dpi (int): DPI (Dots Per Inch) to use when converting PDF pages to images.
+        profile (str, optional): Encoding profile of the page images (OCR_ENCODING_PROFILE if not given).
+        batching (bool, optional): Send several pages tiled in one image per OCR call (OCR_BATCHING if not given).
 
     Returns:
         str: The extracted text.
     """
+    from pdf2image import convert_from_path
+    from PyPDF2 import PdfReader
+
+    profile = resolve_profile(profile)
+    if batching is None:
+        batching = ocr_batching_enabled()
 
     # Get total number of pages in the PDF
     with open(pdf_path, "rb") as file:
@@ -99,9 +145,15 @@ def pdf_to_text(pdf_path, page=None, n=1, dpi=150):
 
     print(f"Pages to process: {len(pages_to_process)}")
 
-    # Multiprocessing to handle multiple pages in parallel
-    with multiprocessing.Pool() as pool:
-        page_texts = pool.map(process_single_page_with_azure, pages_to_process)
+    if batching:
+        # Consecutive pages tiled in one image per call, the tiles in parallel
+        tiles = plan_tiles([page_image.size for page_image in pages_to_process])
+        tile_texts = get_ocr_pool().map(partial(process_tile_with_azure, profile=profile),
+                                        [[pages_to_process[index] for index in tile] for tile in tiles])
+        page_texts = [text for texts in tile_texts for text in texts]
+    else:
+        # OCR pool to handle multiple pages in parallel
+        page_texts = get_ocr_pool().map(partial(process_single_page_with_azure, profile=profile), pages_to_process)
 
     # Join the text extracted from all pages
     pdf_text = "\n\n".join(page_texts)
@@ -0,0 +1,131 @@
+# Import Standard Libraries
+import os
+import time
+import logging
+import argparse
+import threading
+
+# Import Third-Party Libraries
+from gunicorn.app.base import BaseApplication
+
+# Local imports
+from scripts.config import load_config
+
+# Load environment variables from the .env file
+load_config()
+
+logger = logging.getLogger(__name__)
+
+
+def process_memory(pid: int) -> dict:
+    """
+    Memory of a process (Linux), in bytes.
+
+    Returns:
+        dict: rss (resident), pss (resident with the shared pages divided between the processes
+            sharing them) and uss (private pages, what the process would free on exit).
+    """
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                    memory[parts[0][:-1]] = int(parts[1]) * 1024
+    except (FileNotFoundError, PermissionError):
+        return {}
+
+    return {
+        "rss": memory.get("Rss", 0),
+        "pss": memory.get("Pss", 0),
+        "uss": memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0),
+    }
+
+
+def report_worker_memory(server):
+    """
+    Logs the memory of the master and of every worker. The gap between the RSS and the USS of a
+    worker is the memory it shares with the others.
+    """
+    total_pss = 0
+    for name, pid in [("master", os.getpid())] + [(f"worker {worker.age}", pid) for pid, worker in list(server.WORKERS.items())]:
+        memory = process_memory(pid)
+        if not memory:
+            continue
+        total_pss += memory["pss"]
+        logger.info(f"{name} (pid {pid}): rss {memory['rss'] / 1024 / 1024:.0f} MB, "
+                    f"pss {memory['pss'] / 1024 / 1024:.0f} MB, uss {memory['uss'] / 1024 / 1024:.0f} MB")
+    logger.info(f"Total memory (pss) of the server: {total_pss / 1024 / 1024:.0f} MB")
+
+
+def preload_shared_state():
+    """
+    Imports the application (prompt templates included) and loads the read-only state of the
+    retriever in the master process, before the workers are forked.
+    """
+    from app import app
+    from scripts.extract_context_from_vs import preload_retriever
+
+    start_time = time.perf_counter()
+    loaded = preload_retriever()
+    logger.info(f"Preloaded in {time.perf_counter() - start_time:.1f}s: {loaded}")
+    return app
+
+
+class ServingApplication(BaseApplication):
+    """
+    Gunicorn server with uvicorn workers for an application that is already loaded.
+    """
+
+    def __init__(self, application, options: dict):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def when_ready(server):
+    """
+    Starts the periodic report of the memory of the workers in the master.
+    """
+    interval = float(os.getenv("MEMORY_REPORT_INTERVAL", "300"))
+    if interval <= 0:
+        return
+
+    def report_loop():
+        # First report once the workers have started, then every interval
+        time.sleep(min(30.0, interval))
+        while True:
+            report_worker_memory(server)
+            time.sleep(interval)
+
+    threading.Thread(target=report_loop, daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Production server: N workers forked after preloading the shared state")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("WORKER_TIMEOUT", "300")),
+                        help="Seconds before a silent worker is restarted (a request can wait for the OCR)")
+    args = parser.parse_args()
+
+    # Imports app.py, which configures the logging
+    application = preload_shared_state()
+
+    ServingApplication(application, {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": args.timeout,
+        "when_ready": when_ready,
+        "post_worker_init": lambda worker: logger.info(f"Worker {worker.age} (pid {worker.pid}) ready"),
+    }).run()
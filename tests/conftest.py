@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The pipelines import their sibling modules directly and reach the scripts through the repository root
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path[:0] = [ROOT_DIRECTORY, os.path.join(ROOT_DIRECTORY, 'pipelines')]
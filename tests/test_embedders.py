@@ -0,0 +1,24 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from scripts.embedders import MicroBatchingEmbedder
+
+
+class ShortEmbedder(Embeddings):
+    """
+    Embedder that loses the last text of every batch
+    """
+
+    def embed_documents(self, texts: list) -> list:
+        return [[float(len(text))] for text in texts[:-1]]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+def test_short_answer_fails_the_queries_instead_of_hanging():
+    embedder = MicroBatchingEmbedder(ShortEmbedder(), max_wait_ms=1)
+
+    with pytest.raises(ValueError, match="0 vectors for 1 queries"):
+        embedder.embed_query('E01')
+    assert embedder.average_batch_size() == 1
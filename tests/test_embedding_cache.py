@@ -0,0 +1,17 @@
+from embedding_cache import EmbeddingCache
+
+
+def test_models_sharing_the_directory_keep_their_own_rows(tmp_path):
+    api_cache = EmbeddingCache(str(tmp_path), 'text-embedding-3-large', initial_capacity=2)
+    api_cache.embed_with_cache(['pump', 'valve', 'probe'], lambda texts: [[1.0] * 4 for _ in texts])
+
+    local_cache = EmbeddingCache(str(tmp_path), 'sentence-transformers:all-MiniLM-L6-v2', initial_capacity=2)
+    assert local_cache.rows == 0
+    assert local_cache.embed_with_cache(['pump', 'alarm'], lambda texts: [[2.0] * 8 for _ in texts]) == [[2.0] * 8] * 2
+    api_cache.close()
+    local_cache.close()
+
+    api_cache = EmbeddingCache(str(tmp_path), 'text-embedding-3-large')
+    assert (api_cache.rows, api_cache.dimension) == (3, 4)
+    assert api_cache.embed_with_cache(['valve'], lambda texts: []) == [[1.0] * 4]
+    assert api_cache.hits == 1
@@ -0,0 +1,13 @@
+from file_discovery import FileScanner
+
+
+def test_html_exports_with_xls_extension_are_read_as_html(tmp_path):
+    scanner = FileScanner({'.xls': 'tabular', '.html': 'native'})
+
+    html_export = tmp_path / 'parts.xls'
+    html_export.write_text('<html><body><table><tr><td>KSB-000001</td></tr></table></body></html>')
+    workbook = tmp_path / 'prices.xls'
+    workbook.write_bytes(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 512)
+
+    assert scanner.classify(str(html_export), html_export.stat().st_size) == ('native', None)
+    assert scanner.classify(str(workbook), workbook.stat().st_size) == ('tabular', None)
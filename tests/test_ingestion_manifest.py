@@ -0,0 +1,26 @@
+from ingestion_manifest import IngestionManifest
+
+
+def test_collapsed_chunks_lead_to_the_chunks_that_cite_their_file(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.commit_files([('/corpus/a.pdf', ('hash_a', 1, 1.0), ['a1', 'a2'])])
+    manifest.add_references([('b1', 'a1'), ('b2', 'a2')])
+    manifest.commit_files([('/corpus/b.pdf', ('hash_b', 1, 1.0), ['b1', 'b2'])])
+
+    assert manifest.kept_chunks_of_file('/corpus/b.pdf') == ['a1', 'a2']
+    assert manifest.kept_chunks_of_file('/corpus/a.pdf') == []
+
+    # Chunks of a failed file, written and collapsed before the failure
+    manifest.journal_chunks([('c1', '/corpus/c.pdf')])
+    manifest.add_references([('c1', 'a1')])
+    assert manifest.remove_references(manifest.journaled_chunks()['/corpus/c.pdf']) == ['a1']
+    assert manifest.remove_references(['c1']) == []
+
+
+def test_files_with_prefix_only_lists_the_files_inside_the_directory(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.commit_files([('/corpus/a.pdf', ('hash_a', 1, 1.0), []),
+                           ('/corpus2/b.pdf', ('hash_b', 1, 1.0), [])])
+
+    assert list(manifest.files_with_prefix('/corpus')) == ['/corpus/a.pdf']
+    assert list(manifest.files_with_prefix('/corpus/')) == ['/corpus/a.pdf']
@@ -0,0 +1,69 @@
+from langchain_core.documents import Document
+
+from text_normalizer import normalize_text
+from scripts.lexical_index import LexicalIndex, split_raw_texts, is_code_query, RAW_TEXT_KEY
+
+CODE_CHUNK = 'Error E01 on KSB pump, part no. 12-345-678 rev. B2 code 3M-8845 TLS-450 alarm'
+OTHER_CHUNKS = [
+    'The pump must be primed before the first start, check the pressure of the line.',
+    'Replace the filters of the dispenser every six months or when the flow drops.',
+]
+
+
+def ingested_chunks(texts: list) -> list:
+    """
+    Chunks as they leave ProcessData.filter_documents: normalized text, raw text in the metadata.
+    """
+    return [Document(page_content=normalize_text(text), metadata={'source': f'manual_{index}.pdf', RAW_TEXT_KEY: text})
+            for index, text in enumerate(texts)]
+
+
+def test_code_query_returns_the_chunk_with_the_code(tmp_path):
+    documents = ingested_chunks([CODE_CHUNK] + OTHER_CHUNKS)
+    texts, metadatas = split_raw_texts(documents)
+    index = LexicalIndex(str(tmp_path / 'lexical_index.sqlite'))
+    index.add(['code', 'primed', 'filters'], texts, metadatas)
+
+    for query in ('E01', '3M-8845', '12-345-678', 'TLS-450', 'KSB 3M-8845'):
+        assert is_code_query(query)
+        results = index.search(query, k=1)
+        assert [document.id for document, _ in results] == ['code'], query
+        assert RAW_TEXT_KEY not in results[0][0].metadata
+
+
+def test_raw_text_is_never_stored_in_the_metadata():
+    texts, metadatas = split_raw_texts(ingested_chunks([CODE_CHUNK]))
+    assert texts == [CODE_CHUNK]
+    assert metadatas == [{'source': 'manual_0.pdf'}]
+
+
+def test_removed_and_moved_chunks_leave_no_stale_terms(tmp_path):
+    index = LexicalIndex(str(tmp_path / 'lexical_index.sqlite'))
+    index.add(['a1', 'a2', 'b1'], ['pump E01', 'valve E02', 'pump E03'],
+              [{'source': 'a.pdf'}, {'source': 'a.pdf'}, {'source': 'b.pdf'}])
+
+    # Replacing a chunk replaces its terms
+    index.add(['b1'], ['probe E04'], [{'source': 'b.pdf'}])
+    assert index.search('E03') == []
+
+    index.move_source('a.pdf', 'c.pdf')
+    assert [document.metadata['source'] for document, _ in index.search('E01')] == ['c.pdf']
+
+    index.remove_source('c.pdf')
+    index.remove(['b1'])
+    assert index.count() == 0
+    assert index.search('pump OR probe') == []
+
+
+def test_exported_index_restores_the_raw_texts(tmp_path):
+    index = LexicalIndex(str(tmp_path / 'store' / 'lexical_index.sqlite'))
+    index.add(['code', 'primed'], *split_raw_texts(ingested_chunks([CODE_CHUNK, OTHER_CHUNKS[0]])))
+    index.backup(str(tmp_path / 'corpus_export.lexical_index.sqlite'))
+
+    exported_index = LexicalIndex(str(tmp_path / 'corpus_export.lexical_index.sqlite'), read_only=True)
+    restored_index = LexicalIndex(str(tmp_path / 'restored' / 'lexical_index.sqlite'))
+    for chunk_ids, texts, metadatas in exported_index.iter_chunks(batch_size=1):
+        restored_index.add(chunk_ids, texts, metadatas)
+
+    assert restored_index.count() == 2
+    assert [document.id for document, _ in restored_index.search('3M-8845', k=1)] == ['code']
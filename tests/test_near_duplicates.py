@@ -0,0 +1,19 @@
+from near_duplicates import NearDuplicateIndex
+from text_normalizer import normalize_text
+
+# Same procedure for two pump models: only the part number, the error code and the torque change
+FIRST_CHUNK = ('Replace the seal kit part no. 12-345-678 when the controller shows error E01 and tighten '
+               'the impeller nut to 45 Nm before restarting the pump.')
+SECOND_CHUNK = ('Replace the seal kit part no. 98-765-432 when the controller shows error E07 and tighten '
+                'the impeller nut to 60 Nm before restarting the pump.')
+
+
+def test_chunks_differing_only_in_codes_are_not_collapsed(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'near_duplicates.sqlite'))
+
+    # The normalizer removes every code, so the normalized texts can not tell them apart
+    assert normalize_text(FIRST_CHUNK) == normalize_text(SECOND_CHUNK)
+
+    index.add('first', index.signature(FIRST_CHUNK))
+    assert index.find(index.signature(SECOND_CHUNK)) is None
+    assert index.find(index.signature(FIRST_CHUNK)) == 'first'
@@ -0,0 +1,13 @@
+from scripts.page_text_cache import PageTextCache
+
+
+def test_text_read_with_other_ocr_settings_is_not_served(tmp_path):
+    pdf_path = tmp_path / 'manual.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4')
+    cache = PageTextCache(str(tmp_path / 'page_text_cache.sqlite'))
+
+    cache.put(cache.key(str(pdf_path), 3, profile='png-default'), 'text read as PNG')
+
+    assert cache.get(cache.key(str(pdf_path), 3, profile='png-default')) == 'text read as PNG'
+    assert cache.get(cache.key(str(pdf_path), 3, profile='webp-75')) is None
+    assert cache.get(cache.key(str(pdf_path), 3, profile='png-default', batching=True)) is None
@@ -0,0 +1,27 @@
+import pytest
+
+from scripts.partition_router import PartitionRouter
+
+
+@pytest.fixture
+def router(tmp_path):
+    return PartitionRouter(str(tmp_path / 'partitions_catalog.json'))
+
+
+@pytest.mark.parametrize('query', [
+    'list the maintenance steps of the dispenser',
+    'data sheet for the TLS-450 probe',
+    'where are the safety data sheets?',
+    'inventory reconciliation procedure',
+])
+def test_generic_words_do_not_route_to_the_tabular_partition(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize('query', [
+    'price table of the impellers',
+    'excel with the spare parts',
+    'spreadsheet of the KSB seals',
+])
+def test_tabular_words_route_to_the_tabular_partition(router, query):
+    assert router.route(query) == {'type_data': 'tabular'}
@@ -0,0 +1,28 @@
+import os
+
+from partitions import PartitionCatalog, partition_metadata, backfill_lexical_partitions
+from scripts.lexical_index import LexicalIndex
+
+
+def test_vendor_must_be_whole_words_of_a_path_component():
+    base_path = os.path.join(os.sep, 'corpus')
+    vendors = ['ABB', 'KSB']
+
+    def vendor_of(*parts):
+        return partition_metadata(os.path.join(base_path, *parts), base_path, vendors)['vendor']
+
+    assert vendor_of('Pumps', 'KSB Pumps', 'manual.pdf') == 'KSB'
+    assert vendor_of('Pumps', 'Others', 'ksb_manual.pdf') == 'KSB'
+    assert vendor_of('Labs', 'Abbott', 'manual.pdf') == ''
+    assert vendor_of('Labs', 'Other', 'Cabbage-report.pdf') == ''
+
+
+def test_backfill_reaches_the_filtered_lexical_search(tmp_path):
+    base_path = os.path.join(os.sep, 'corpus')
+    index = LexicalIndex(str(tmp_path / 'lexical_index.sqlite'))
+    index.add(['a1'], ['Error E01 on the pump'], [{'source': os.path.join(base_path, 'Pumps', 'KSB', 'manual.pdf')}])
+    catalog = PartitionCatalog(str(tmp_path / 'partitions_catalog.json'))
+
+    assert backfill_lexical_partitions(index, catalog, base_path, ['KSB']) == 1
+    assert [document.id for document, _ in index.search('E01', where={'vendor': 'KSB'})] == ['a1']
+    assert catalog.values['family'] == {'Pumps'}
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from text_normalizer import normalize_text, normalize_texts
+from benchmark_text_normalizer import legacy_preprocess_page_content, random_text
+
+# Fixed cases covering every pattern of the normalizer
+GOLDEN_CASES = [
+    "",
+    "   ",
+    "Hello World",
+    "Check /usr/local/bin and C:\\Windows\\System32 paths",
+    "a\\b/c d fp__&__ x__&__é fp__&__-y éfp__&__ €fp__&__",
+    "Line one\n----------\nLine two --- three -- four",
+    "Temperature 25°C, pressure 1013 hPa; flow 3.5 m³/h!",
+    "Emojis 😀🚀 and symbols ☀ ✂ should go",
+    "Model ABC123 and x23%a and 5-ab and 5-a and mm-dd-yy and yyyy and xx xxx xxxx xxxxx",
+    "Error E01 on KSB pump, part no. 12-345-678 rev. B2",
+    "the the the pump pump is is ok ok",
+    "one two three four five six seven eight one two three four five six seven eight nine",
+    "Tabs\tand\r\nnewlines\x0b\x0cand\xa0non breaking\u2003spaces",
+    "Ünïcödé wörds like naïve café and İstanbul DŽ",
+    "a_b _ __ ___ a-b-c a.b.c 1.2.3 v1.2 1st 2nd 3rd 10th",
+    "٣٤ digits ١٢٣ and ² superscripts ½",
+]
+
+
+@pytest.mark.parametrize('text', GOLDEN_CASES)
+def test_normalizer_is_byte_identical_to_the_legacy_function(text):
+    assert normalize_text(text) == legacy_preprocess_page_content(text)
+
+
+def test_normalizer_matches_the_legacy_function_on_random_inputs():
+    rng = random.Random(0)
+    texts = [random_text(rng) for _ in range(5000)]
+
+    assert normalize_texts(texts) == [legacy_preprocess_page_content(text) for text in texts]